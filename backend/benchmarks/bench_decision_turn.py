@@ -0,0 +1,150 @@
+"""
+整个后端的回合基准：FastAPI 应用 + 本地模拟 LLM 服务，不访问外网
+
+用法（在 backend 目录下）：
+    python benchmarks/bench_decision_turn.py --players 20 --turns 5 --latency lognormal:0.8,0.4 --token-delay 0.01
+    python benchmarks/bench_decision_turn.py --players 50 --rate-limit-rate 0.05 --malformed-rate 0.1 --seed 7
+    python benchmarks/bench_decision_turn.py --players 5 --record data/bench.jsonl  # 录音供 replay_session.py 回放
+
+每个模拟玩家使用独立的 API Key，依次执行：新游戏 → 开始第一关 → 若干次 /api/game/decision。
+输出决策接口的延迟分位数、各流水线阶段的平均耗时与关键路径分布，以及模拟服务的请求统计。
+相同的 --seed 与参数下，LLM 返回内容与注入的故障完全相同。
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from collections import Counter, defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENROUTER_API_KEY", "sk-bench")
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+
+from config import settings  # noqa: E402
+from llm.mock_server import add_arguments, config_from_args, create_app  # noqa: E402
+
+
+def percentile(values: list, p: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def start_mock_server(args) -> tuple[uvicorn.Server, asyncio.Task, int]:
+    """在当前事件循环中启动模拟服务，端口由系统分配"""
+    config = uvicorn.Config(create_app(config_from_args(args)), host="127.0.0.1", port=0, log_level="warning")
+    server = uvicorn.Server(config)
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, task, port
+
+
+async def play(client: httpx.AsyncClient, player: int, turns: int, report: dict) -> None:
+    api_key = f"sk-bench-{player:04d}"
+    response = await client.post("/api/game/new", json={"api_key": api_key})
+    session_id = response.json()["session_id"]
+
+    started = time.perf_counter()
+    response = await client.post("/api/game/chapter/start", json={
+        "session_id": session_id, "chapter_id": "chapter_1", "api_key": api_key,
+    })
+    report["chapter_start"].append(time.perf_counter() - started)
+
+    for turn in range(turns):
+        started = time.perf_counter()
+        response = await client.post("/api/game/decision", json={
+            "session_id": session_id,
+            "decision": f"第{turn + 1}道政令：整顿军饷，严惩贪墨之人（玩家{player}）",
+            "api_key": api_key,
+        })
+        report["decision"].append(time.perf_counter() - started)
+        if response.status_code != 200:
+            report["errors"][response.status_code] += 1
+            return
+        result = response.json()
+        timings = result["stage_timings"]
+        for name, stage in timings["stages"].items():
+            report["stages"][name].append(stage["duration_ms"])
+        report["critical_paths"][" -> ".join(timings["critical_path"])] += 1
+        if result["chapter_result"]["chapter_ended"] or result["new_state"].get("game_over"):
+            return
+
+
+async def run(args) -> None:
+    server, server_task, port = await start_mock_server(args)
+    settings.openrouter_base_url = f"http://127.0.0.1:{port}/v1"
+    settings.session_backend = "memory"
+    if args.record:
+        settings.llm_cassette_mode = "record"
+        settings.llm_cassette_path = args.record
+
+    import main  # 在修改配置后导入，会话存储按基准配置创建
+
+    report = {
+        "chapter_start": [],
+        "decision": [],
+        "stages": defaultdict(list),
+        "critical_paths": Counter(),
+        "errors": Counter(),
+    }
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.lifespan(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            started = time.perf_counter()
+            await asyncio.gather(*[play(client, i, args.turns, report) for i in range(args.players)])
+            elapsed = time.perf_counter() - started
+            metrics = (await client.get("/api/metrics")).json()
+    async with httpx.AsyncClient() as mock_client:
+        mock_stats = (await mock_client.get(f"http://127.0.0.1:{port}/stats")).json()
+
+    server.should_exit = True
+    await server_task
+
+    decisions = report["decision"]
+    print(f"玩家 {args.players}，每人至多 {args.turns} 回合，总耗时 {elapsed:.2f}s，决策 {len(decisions)} 次")
+    print(f"{'接口':<14} {'次数':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}  (s)")
+    for name in ("chapter_start", "decision"):
+        values = report[name]
+        if values:
+            print(
+                f"{name:<14} {len(values):>6} {percentile(values, 50):>8.3f} {percentile(values, 95):>8.3f}"
+                f" {percentile(values, 99):>8.3f} {max(values):>8.3f}"
+            )
+    if decisions:
+        print(f"决策吞吐: {len(decisions) / elapsed:.1f} 次/秒")
+
+    print(f"\n{'阶段':<18} {'平均':>9} {'p95':>9}  (ms)")
+    for name, values in report["stages"].items():
+        print(f"{name:<18} {statistics.mean(values):>9.1f} {percentile(values, 95):>9.1f}")
+
+    print("\n关键路径:")
+    for path, count in report["critical_paths"].most_common(5):
+        print(f"  {count:>5}  {path}")
+    if report["errors"]:
+        print(f"\n错误响应: {dict(report['errors'])}")
+
+    print(f"\n模拟服务: {mock_stats}")
+    print(f"结构化输出: {metrics['llm_structured_output']}")
+    print(f"提示词缓存: {metrics['llm_prompt_cache']['call_sites']}")
+    breakers = metrics["llm_circuit_breaker"]["breakers"]
+    print(f"熔断器: { {name: (b['state'], b['transitions'], b['rejected']) for name, b in breakers.items()} }")
+    print(f"调度器退避次数: {metrics['llm_scheduler']['backoffs']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="整个后端的回合基准（本地模拟 LLM）")
+    parser.add_argument("--players", type=int, default=10)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--record", help="把 LLM 请求与接口调用录制到该文件")
+    add_arguments(parser)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+会话状态编码基准
+
+用法（在 backend 目录下）：
+    python benchmarks/bench_state_codec.py
+
+对 5 / 25 / 100 回合的模拟会话，分别报告各编码的体积（字节）与编码、解码耗时（微秒）。
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.game_state import (  # noqa: E402
+    GameState, DialogueEntry, DecisionRecord, Promise, Leverage, ShadowSeed,
+    ShadowSeedTag, ShadowSeedSeverity,
+)
+from storage.codec import JsonCodec, MsgpackCodec, MSGPACK_AVAILABLE  # noqa: E402
+
+
+TURN_COUNTS = (5, 25, 100)
+
+
+def build_session(turns: int) -> GameState:
+    """模拟进行了若干回合的会话"""
+    state = GameState()
+    for turn in range(1, turns + 1):
+        chapter = f"chapter_{min(5, 1 + turn // 5)}"
+        state.total_turn = turn
+        state.history.append(DialogueEntry(turn=turn, chapter=chapter, speaker="player", content="逮捕贪官，没收家产，以儆效尤。"))
+        state.history.append(DialogueEntry(turn=turn, chapter=chapter, speaker="lion", content="陛下圣明，当以雷霆手段震慑群臣，方能稳固江山。"))
+        state.all_decisions.append(DecisionRecord(
+            turn=turn, chapter=chapter, decision="逮捕贪官，没收家产",
+            followed_advisor="lion", was_violent=True,
+            impact={"authority": 5, "fear": 8, "love": -3},
+        ))
+        if turn % 3 == 0:
+            state.promises.append(Promise(turn=turn, chapter=chapter, target="民众", content="三月内减免赋税", deadline=turn + 3, keywords=["减税", "赋税"]))
+        if turn % 4 == 0:
+            state.leverages.append(Leverage(holder="fox", type="lie", description="君主曾对使节撒谎", turn_acquired=turn, chapter=chapter))
+        if turn % 5 == 0:
+            state.causal_state.shadow_seeds.append(ShadowSeed(
+                origin_chapter=chapter, origin_turn=turn, trigger_delay=3,
+                tag=ShadowSeedTag.VIOLENCE, severity=ShadowSeedSeverity.HIGH,
+                description="血腥镇压埋下了仇恨的种子", player_visible_hint="城中有人在暗中哭泣",
+            ))
+    return state
+
+
+def measure(fn, repeat: int) -> float:
+    """平均耗时（微秒）"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def bench_model_json(state: GameState, repeat: int) -> tuple[int, float, float]:
+    """基线：model_dump_json / model_validate_json"""
+    data = state.model_dump_json().encode("utf-8")
+    encode_us = measure(state.model_dump_json, repeat)
+    decode_us = measure(lambda: GameState.model_validate_json(data), repeat)
+    return len(data), encode_us, decode_us
+
+
+def bench_codec(codec, state: GameState, repeat: int) -> tuple[int, float, float]:
+    data = codec.encode(state.model_dump())
+    encode_us = measure(lambda: codec.encode(state.model_dump()), repeat)
+    decode_us = measure(lambda: GameState.model_validate(codec.decode(data)), repeat)
+    assert GameState.model_validate(codec.decode(data)) == state
+    return len(data), encode_us, decode_us
+
+
+def main():
+    codecs = [("json", JsonCodec())]
+    if MSGPACK_AVAILABLE:
+        codecs.append(("msgpack", MsgpackCodec()))
+    else:
+        print("未安装 msgpack，只测试 JSON 编码\n")
+
+    print(f"{'回合':>6} {'编码':<18} {'字节':>10} {'编码 µs':>10} {'解码 µs':>10}")
+    for turns in TURN_COUNTS:
+        state = build_session(turns)
+        repeat = max(20, 2000 // turns)
+        rows = [("model_dump_json", *bench_model_json(state, repeat))]
+        rows += [(name, *bench_codec(codec, state, repeat)) for name, codec in codecs]
+        for name, size, encode_us, decode_us in rows:
+            print(f"{turns:>6} {name:<18} {size:>10} {encode_us:>10.1f} {decode_us:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+会话加载路径基准：完整校验 vs 可信加载
+
+用法（在 backend 目录下）：
+    python benchmarks/bench_trusted_load.py
+
+对五个关卡后的后期会话，比较：
+- model_validate_json（完整校验，pydantic-core 直接解析 JSON）
+- trusted_load_json（json.loads + 按注解生成的加载器，不校验）
+- model_validate / trusted_load（输入为已解码的字典，对应 Redis 分字段布局的读取）
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_state_codec import build_session  # noqa: E402
+from models.game_state import GameState, ChapterState  # noqa: E402
+from storage.trusted_loader import trusted_load, trusted_load_json  # noqa: E402
+
+
+TURN_COUNTS = (25, 100, 250)
+
+
+def build_late_game(turns: int) -> GameState:
+    """五个关卡都已进行过的会话"""
+    state = build_session(turns)
+    for i in range(1, 6):
+        chapter_id = f"chapter_{i}"
+        decisions = [d for d in state.all_decisions if d.chapter == chapter_id]
+        state.chapter_states[chapter_id] = ChapterState(
+            chapter_id=chapter_id, status="completed", start_turn=0, decisions=decisions,
+        )
+    return state
+
+
+def measure(fn, repeat: int) -> float:
+    """平均耗时（微秒）"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    print(f"{'回合':>6} {'字节':>9} {'validate_json':>14} {'trusted_json':>13} {'validate':>10} {'trusted':>10}  (µs)")
+    for turns in TURN_COUNTS:
+        state = build_late_game(turns)
+        raw = state.model_dump_json()
+        data = json.loads(raw)
+        assert trusted_load_json(GameState, raw) == GameState.model_validate_json(raw)
+
+        repeat = max(10, 3000 // turns)
+        print(
+            f"{turns:>6} {len(raw):>9}"
+            f" {measure(lambda: GameState.model_validate_json(raw), repeat):>14.1f}"
+            f" {measure(lambda: trusted_load_json(GameState, raw), repeat):>13.1f}"
+            f" {measure(lambda: GameState.model_validate(data), repeat):>10.1f}"
+            f" {measure(lambda: trusted_load(GameState, data), repeat):>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
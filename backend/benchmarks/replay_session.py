@@ -0,0 +1,183 @@
+"""
+回放录制的会话，比较各流水线阶段的耗时
+
+录制（线上或本地，LLM 请求与游戏接口调用都写入同一个录音文件）：
+    LLM_CASSETTE_MODE=record LLM_CASSETTE_PATH=data/slow_turn.jsonl python main.py
+    python benchmarks/bench_decision_turn.py --players 5 --turns 3 --record data/bench.jsonl
+
+回放（在 backend 目录下，不访问外网）：
+    python benchmarks/replay_session.py data/slow_turn.jsonl --output before.json
+    python benchmarks/replay_session.py data/slow_turn.jsonl --latency-scale 0 --compare before.json
+
+回放按录制顺序重新调用每个会话的游戏接口（新会话的 session_id 自动映射），
+LLM 请求由录音按原始延迟（或按 --latency-scale 缩放）返回；
+输出录制时与本次回放的接口耗时、决策流水线各阶段耗时，--compare 时再与另一次回放的结果对比。
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from collections import OrderedDict, defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENROUTER_API_KEY", "sk-replay")
+
+import httpx  # noqa: E402
+
+from config import settings  # noqa: E402
+
+
+def percentile(values: list, p: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def group_sessions(api_calls: list[dict]) -> list[list[dict]]:
+    """按录制时的 session_id 把接口调用分组，保持各会话内的调用顺序"""
+    sessions: OrderedDict[str, list] = OrderedDict()
+    for call in api_calls:
+        if call["path"] == "/api/game/new":
+            session_id = (call.get("response") or {}).get("session_id")
+        else:
+            session_id = (call.get("body") or {}).get("session_id")
+        if session_id:
+            sessions.setdefault(session_id, []).append(call)
+    return list(sessions.values())
+
+
+async def replay_session(client: httpx.AsyncClient, calls: list[dict], report: dict) -> None:
+    session_ids: dict[str, str] = {}
+    for call in calls:
+        body = dict(call.get("body") or {})
+        if "session_id" in body:
+            body["session_id"] = session_ids.get(body["session_id"], body["session_id"])
+
+        started = time.perf_counter()
+        response = await client.request(call["method"], call["path"], json=body)
+        elapsed = time.perf_counter() - started
+
+        path = call["path"]
+        report["endpoints"][path]["recorded"].append(call["elapsed"])
+        report["endpoints"][path]["replayed"].append(elapsed)
+        if response.status_code != call["status"]:
+            report["status_mismatches"].append(f"{path}: {call['status']} -> {response.status_code}")
+            continue
+        if not response.headers.get("content-type", "").startswith("application/json"):
+            continue
+
+        result = response.json()
+        if path == "/api/game/new":
+            session_ids[call["response"]["session_id"]] = result["session_id"]
+        elif path == "/api/game/decision":
+            for name, stage in call["response"]["stage_timings"]["stages"].items():
+                report["stages"][name]["recorded"].append(stage["duration_ms"])
+            for name, stage in result["stage_timings"]["stages"].items():
+                report["stages"][name]["replayed"].append(stage["duration_ms"])
+
+
+def summarize(report: dict, cassette_stats: dict, elapsed: float) -> dict:
+    def describe(values: list) -> dict:
+        if not values:
+            return {"count": 0}
+        return {
+            "count": len(values),
+            "mean": round(statistics.mean(values), 4),
+            "p95": round(percentile(values, 95), 4),
+        }
+
+    return {
+        "elapsed": round(elapsed, 3),
+        "endpoints": {
+            path: {"recorded_s": describe(v["recorded"]), "replayed_s": describe(v["replayed"])}
+            for path, v in report["endpoints"].items()
+        },
+        "stages": {
+            name: {"recorded_ms": describe(v["recorded"]), "replayed_ms": describe(v["replayed"])}
+            for name, v in report["stages"].items()
+        },
+        "status_mismatches": report["status_mismatches"],
+        "cassette": cassette_stats,
+    }
+
+
+def print_summary(summary: dict, baseline: dict = None) -> None:
+    def mean(section: dict, key: str) -> str:
+        value = section.get(key, {}).get("mean")
+        return f"{value:>10.3f}" if value is not None else f"{'-':>10}"
+
+    header = f"{'录制':>10} {'回放':>10}" + (f" {'对比基线':>10}" if baseline else "")
+    print(f"{'接口':<32} {'次数':>5} {header}  (s)")
+    for path, values in summary["endpoints"].items():
+        line = f"{path:<32} {values['replayed_s']['count']:>5} {mean(values, 'recorded_s')} {mean(values, 'replayed_s')}"
+        if baseline:
+            line += " " + mean(baseline["endpoints"].get(path, {}), "replayed_s")
+        print(line)
+
+    print(f"\n{'阶段':<20} {'次数':>5} {header}  (ms)")
+    for name, values in summary["stages"].items():
+        line = f"{name:<20} {values['replayed_ms']['count']:>5} {mean(values, 'recorded_ms')} {mean(values, 'replayed_ms')}"
+        if baseline:
+            line += " " + mean(baseline["stages"].get(name, {}), "replayed_ms")
+        print(line)
+
+    if summary["status_mismatches"]:
+        print(f"\n状态码与录制时不同: {summary['status_mismatches'][:10]}")
+    print(f"\n录音: {summary['cassette']}")
+    if summary["cassette"].get("misses"):
+        print("提示: 有 LLM 请求未命中录音（提示词含随机内容或代码改动了提示词），这些调用走了回退文本")
+
+
+async def run(args) -> None:
+    settings.llm_cassette_mode = "replay"
+    settings.llm_cassette_path = args.cassette
+    settings.llm_cassette_latency_scale = args.latency_scale
+    settings.session_backend = "memory"
+
+    import main  # 在修改配置后导入，会话存储与录音按回放配置创建
+    from llm import get_cassette
+
+    cassette = get_cassette()
+    sessions = group_sessions(cassette.api_calls)
+    if not sessions:
+        print("录音中没有游戏接口调用（录制时需要经过 main 应用），无法回放会话")
+        return
+
+    report = {
+        "endpoints": defaultdict(lambda: {"recorded": [], "replayed": []}),
+        "stages": defaultdict(lambda: {"recorded": [], "replayed": []}),
+        "status_mismatches": [],
+    }
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.lifespan(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://replay", timeout=None) as client:
+            started = time.perf_counter()
+            await asyncio.gather(*[replay_session(client, calls, report) for calls in sessions])
+            elapsed = time.perf_counter() - started
+
+    summary = summarize(report, cassette.stats(), elapsed)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print(f"回放 {len(sessions)} 个会话，耗时 {elapsed:.2f}s（延迟倍数 {args.latency_scale}）")
+    print_summary(summary, baseline)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回放录制的会话并比较各阶段耗时")
+    parser.add_argument("cassette", help="录音文件（LLM_CASSETTE_MODE=record 时写入）")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="回放延迟相对录制时的倍数（0 表示立即返回）")
+    parser.add_argument("--output", help="把结果写入 JSON 文件，供之后 --compare")
+    parser.add_argument("--compare", help="与之前 --output 保存的结果对比")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,37 @@ class Settings(BaseSettings):
     openrouter_base_url: str = "https://openrouter.ai/api/v1"
     default_model: str = "anthropic/claude-3.5-sonnet"
 
+    # LLM 客户端连接池
+    llm_pool_max_connections: int = 100  # 每个客户端的最大连接数
+    llm_pool_max_keepalive: int = 20  # 每个客户端保持的空闲连接数
+    llm_pool_keepalive_expiry: float = 60.0  # 空闲连接保活时间（秒）
+    llm_pool_idle_ttl: float = 600.0  # 客户端空闲多久后被淘汰（秒）
+    llm_pool_max_clients: int = 256  # 最多缓存的 (base_url, api_key) 客户端数
+    llm_pool_close_grace: float = 60.0  # 被淘汰的客户端没有在途请求后再空闲多久才关闭（秒），回合中仍持有它的引擎可继续使用
+    llm_http2: bool = True  # 启用 HTTP/2（需要安装 h2）
+    llm_request_timeout: float = 60.0  # 单次请求超时（秒）
+    llm_single_flight: bool = True  # 相同的 LLM 请求同时在途时合并为一次上游请求
+    llm_rate_rps: float = 5  # 每个 API Key 每秒放行的请求数（0 表示不限）
+    llm_rate_burst: float = 10  # 请求桶容量（允许的突发请求数）
+    llm_rate_tpm: float = 0  # 每个 API Key 每分钟的 token 预算（0 表示不限）
+    llm_fallback_models: str = ""  # 备用模型，逗号分隔，按顺序级联（为空时只用主模型）
+    llm_hedge_delay: float = 6.0  # 默认对冲延迟：主模型多久未返回时请求备用模型（秒）
+    llm_call_deadline: float = 40.0  # 默认截止时间：超过后回退到预设文本（秒）
+    llm_json_mode: bool = True  # 返回 JSON 对象的调用请求模型的 JSON 模式（模型不支持时自动关闭）
+    llm_stream_analysis: bool = True  # 决策分析以流式请求，核心字段解析完成即开始结算（不等评语生成完）
+    llm_breaker_enabled: bool = True  # 按模型熔断：上游故障时各调用位置立即回退到预设结果
+    llm_breaker_window: float = 30.0  # 失败率/慢调用率的统计窗口（秒）
+    llm_breaker_min_calls: int = 10  # 窗口内至少多少次调用才判断是否熔断
+    llm_breaker_error_rate: float = 0.5  # 失败率（连接失败、超时、5xx）达到多少时熔断
+    llm_breaker_slow_call: float = 20.0  # 超过多少秒算慢调用
+    llm_breaker_slow_rate: float = 0.8  # 慢调用率达到多少时熔断
+    llm_breaker_open_duration: float = 30.0  # 熔断多久后进入半开状态探测（秒）
+    llm_breaker_half_open_calls: int = 3  # 半开状态放行的探测请求数，全部成功后恢复
+    llm_prompt_cache_control: bool = True  # 提示词固定前缀标记 cache_control（仅对支持的模型，如 anthropic/*）
+    llm_cassette_mode: str = "off"  # off / record / replay：录制或回放全部 LLM 请求（用于复现慢回合与性能回归）
+    llm_cassette_path: str = "data/llm_cassette.jsonl"  # 录音文件（录制时追加写入）
+    llm_cassette_latency_scale: float = 1.0  # 回放延迟相对录制时的倍数（0 表示立即返回）
+
     # Redis 配置
     redis_host: str = "192.168.41.96"
     redis_port: int = 16379
@@ -25,6 +56,20 @@ class Settings(BaseSettings):
             return f"redis://:{self.redis_password}@{self.redis_host}:{self.redis_port}/{self.redis_db}"
         return f"redis://{self.redis_host}:{self.redis_port}/{self.redis_db}"
 
+    # 会话存储
+    session_backend: str = "memory"  # memory / redis / sqlite
+    session_ttl: float = 3600 * 24  # 会话过期时间（秒）
+    session_codec: str = "msgpack"  # msgpack / json，msgpack 未安装时自动退回 json
+    session_trusted_load: bool = False  # 读取自有存储时跳过 Pydantic 校验（基准显示 pydantic-core 校验更快，默认关闭）
+    session_local_cache: bool = True  # redis 后端前加一层进程内缓存（通过 pub/sub 失效）
+    session_local_cache_size: int = 1000  # 本地缓存的会话数上限
+    session_local_cache_ttl: float = 30.0  # 本地缓存有效期（秒），失效消息丢失时的兜底
+    session_judgment_max_entries: int = 10000  # 内存存储中保留的裁决引擎状态数上限
+    session_event_log: bool = False  # redis 后端以事件日志保存会话（每次保存只追加增量事件）
+    session_snapshot_interval: int = 20  # 事件日志每隔多少个事件写一次快照
+    session_sqlite_path: str = "data/sessions.db"  # sqlite 后端的数据库文件
+    session_sqlite_batch_size: int = 64  # sqlite 后端一次事务合并提交的写操作数上限
+
     # 游戏初始值
     initial_authority: float = 50.0
     initial_fear: float = 30.0
@@ -39,6 +84,21 @@ class Settings(BaseSettings):
     # 对话历史长度
     max_history_turns: int = 10
 
+    # 决策分析缓存
+    analysis_cache_enabled: bool = True
+    analysis_cache_backend: str = "memory"  # memory / redis（redis 时多副本共享命中）
+    analysis_cache_ttl: float = 3600.0  # 缓存有效期（秒）
+    analysis_cache_max_entries: int = 2048  # 内存缓存的 LRU 容量
+
+    # 预生成的关卡开场变体
+    chapter_variants_enabled: bool = True  # 命中预生成变体时跳过开场白/辩论的 LLM 调用
+    chapter_variant_store_path: str = "data/chapter_variants.json"
+    chapter_variant_band_width: float = 20.0  # 权力/信用/信任的分桶宽度
+
+    # 顾问回应并发生成
+    advisor_fanout_concurrent: bool = True  # 三位顾问的回应是否并发生成
+    advisor_response_timeout: float = 20.0  # 单个顾问回应的超时时间（秒），超时使用默认回应
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -3,6 +3,8 @@ from .audit_engine import AuditEngine
 from .settlement import SettlementEngine
 from .dialogue_gen import DialogueGenerator
 from .chapter_engine import ChapterEngine
+from .streaming import TurnStream
+from .prompts import PromptTemplate, register_prompt, get_prompt, prompt_versions
 from .judgment_engine import (
     JudgmentEngine,
     JudgmentResult,
@@ -21,6 +23,12 @@ __all__ = [
     "SettlementEngine",
     "DialogueGenerator",
     "ChapterEngine",
+    "TurnStream",
+    # 提示词注册表
+    "PromptTemplate",
+    "register_prompt",
+    "get_prompt",
+    "prompt_versions",
     # 新裁决系统
     "JudgmentEngine",
     "JudgmentResult",
@@ -6,8 +6,8 @@
 """
 
 from typing import Optional, Dict, Any, List
-from openai import AsyncOpenAI
 from config import settings
+from llm import get_llm_client
 from models import GameState
 from .judgment_engine import (
     JudgmentEngine, JudgmentResult, OutcomeLevel,
@@ -57,10 +57,7 @@ class AdvancedDialogueGenerator:
     def __init__(self, api_key: Optional[str] = None, model: Optional[str] = None):
         self.api_key = api_key or settings.openrouter_api_key
         self.model = model or settings.default_model
-        self.client = AsyncOpenAI(
-            api_key=self.api_key,
-            base_url=settings.openrouter_base_url,
-        )
+        self.client = get_llm_client(self.api_key)
         self.judgment_engine = JudgmentEngine()
 
     def set_observation_lens(self, lens: ObservationLens):
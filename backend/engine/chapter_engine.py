@@ -2,16 +2,105 @@
 关卡引擎
 管理关卡流程、议会辩论和场景生成
 """
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Awaitable, Callable
+import asyncio
 import json
-import re
 import uuid
 import random
-from openai import AsyncOpenAI
+from contextlib import nullcontext
 from config import settings
+from openai import BadRequestError, RateLimitError
+from llm import get_llm_client, get_single_flight, make_request_key
+from llm.hedging import CallBudget, HedgeStats, get_hedge_stats, hedged_call
+from llm.structured import (
+    StreamingJSONParser,
+    StructuredOutputError,
+    expects_array,
+    get_structured_stats,
+    parse_structured,
+    retry_message,
+    validate_structured,
+)
+from llm.circuit_breaker import get_circuit_breakers
+from llm.prompt_cache import get_prompt_cache_stats
+from llm.scheduler import LANE_BACKGROUND, LANE_INTERACTIVE, LANE_NORMAL, estimate_tokens, get_llm_scheduler
 from models import GameState, ChapterLibrary, ChapterID, Chapter
 from models.game_state import DecisionRecord, ShadowSeed, ShadowSeedTag, ShadowSeedSeverity, TriggeredEcho
 from services.prince_skills_service import get_skills_service
+from storage.response_cache import get_analysis_cache, make_cache_key, normalize_player_input
+from storage.variant_store import get_variant_store, variant_bucket_key
+from .turn_pipeline import TurnPipeline
+from .prompts import ADVISOR_RESPONSE_PROMPTS, ANALYSIS_PROMPT
+from .streaming import TurnStream
+from .schemas import (
+    ConsequenceFollowUp,
+    CouncilResponse,
+    CrisisResolution,
+    DebateLine,
+    DecisionAnalysis,
+    DecisionSeeds,
+    DecreeConsequence,
+    NextRoundScene,
+    PlayerIntent,
+    SeedEcho,
+)
+
+
+# 决策分析的核心字段：结算权力、记录决策、生成后果与顾问回应只依赖这些字段。
+# 提示词（prompts.ANALYSIS_PROMPT）中它们排在前面，流式解析时先于评语类字段（analysis、prince_quote 等）就绪
+ANALYSIS_CORE_FIELDS = (
+    "followed_advisor",
+    "rejected_advisor",
+    "was_violent",
+    "was_deceptive",
+    "was_fair",
+    "contains_promise",
+    "promise_info",
+    "is_secret_action",
+    "leak_probability",
+    "impact",
+)
+
+# 核心字段中模型必须给出的部分：流式解析时这些字段到齐即开始结算。
+# 可选字段（rejected_advisor、promise_info、leak_probability）不适用时模型常常省略，由响应模型的默认值补齐；
+# impact 在提示词中排在核心字段最后，它解析完成时模型给出的可选核心字段也已就绪
+ANALYSIS_REQUIRED_FIELDS = (
+    "followed_advisor",
+    "was_violent",
+    "was_deceptive",
+    "was_fair",
+    "contains_promise",
+    "is_secret_action",
+    "impact",
+)
+
+# LLM 调用位置对应的调度通道（未列出的为 interactive：玩家正在等待的叙事与顾问回复）
+CALL_SITE_LANES = {
+    "decision_seeds": LANE_BACKGROUND,
+    "seed_echo": LANE_NORMAL,
+}
+
+# LLM 调用位置的延迟预算：超过 hedge_delay 未返回时向备用模型发出对冲请求，
+# 超过 deadline 时放弃并回退到预设文本（未列出的使用配置中的默认值）
+DEFAULT_CALL_BUDGET = CallBudget(hedge_delay=settings.llm_hedge_delay, deadline=settings.llm_call_deadline)
+CALL_SITE_BUDGETS = {
+    "analyze_decision": CallBudget(hedge_delay=4.0, deadline=25.0),
+    "crisis_resolution": CallBudget(hedge_delay=4.0, deadline=25.0),
+    "player_intent": CallBudget(hedge_delay=3.0, deadline=20.0),
+    "advisor_response": CallBudget(hedge_delay=4.0, deadline=25.0),
+    "decree_consequences": CallBudget(hedge_delay=8.0, deadline=45.0),
+    "decision_seeds": CallBudget(hedge_delay=None, deadline=60.0),
+    "seed_echo": CallBudget(hedge_delay=None, deadline=45.0),
+}
+
+
+def _retry_after(error: RateLimitError, default: float = 1.0) -> float:
+    """429 响应的 Retry-After 秒数"""
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after", default))
+    except (AttributeError, TypeError, ValueError):
+        return default
 
 
 class ChapterEngine:
@@ -29,15 +118,228 @@ class ChapterEngine:
             print(f"[ChapterEngine] 使用模型: {self.model}")
             print(f"[ChapterEngine] API Base URL: {settings.openrouter_base_url}")
 
-        self.client = AsyncOpenAI(
-            api_key=self.api_key,
-            base_url=settings.openrouter_base_url,
-        )
+        self.client = get_llm_client(self.api_key)
+        # 备用模型级联（主模型之后依次尝试）
+        self.fallback_models = [
+            m.strip() for m in settings.llm_fallback_models.split(",")
+            if m.strip() and m.strip() != self.model
+        ]
+        # 是否使用预生成的开场白/辩论变体（预生成脚本会关闭它以强制实时生成）
+        self.use_pregenerated = settings.chapter_variants_enabled
         # 存储当前回合的后果上下文，用于连续处理
         self.consequence_context: Dict[str, Any] = {}
 
-    async def start_chapter(self, game_state: GameState, chapter_id: str) -> dict:
-        """开始一个关卡"""
+    async def _chat_completion(self, call_site: str, messages: List[dict], **params):
+        """
+        调用 LLM（非流式）
+
+        call_site 标识调用位置，决定调度通道与延迟预算；相同请求同时在途时合并为一次上游请求
+        """
+        def create():
+            return self._hedged_create(call_site, messages, params)
+
+        if not settings.llm_single_flight:
+            return await create()
+        key = make_request_key(self.api_key, settings.openrouter_base_url, self.model, messages, params)
+        return await get_single_flight().do(key, create, call_site)
+
+    async def _hedged_create(self, call_site: str, messages: List[dict], params: dict):
+        """按调用位置的延迟预算在主模型与备用模型之间对冲"""
+        budget = CALL_SITE_BUDGETS.get(call_site, DEFAULT_CALL_BUDGET)
+        tiers = [("primary", lambda: self._scheduled_create(call_site, messages, params))]
+        for model in self.fallback_models:
+            tiers.append((model, lambda model=model: self._scheduled_create(call_site, messages, params, model)))
+        return await hedged_call(call_site, tiers, budget)
+
+    async def _scheduled_create(self, call_site: str, messages: List[dict], params: dict, model: Optional[str] = None):
+        """
+        经熔断器与调度器放行后调用上游；429 时暂停该 Key 并重试一次
+
+        模型熔断时立即抛出 CircuitOpenError（不排队），对冲时切换到备用模型，否则由调用方回退。
+        流式请求的 create() 在收到响应头时即返回，调用结果由 _stream_once 在读完（或读取失败）后记录
+        """
+        model = model or self.model
+        breaker = get_circuit_breakers().get(model)
+        record = breaker and not params.get("stream")
+        scheduler = get_llm_scheduler()
+        lane = CALL_SITE_LANES.get(call_site, LANE_INTERACTIVE)
+        estimated = estimate_tokens(messages, params.get("max_tokens"))
+        for attempt in range(2):
+            if breaker:
+                breaker.check()
+            await scheduler.acquire(self.api_key, lane, estimated)
+            try:
+                with breaker.call() if record else nullcontext():
+                    response = await self.client.chat.completions.create(
+                        model=model, messages=messages, **params,
+                    )
+            except RateLimitError as e:
+                if not scheduler.enabled or attempt:
+                    raise
+                scheduler.backoff(self.api_key, _retry_after(e))
+                print(f"[ChapterEngine] {call_site} 被限流，等待后重试")
+                continue
+            if not params.get("stream"):
+                usage = getattr(response, "usage", None)
+                scheduler.record_usage(self.api_key, estimated, getattr(usage, "total_tokens", None))
+                get_prompt_cache_stats().record(call_site, usage)
+            return response
+
+    async def _structured_completion(self, call_site: str, schema: Any, messages: List[dict], **params) -> Any:
+        """
+        调用 LLM 并按响应模型解析输出，返回校验后的 dict/list
+
+        对象类响应在支持的模型上开启 JSON 模式；输出先经容错解析，不合格时把错误发回模型重试一次，
+        仍不合格则抛出 StructuredOutputError，由调用方回退到默认值
+        """
+        stats = get_structured_stats()
+        stats.calls[call_site] += 1
+        if settings.llm_json_mode and not expects_array(schema) and self.model not in stats.json_mode_unsupported:
+            params = {**params, "response_format": {"type": "json_object"}}
+
+        for attempt in range(2):
+            try:
+                response = await self._chat_completion(call_site, messages, **params)
+            except BadRequestError as e:
+                if "response_format" not in params:
+                    raise
+                # 模型不支持 JSON 模式：记下后去掉 response_format 重发
+                print(f"[ChapterEngine] 模型 {self.model} 不支持 JSON 模式: {e}")
+                stats.json_mode_unsupported.add(self.model)
+                params = {k: v for k, v in params.items() if k != "response_format"}
+                response = await self._chat_completion(call_site, messages, **params)
+            content = (response.choices[0].message.content or "").strip()
+            try:
+                result, repaired = parse_structured(content, schema)
+            except StructuredOutputError as e:
+                stats.parse_failures[call_site] += 1
+                if attempt:
+                    stats.failures[call_site] += 1
+                    raise
+                print(f"[ChapterEngine] {call_site} 输出不合格，重试: {e}")
+                print(f"[ChapterEngine] 原始输出: {content[:100]}...")
+                stats.retries[call_site] += 1
+                messages = [
+                    *messages,
+                    {"role": "assistant", "content": content},
+                    {"role": "user", "content": retry_message(e)},
+                ]
+                continue
+            if repaired:
+                stats.repaired[call_site] += 1
+            if attempt:
+                stats.retry_successes[call_site] += 1
+            return result
+
+    async def _stream_chat(
+        self,
+        call_site: str,
+        messages: List[dict],
+        on_delta: Callable[[str], Awaitable[None]],
+        **params,
+    ) -> str:
+        """
+        以流式方式调用 LLM，每收到一段增量即回调 on_delta，返回完整文本
+
+        流式请求不经过单飞合并与并发对冲，但同样受调用位置延迟预算的约束：整次调用超过 deadline
+        时抛出 asyncio.TimeoutError；尚未输出任何增量时，当前模型失败或超过 hedge_delay 仍无输出
+        则放弃它、依次改用备用模型（一旦开始输出便不再切换，已推送的文本无法撤回）
+        """
+        budget = CALL_SITE_BUDGETS.get(call_site, DEFAULT_CALL_BUDGET)
+        stats = get_hedge_stats()
+        stats.calls[call_site] += 1
+        try:
+            return await asyncio.wait_for(
+                self._stream_with_failover(call_site, messages, on_delta, params, budget, stats),
+                timeout=budget.deadline,
+            )
+        except asyncio.TimeoutError:
+            stats.deadline_misses[call_site] += 1
+            raise asyncio.TimeoutError(f"{call_site} 流式请求超过截止时间 {budget.deadline}s")
+
+    async def _stream_with_failover(
+        self,
+        call_site: str,
+        messages: List[dict],
+        on_delta: Callable[[str], Awaitable[None]],
+        params: dict,
+        budget: CallBudget,
+        stats: HedgeStats,
+    ) -> str:
+        """按主模型、备用模型的顺序发起流式请求，直到某一层开始输出"""
+        tiers = [("primary", self.model), *((model, model) for model in self.fallback_models)]
+        for index, (tier, model) in enumerate(tiers):
+            is_last = index == len(tiers) - 1
+            started = asyncio.Event()
+
+            async def forward(delta: str) -> None:
+                started.set()
+                await on_delta(delta)
+
+            if index:
+                stats.hedges[call_site] += 1
+            task = asyncio.ensure_future(self._stream_once(call_site, messages, params, model, forward))
+            try:
+                if budget.hedge_delay is not None and not is_last:
+                    waiter = asyncio.ensure_future(started.wait())
+                    done, _ = await asyncio.wait(
+                        {task, waiter}, timeout=budget.hedge_delay, return_when=asyncio.FIRST_COMPLETED,
+                    )
+                    waiter.cancel()
+                    if not done:
+                        print(f"[ChapterEngine] {call_site} {tier} {budget.hedge_delay}s 内无输出，改用下一级模型")
+                        continue
+                text = await task
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if started.is_set() or is_last:
+                    stats.failures[call_site] += 1
+                    raise
+                print(f"[ChapterEngine] {call_site} {tier} 流式请求失败，改用下一级模型: {type(e).__name__}: {e}")
+                continue
+            finally:
+                task.cancel()
+            stats.wins[call_site][tier] += 1
+            return text
+
+    async def _stream_once(
+        self,
+        call_site: str,
+        messages: List[dict],
+        params: dict,
+        model: str,
+        on_delta: Callable[[str], Awaitable[None]],
+    ) -> str:
+        """
+        向指定模型发起一次流式请求并读完整个响应
+
+        熔断器按整个流（从发起请求到读完最后一个数据块）记录结果：读取中途的上游错误计为失败，
+        慢调用按完整生成耗时判断
+        """
+        breaker = get_circuit_breakers().get(model)
+        with breaker.call() if breaker else nullcontext():
+            stream = await self._scheduled_create(call_site, messages, {"stream": True, **params}, model)
+            parts = []
+            async for chunk in stream:
+                # 最后一个数据块携带 usage（含命中缓存的 token 数）
+                if getattr(chunk, "usage", None):
+                    get_prompt_cache_stats().record(call_site, chunk.usage)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    await on_delta(delta)
+            return "".join(parts)
+
+    async def start_chapter(
+        self,
+        game_state: GameState,
+        chapter_id: str,
+        stream: Optional[TurnStream] = None,
+    ) -> dict:
+        """开始一个关卡（传入 stream 时开场白逐字推送）"""
         chapter = ChapterLibrary.get_chapter(ChapterID(chapter_id))
         if not chapter:
             return {"error": "关卡不存在"}
@@ -60,7 +362,7 @@ class ChapterEngine:
             scene_snapshot = await self.get_scene_with_echoes(game_state, chapter, triggered_echoes)
 
         # 生成开场
-        opening = await self.generate_chapter_opening(chapter, game_state)
+        opening = await self.generate_chapter_opening(chapter, game_state, stream=stream)
 
         # 如果有触发的回响，添加到开场白中
         if triggered_echoes:
@@ -69,6 +371,13 @@ class ChapterEngine:
                 echo_intro += f"\n• {echo.get('echo_narrative', '')}"
             opening += echo_intro
 
+        if stream:
+            await stream.stage_done("opening_narration", {"text": opening})
+
+        council_debate = await self.generate_council_debate(chapter, game_state)
+        if stream:
+            await stream.stage_done("council_debate", council_debate)
+
         return {
             "chapter": {
                 "id": chapter.id.value,
@@ -81,13 +390,39 @@ class ChapterEngine:
             "scene_snapshot": scene_snapshot,
             "dilemma": chapter.dilemma,
             "opening_narration": opening,
-            "council_debate": await self.generate_council_debate(chapter, game_state),
+            "council_debate": council_debate,
             "state": game_state.to_summary(include_hidden=not chapter.hide_values),
             "triggered_echoes": triggered_echoes,  # 返回触发的回响供前端展示
         }
 
-    async def generate_chapter_opening(self, chapter: Chapter, game_state: GameState) -> str:
-        """生成关卡开场白"""
+    def _pick_pregenerated(self, chapter: Chapter, game_state: GameState, kind: str):
+        """
+        取一个预生成变体；状态不常见时返回 None，由调用方实时生成
+
+        有顾问可能背叛时，对话需要体现其敌意，预生成变体无法覆盖，始终实时生成。
+        """
+        if not self.use_pregenerated:
+            return None
+        if any(relation.will_betray() for relation in game_state.relations.values()):
+            return None
+        variant = get_variant_store().pick(variant_bucket_key(chapter.id.value, game_state), kind)
+        if variant is not None:
+            print(f"[ChapterEngine] 使用预生成变体: {kind}")
+        return variant
+
+    async def generate_chapter_opening(
+        self,
+        chapter: Chapter,
+        game_state: GameState,
+        stream: Optional[TurnStream] = None,
+    ) -> str:
+        """生成关卡开场白（优先使用预生成变体）"""
+        pregenerated = self._pick_pregenerated(chapter, game_state, "opening")
+        if pregenerated is not None:
+            if stream:
+                await stream.narration_delta(pregenerated)
+            return pregenerated
+
         # [即时标记系统] 获取活动中的状态标记
         active_flags = game_state.get_active_flags()
         flags_context = ""
@@ -120,13 +455,22 @@ class ChapterEngine:
             print(f"[ChapterEngine] 使用模型: {self.model}")
             print(f"[ChapterEngine] API Key 前8位: {self.api_key[:8] if self.api_key else 'None'}...")
 
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.8,
-                max_tokens=400,
-            )
-            result = response.choices[0].message.content.strip()
+            if stream:
+                result = (await self._stream_chat(
+                    "chapter_opening",
+                    messages=[{"role": "user", "content": prompt}],
+                    on_delta=stream.narration_delta,
+                    temperature=0.8,
+                    max_tokens=400,
+                )).strip()
+            else:
+                response = await self._chat_completion(
+                    "chapter_opening",
+                    [{"role": "user", "content": prompt}],
+                    temperature=0.8,
+                    max_tokens=400,
+                )
+                result = response.choices[0].message.content.strip()
             print(f"[ChapterEngine] 开场白生成成功: {result[:50]}...")
             return result
         except Exception as e:
@@ -280,7 +624,11 @@ class ChapterEngine:
             return "hostile"
 
     async def _generate_debate_dialogue(self, chapter: Chapter, game_state: GameState) -> list[dict]:
-        """生成议会辩论对话"""
+        """生成议会辩论对话（优先使用预生成变体）"""
+        pregenerated = self._pick_pregenerated(chapter, game_state, "debate_dialogue")
+        if pregenerated is not None:
+            return pregenerated
+
         # 检查是否有顾问冲突
         has_conflict = chapter.id in [ChapterID.CHAPTER_3, ChapterID.CHAPTER_4]
 
@@ -342,23 +690,15 @@ class ChapterEngine:
             print(f"[ChapterEngine] 生成议会辩论对话...")
             print(f"[ChapterEngine] 使用模型: {self.model}")
 
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
+            result = await self._structured_completion(
+                "debate_dialogue",
+                list[DebateLine],
+                [{"role": "user", "content": prompt}],
                 temperature=0.8,
                 max_tokens=800,
             )
-            content = response.choices[0].message.content.strip()
-            print(f"[ChapterEngine] 辩论对话响应: {content[:100]}...")
-
-            # 提取JSON
-            json_match = re.search(r'\[[\s\S]*\]', content)
-            if json_match:
-                result = json.loads(json_match.group())
-                print(f"[ChapterEngine] 辩论对话生成成功，共 {len(result)} 条")
-                return result
-            else:
-                print(f"[ChapterEngine] 无法从响应中提取JSON数组")
+            print(f"[ChapterEngine] 辩论对话生成成功，共 {len(result)} 条")
+            return result
         except Exception as e:
             print(f"[ChapterEngine] 生成辩论对话失败: {type(e).__name__}: {e}")
             import traceback
@@ -376,17 +716,178 @@ class ChapterEngine:
         game_state: GameState,
         player_input: str,
         followed_advisor: Optional[str] = None,
+        stream: Optional[TurnStream] = None,
+        with_advisor_responses: bool = False,
     ) -> dict:
-        """处理玩家决策"""
+        """
+        处理玩家决策
+
+        回合按依赖关系拆分为流水线阶段：危机判定只依赖决策分析的核心字段，与顾问回应并发执行；
+        政令后果与伏笔种子读取结算后的回合、危机与权力，保持原有顺序（结算 → 后果 → 种子）。
+        对 game_state 的修改按阶段声明顺序依次提交，运行中的阶段不会读到提交到一半的状态。
+        决策分析以流式解析，核心字段就绪即结算权力与决策记录并启动后续阶段，评语类字段随后补齐。
+        with_advisor_responses 为 True 时顾问回应也作为流水线阶段在核心字段结算后生成。
+        传入 stream 时，各阶段完成后立即推送其结果。
+        """
         chapter = ChapterLibrary.get_chapter(ChapterID(game_state.current_chapter))
         if not chapter:
             return {"error": "关卡不存在"}
 
-        # 分析决策类型
-        analysis = await self._analyze_decision(player_input, chapter)
+        async def push_stage(name: str, value: Any) -> None:
+            if name == "analysis_core":
+                await stream.stage_done("power_delta", {
+                    "impact": value.get("impact", {}),
+                    "power": game_state.to_summary(include_hidden=not chapter.hide_values)["power"],
+                })
+            elif name == "analysis":
+                await stream.stage_done("decision_analysis", value)
+            elif name == "consequences":
+                await stream.stage_done("decree_consequences", value)
+            elif name == "seeds":
+                await stream.stage_done("causal_seeds", value)
+
+        pipeline = TurnPipeline(on_stage_done=push_stage if stream else None)
+
+        # 决策分析在独立任务中完成：核心字段就绪时 core_ready 先完成，完整结果由 analysis 阶段等待
+        core_ready = asyncio.get_running_loop().create_future()
+        analysis_task: Optional[asyncio.Task] = None
+
+        def on_core(core: dict) -> None:
+            if not core_ready.done():
+                core_ready.set_result(core)
+
+        async def analyze_core(r: dict) -> dict:
+            nonlocal analysis_task
+            analysis_task = asyncio.ensure_future(self._analyze_decision(player_input, chapter, on_core=on_core))
+            await asyncio.wait([analysis_task, core_ready], return_when=asyncio.FIRST_COMPLETED)
+            if not core_ready.done():
+                analysis_task.result()  # 分析任务异常退出时在此抛出
+            return core_ready.result()
+
+        # 分析决策类型（核心字段）：记录决策、承诺、秘密、权力数值、顾问关系
+        pipeline.add_stage(
+            "analysis_core",
+            run=analyze_core,
+            apply=lambda core, r: self._apply_decision_analysis(
+                game_state, player_input, followed_advisor, core
+            ),
+        )
+
+        # [把柄系统] / [信用系统]
+        pipeline.add_stage(
+            "leverage",
+            deps=("analysis_core",),
+            apply=lambda _, r: self._apply_leverage_and_credit(game_state, player_input, r["analysis_core"]),
+        )
+
+        # [危机系统] 检查玩家决策是否解决了某个危机
+        pipeline.add_stage(
+            "crisis_resolution",
+            deps=("analysis_core",),
+            run=lambda r: self._judge_crisis_resolution(game_state, player_input, r["analysis_core"]),
+            apply=lambda resolved_ids, r: self._apply_crisis_resolution(game_state, resolved_ids),
+        )
+
+        # [危机系统] 更新危机状态、进入下一回合、检查关卡结束条件
+        pipeline.add_stage(
+            "settle",
+            deps=("leverage", "crisis_resolution"),
+            apply=lambda _, r: self._settle_turn(game_state, chapter),
+        )
+
+        # 生成政令后续影响，并将新的后果添加到危机列表（基于结算后的回合与危机）
+        pipeline.add_stage(
+            "consequences",
+            deps=("settle",),
+            run=lambda r: self.generate_decree_consequences(
+                game_state=game_state,
+                player_decision=player_input,
+                decision_analysis=r["analysis_core"],
+                chapter=chapter,
+            ),
+            apply=lambda consequences, r: self._register_consequence_crises(game_state, consequences),
+        )
 
+        # [因果系统] 分析决策并生成伏笔种子（在政令后果登记为危机之后）
+        pipeline.add_stage(
+            "seeds",
+            deps=("consequences",),
+            run=lambda r: self._plan_decision_seeds(game_state, player_input, r["analysis_core"], chapter),
+            apply=lambda seeds_data, r: self._plant_seeds(game_state, seeds_data),
+        )
+
+        # 处理即时标记的回合计时
+        pipeline.add_stage(
+            "flags",
+            deps=("consequences", "seeds"),
+            apply=lambda _, r: game_state.tick_immediate_flags(),
+        )
+
+        # 顾问回应：只依赖核心字段与结算后的顾问关系、把柄，不必等政令后果与种子
+        if with_advisor_responses:
+            pipeline.add_stage(
+                "advisors",
+                deps=("leverage",),
+                run=lambda r: self.generate_advisor_responses(
+                    game_state=game_state,
+                    player_input=player_input,
+                    decision_analysis=r["analysis_core"],
+                    stream=stream,
+                ),
+            )
+
+        # 完整的决策分析（评语、名言等）；已结算的核心字段以 analysis_core 为准
+        pipeline.add_stage(
+            "analysis",
+            deps=("analysis_core",),
+            run=lambda r: analysis_task,
+            apply=lambda analysis, r: {**analysis, **r["analysis_core"]},
+        )
+
+        try:
+            run = await pipeline.execute()
+        finally:
+            if analysis_task is not None and not analysis_task.done():
+                analysis_task.cancel()
+        analysis = run.results["analysis"]
+        settle = run.results["settle"]
+        causal_seeds = run.results["seeds"]
+        leverage_used = run.results["leverage"]
+        print(f"[ChapterEngine] 回合流水线耗时 {run.total_ms:.0f}ms，关键路径: {' -> '.join(run.critical_path)}")
+
+        result = {
+            "decision_analysis": analysis,
+            "impact": analysis.get("impact", {}),
+            "promises_broken": [p.content for p in game_state.check_broken_promises()],
+            "secrets_leaked": [s.action for s in game_state.check_secret_leaks()],
+            "chapter_result": settle["chapter_result"],
+            "state": game_state.to_summary(include_hidden=not chapter.hide_values),
+            "decree_consequences": run.results["consequences"],  # 添加政令后续影响
+            "causal_update": {
+                "add_seeds": causal_seeds,  # 新创建的伏笔种子
+            } if causal_seeds else None,
+            "leverage_used": leverage_used,  # [把柄系统] 把柄使用结果
+            "credit_warning": self._get_credit_warning(game_state.credit_score),  # [信用系统] 信用警告
+            "resolved_crises": run.results["crisis_resolution"],  # [危机系统] 本回合解决的危机
+            "triggered_crises": [c["title"] for c in settle["triggered_crises"]],  # [危机系统] 自动触发的危机
+            "active_crises": game_state.get_active_crises(),  # [危机系统] 当前活动危机
+            "overdue_warning": [c["title"] for c in game_state.get_overdue_crises()],  # [危机系统] 即将超时的危机
+            "stage_timings": run.timings_summary(),  # 回合各阶段耗时与关键路径
+        }
+        if with_advisor_responses:
+            result["advisor_responses"] = run.results["advisors"]
+        return result
+
+    def _apply_decision_analysis(
+        self,
+        game_state: GameState,
+        player_input: str,
+        followed_advisor: Optional[str],
+        analysis: dict,
+    ) -> dict:
+        """将决策分析结果写入游戏状态：决策记录、承诺、秘密、权力数值、顾问关系"""
         # 记录决策
-        decision_record = game_state.record_decision(
+        game_state.record_decision(
             decision=player_input,
             followed_advisor=followed_advisor or analysis.get("followed_advisor"),
             was_violent=analysis.get("was_violent", False),
@@ -397,26 +898,27 @@ class ChapterEngine:
 
         # 检测承诺
         if analysis.get("contains_promise"):
-            promise_info = analysis.get("promise_info", {})
+            # 校验后的可选字段可能是显式的 null，用 or / is None 回退到默认值
+            promise_info = analysis.get("promise_info") or {}
+            deadline = promise_info.get("deadline")
             game_state.make_promise(
-                target=promise_info.get("target", "众人"),
-                content=promise_info.get("content", player_input),
-                deadline_turns=promise_info.get("deadline", 3),
+                target=promise_info.get("target") or "众人",
+                content=promise_info.get("content") or player_input,
+                deadline_turns=3 if deadline is None else deadline,
             )
 
         # 检测秘密行动
         if analysis.get("is_secret_action"):
+            leak_probability = analysis.get("leak_probability")
             game_state.add_secret(
                 action=player_input,
-                leak_probability=analysis.get("leak_probability", 0.3),
+                leak_probability=0.3 if leak_probability is None else leak_probability,
                 consequences=analysis.get("leak_consequences", {"love": -20}),
             )
 
-        # 计算影响
-        impact = analysis.get("impact", {})
-
         # 应用数值变化
-        game_state.power = game_state.power.apply_delta(
+        impact = analysis.get("impact", {})
+        game_state.apply_power_delta(
             delta_a=impact.get("authority", 0),
             delta_f=impact.get("fear", 0),
             delta_l=impact.get("love", 0),
@@ -427,23 +929,31 @@ class ChapterEngine:
             # 听从的顾问信任+，其他顾问可能信任-
             for advisor in ["lion", "fox", "balance"]:
                 if advisor == followed_advisor:
-                    game_state.relations[advisor] = game_state.relations[advisor].apply_delta(5, 3)
+                    game_state.apply_relation_delta(advisor, 5, 3)
                 elif advisor != followed_advisor and analysis.get("rejected_advisor") == advisor:
-                    game_state.relations[advisor] = game_state.relations[advisor].apply_delta(-3, -2)
+                    game_state.apply_relation_delta(advisor, -3, -2)
+
+        return analysis
 
-        # [把柄系统] 检查并处理把柄使用
+    async def _apply_leverage_and_credit(
+        self,
+        game_state: GameState,
+        player_input: str,
+        analysis: dict,
+    ) -> Optional[Dict[str, Any]]:
+        """[把柄系统] 处理把柄使用；[信用系统] 低信用影响顾问忠诚"""
         leverage_used = await self._process_leverage_usage(game_state, player_input, analysis)
 
-        # [信用系统] 低信用影响顾问反应
         if game_state.credit_score < 40:
             # 所有顾问的忠诚度略微下降
             for advisor in ["lion", "fox", "balance"]:
-                game_state.relations[advisor] = game_state.relations[advisor].apply_delta(0, -1)
+                game_state.apply_relation_delta(advisor, 0, -1)
 
-        # [危机系统] 检查玩家决策是否解决了某个危机
-        resolved_crises = await self._check_crisis_resolution(game_state, player_input, analysis)
+        return leverage_used
 
-        # [危机系统] 更新危机状态（倒计时、惩罚）
+    def _settle_turn(self, game_state: GameState, chapter: Chapter) -> dict:
+        """[危机系统] 危机倒计时、进入下一回合、检查关卡结束条件"""
+        # 更新危机状态（倒计时、惩罚）
         triggered_crises = game_state.tick_crises()
 
         # 进入下一回合
@@ -452,21 +962,23 @@ class ChapterEngine:
         # 检查关卡结束条件（包括危机触发导致的失败）
         chapter_result = self._check_chapter_conditions(game_state, chapter)
 
-        # [危机系统] 如果有危机自动触发，可能导致游戏结束
+        # 如果有危机自动触发，可能导致游戏结束
         if triggered_crises and not chapter_result.get("chapter_ended"):
             crisis_failure = self._process_triggered_crises(game_state, triggered_crises)
             if crisis_failure:
                 chapter_result = crisis_failure
 
-        # 生成政令后续影响
-        decree_consequences = await self.generate_decree_consequences(
-            game_state=game_state,
-            player_decision=player_input,
-            decision_analysis=analysis,
-            chapter=chapter,
-        )
+        return {
+            "triggered_crises": triggered_crises,
+            "chapter_result": chapter_result,
+        }
 
-        # [危机系统] 将新的后果添加到危机列表
+    def _register_consequence_crises(
+        self,
+        game_state: GameState,
+        decree_consequences: List[Dict[str, Any]],
+    ) -> List[Dict[str, Any]]:
+        """[危机系统] 将需要处理的政令后果添加到危机列表"""
         for consequence in decree_consequences:
             if consequence.get("requires_action") or consequence.get("severity") in ["high", "critical"]:
                 game_state.add_crisis(
@@ -480,49 +992,19 @@ class ChapterEngine:
                     auto_trigger_effect=consequence.get("auto_trigger_effect"),
                     unresolved_penalty=consequence.get("unresolved_penalty"),
                 )
+        return decree_consequences
 
-        # [因果系统] 分析决策并生成伏笔种子
-        causal_seeds = await self.analyze_decision_for_seeds(
-            game_state=game_state,
-            player_decision=player_input,
-            decision_analysis=analysis,
-            chapter=chapter,
-        )
-
-        # 处理即时标记的回合计时
-        game_state.tick_immediate_flags()
-
-        return {
-            "decision_analysis": analysis,
-            "impact": impact,
-            "promises_broken": [p.content for p in game_state.check_broken_promises()],
-            "secrets_leaked": [s.action for s in game_state.check_secret_leaks()],
-            "chapter_result": chapter_result,
-            "state": game_state.to_summary(include_hidden=not chapter.hide_values),
-            "decree_consequences": decree_consequences,  # 添加政令后续影响
-            "causal_update": {
-                "add_seeds": causal_seeds,  # 新创建的伏笔种子
-            } if causal_seeds else None,
-            "leverage_used": leverage_used,  # [把柄系统] 把柄使用结果
-            "credit_warning": self._get_credit_warning(game_state.credit_score),  # [信用系统] 信用警告
-            "resolved_crises": resolved_crises,  # [危机系统] 本回合解决的危机
-            "triggered_crises": [c["title"] for c in triggered_crises],  # [危机系统] 自动触发的危机
-            "active_crises": game_state.get_active_crises(),  # [危机系统] 当前活动危机
-            "overdue_warning": [c["title"] for c in game_state.get_overdue_crises()],  # [危机系统] 即将超时的危机
-        }
-
-    async def _check_crisis_resolution(
+    async def _judge_crisis_resolution(
         self,
         game_state: GameState,
         player_input: str,
         decision_analysis: dict,
     ) -> List[str]:
-        """[危机系统] 检查玩家的决策是否解决了某个危机"""
-        resolved = []
+        """[危机系统] 判断玩家的决策解决了哪些危机，返回危机ID列表（不修改游戏状态）"""
         active_crises = game_state.get_active_crises()
 
         if not active_crises:
-            return resolved
+            return []
 
         # 使用 AI 判断决策是否针对某个危机
         prompt = f"""分析玩家的政令是否解决了以下危机中的某一个。
@@ -546,34 +1028,35 @@ class ChapterEngine:
 如果没有解决任何危机，返回空列表。只返回 JSON。"""
 
         try:
-            response = await self.ai_client.messages.create(
-                model=self.model,
+            result = await self._structured_completion(
+                "crisis_resolution",
+                CrisisResolution,
+                [{"role": "user", "content": prompt}],
+                temperature=0.3,
                 max_tokens=500,
-                messages=[{"role": "user", "content": prompt}]
             )
+            return result["resolved_crisis_ids"]
 
-            response_text = response.content[0].text.strip()
-            if response_text.startswith("```"):
-                response_text = response_text.split("```")[1]
-                if response_text.startswith("json"):
-                    response_text = response_text[4:]
+        except Exception as e:
+            print(f"[ChapterEngine][危机系统] 判断危机解决失败: {e}")
 
-            result = json.loads(response_text)
-            resolved_ids = result.get("resolved_crisis_ids", [])
+        return []
 
-            for crisis_id in resolved_ids:
-                if game_state.resolve_crisis(crisis_id):
-                    # 找到对应的危机标题
-                    for c in active_crises:
-                        if c["id"] == crisis_id:
-                            resolved.append(c["title"])
-                            break
+    def _apply_crisis_resolution(self, game_state: GameState, resolved_ids: List[str]) -> List[str]:
+        """[危机系统] 标记危机为已解决，返回解决的危机标题"""
+        active_crises = game_state.get_active_crises()
+        resolved = []
 
-            print(f"[ChapterEngine][危机系统] 解决了 {len(resolved)} 个危机: {resolved}")
-
-        except Exception as e:
-            print(f"[ChapterEngine][危机系统] 判断危机解决失败: {e}")
+        for crisis_id in resolved_ids:
+            if game_state.resolve_crisis(crisis_id):
+                # 找到对应的危机标题
+                for c in active_crises:
+                    if c["id"] == crisis_id:
+                        resolved.append(c["title"])
+                        break
 
+        if resolved_ids:
+            print(f"[ChapterEngine][危机系统] 解决了 {len(resolved)} 个危机: {resolved}")
         return resolved
 
     def _process_triggered_crises(
@@ -601,7 +1084,7 @@ class ChapterEngine:
             severity_multiplier = {"low": 0.5, "medium": 1, "high": 1.5, "critical": 2}
             multiplier = severity_multiplier.get(severity, 1)
 
-            game_state.power = game_state.power.apply_delta(
+            game_state.apply_power_delta(
                 delta_a=int(impact.get("authority", 0) * multiplier),
                 delta_f=int(impact.get("fear", 0) * multiplier),
                 delta_l=int(impact.get("love", 0) * multiplier),
@@ -684,7 +1167,7 @@ class ChapterEngine:
                 impact = severity_impact.get(used_leverage.severity, {"authority": -5, "love": -8})
 
                 # 应用影响
-                game_state.power = game_state.power.apply_delta(
+                game_state.apply_power_delta(
                     delta_a=impact["authority"],
                     delta_l=impact["love"],
                 )
@@ -701,8 +1184,40 @@ class ChapterEngine:
 
         return None
 
-    async def _analyze_decision(self, player_input: str, chapter: Chapter) -> dict:
-        """分析玩家决策"""
+    async def _analyze_decision(
+        self,
+        player_input: str,
+        chapter: Chapter,
+        on_core: Optional[Callable[[dict], None]] = None,
+    ) -> dict:
+        """
+        分析玩家决策（相同关卡下归一化后相同的输入命中缓存，跳过 LLM 调用）
+
+        传入 on_core 时，核心字段（ANALYSIS_CORE_FIELDS）就绪后回调一次：流式解析时早于完整结果，
+        其他情况（命中缓存、非流式、默认结果）在返回前回调
+        """
+        core_sent = False
+
+        def send_core(analysis: dict) -> None:
+            nonlocal core_sent
+            if on_core and not core_sent:
+                core_sent = True
+                on_core({k: v for k, v in analysis.items() if k in ANALYSIS_CORE_FIELDS})
+
+        cache = get_analysis_cache() if settings.analysis_cache_enabled else None
+        cache_key = make_cache_key(
+            chapter.id.value,
+            normalize_player_input(player_input),
+            self.model,
+            ANALYSIS_PROMPT.cache_version,
+        )
+        if cache:
+            cached = await cache.get(cache_key)
+            if cached is not None:
+                print(f"[ChapterEngine] 决策分析命中缓存: {player_input[:50]}...")
+                send_core(cached)
+                return cached
+
         # 从技能包服务获取相关策略
         skills_service = get_skills_service()
         scenario = skills_service.detect_scenario(f"{chapter.dilemma} {player_input}")
@@ -715,9 +1230,8 @@ class ChapterEngine:
             for skill in relevant_skills[:2]:  # 最多引用2个技能
                 skill_references += f"- {skill.name}: {skill.description[:150]}...\n"
 
-        prompt = f"""分析玩家在《君主论》博弈游戏中的决策。
-
-关卡：{chapter.name}
+        # 固定的说明与输出格式在前缀中（可被提供方缓存），这里只填本次的关卡与决策
+        suffix = f"""关卡：{chapter.name}
 困境：{chapter.dilemma}
 
 顾问建议：
@@ -726,53 +1240,28 @@ class ChapterEngine:
 - 天平：{chapter.balance_suggestion.suggestion if chapter.balance_suggestion else "无"}
 
 玩家决策："{player_input}"
-{skill_references}
-
-请分析并返回JSON：
-{{
-  "followed_advisor": "lion/fox/balance/none",
-  "rejected_advisor": "被明确拒绝的顾问，可为null",
-  "was_violent": true/false,
-  "was_deceptive": true/false,
-  "was_fair": true/false,
-  "contains_promise": true/false,
-  "promise_info": {{"target": "承诺对象", "content": "承诺内容", "deadline": 3}},
-  "is_secret_action": true/false,
-  "leak_probability": 0.3,
-  "impact": {{"authority": 数值, "fear": 数值, "love": 数值}},
-  "analysis": "简短分析",
-  "machiavelli_assessment": "用一句话从马基雅维利《君主论》的视角评价此决策，可参考上面的技能包内容",
-  "prince_quote": "引用一句最相关的《君主论》名言（中文）",
-  "applied_skill": "应用的技能包名称，如果有相关的话"
-}}
-
-数值范围：-20到+20
-
-《君主论》核心观点参考：
-- 被人畏惧比受人爱戴更安全
-- 君主必须学会如何做不善良的事
-- 明智的君主宁可被人视为吝啬
-- 伤害人要一次做尽，恩惠要慢慢施予
-- 君主必须既是狮子又是狐狸"""
+{skill_references}"""
 
         try:
             print(f"[ChapterEngine] 分析玩家决策: {player_input[:50]}...")
             print(f"[ChapterEngine] 使用模型: {self.model}")
 
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3,
-                max_tokens=500,
-            )
-            content = response.choices[0].message.content.strip()
-            print(f"[ChapterEngine] 决策分析响应: {content[:100]}...")
-
-            json_match = re.search(r'\{[\s\S]*\}', content)
-            if json_match:
-                result = json.loads(json_match.group())
-                print(f"[ChapterEngine] 决策分析成功，影响: {result.get('impact', {})}")
-                return result
+            messages = ANALYSIS_PROMPT.messages(suffix, self.model)
+            if on_core and settings.llm_stream_analysis:
+                result = await self._stream_decision_analysis(messages, send_core)
+            else:
+                result = await self._structured_completion(
+                    "analyze_decision",
+                    DecisionAnalysis,
+                    messages,
+                    temperature=0.3,
+                    max_tokens=500,
+                )
+            print(f"[ChapterEngine] 决策分析成功，影响: {result.get('impact', {})}")
+            if cache:
+                await cache.set(cache_key, result)
+            send_core(result)
+            return result
         except Exception as e:
             print(f"[ChapterEngine] 分析决策失败: {type(e).__name__}: {e}")
             import traceback
@@ -780,7 +1269,7 @@ class ChapterEngine:
 
         # 默认分析
         print("[ChapterEngine] 使用默认决策分析结果")
-        return {
+        result = {
             "followed_advisor": "none",
             "was_violent": False,
             "was_deceptive": False,
@@ -789,6 +1278,62 @@ class ChapterEngine:
             "is_secret_action": False,
             "impact": {"authority": 0, "fear": 0, "love": 0},
         }
+        send_core(result)
+        return result
+
+    async def _stream_decision_analysis(
+        self,
+        messages: List[dict],
+        on_core: Callable[[dict], None],
+    ) -> dict:
+        """
+        以流式方式请求决策分析，边接收边解析
+
+        必需的核心字段（ANALYSIS_REQUIRED_FIELDS）到齐且通过校验时立即回调 on_core；完整输出不合格（或流式请求失败）时
+        改用非流式的结构化请求（含一次带错误信息的重试），超过截止时间时直接抛出 asyncio.TimeoutError
+        """
+        stats = get_structured_stats()
+        parser = StreamingJSONParser()
+        core_checked = False
+
+        async def on_delta(delta: str) -> None:
+            nonlocal core_checked
+            parser.feed(delta)
+            if core_checked or not all(k in parser.fields for k in ANALYSIS_REQUIRED_FIELDS):
+                return
+            core_checked = True
+            try:
+                core = validate_structured(parser.fields, DecisionAnalysis)
+            except StructuredOutputError as e:
+                print(f"[ChapterEngine] 决策分析核心字段不合格，等待完整结果: {e}")
+                return
+            print(f"[ChapterEngine] 决策分析核心字段就绪（已接收 {len(parser.text)} 字）")
+            on_core(core)
+
+        base_params = {"temperature": 0.3, "max_tokens": 500}
+        params = dict(base_params)
+        if settings.llm_json_mode and self.model not in stats.json_mode_unsupported:
+            params["response_format"] = {"type": "json_object"}
+
+        stats.calls["analyze_decision"] += 1
+        try:
+            text = await self._stream_chat("analyze_decision", messages, on_delta, **params)
+            result, repaired = parse_structured(text.strip(), DecisionAnalysis)
+        except StructuredOutputError as e:
+            stats.parse_failures["analyze_decision"] += 1
+            print(f"[ChapterEngine] 流式决策分析输出不合格，改用非流式请求: {e}")
+        except asyncio.TimeoutError:
+            # 已用完调用位置的截止时间：不再发起新的请求，由调用方使用默认分析
+            raise
+        except Exception as e:
+            print(f"[ChapterEngine] 流式决策分析失败，改用非流式请求: {type(e).__name__}: {e}")
+        else:
+            if repaired:
+                stats.repaired["analyze_decision"] += 1
+            return result
+        return await self._structured_completion(
+            "analyze_decision", DecisionAnalysis, messages, **base_params,
+        )
 
     def _check_chapter_conditions(self, game_state: GameState, chapter: Chapter) -> dict:
         """检查关卡结束条件"""
@@ -898,17 +1443,66 @@ class ChapterEngine:
         game_state: GameState,
         player_input: str,
         decision_analysis: dict,
+        stream: Optional[TurnStream] = None,
     ) -> dict:
-        """生成顾问对决策的回应"""
+        """生成顾问对决策的回应（传入 stream 时逐字推送）"""
         chapter = ChapterLibrary.get_chapter(ChapterID(game_state.current_chapter))
+        advisors = ["lion", "fox", "balance"]
 
-        responses = {}
-        for advisor in ["lion", "fox", "balance"]:
-            responses[advisor] = await self._generate_single_response(
-                advisor, game_state, player_input, decision_analysis, chapter
+        if not settings.advisor_fanout_concurrent:
+            responses = {}
+            for advisor in advisors:
+                responses[advisor] = await self._generate_single_response(
+                    advisor, game_state, player_input, decision_analysis, chapter, stream=stream
+                )
+                if stream:
+                    await stream.stage_done("advisor_response", {"advisor": advisor, "response": responses[advisor]})
+            return responses
+
+        # 并发生成：三位顾问同时请求，各自独立超时，最慢的一位到期即返回
+        results = await asyncio.gather(*[
+            self._generate_single_response_with_timeout(
+                advisor, game_state, player_input, decision_analysis, chapter, stream=stream
+            )
+            for advisor in advisors
+        ])
+
+        return dict(zip(advisors, results))
+
+    async def _generate_single_response_with_timeout(
+        self,
+        advisor: str,
+        game_state: GameState,
+        player_input: str,
+        analysis: dict,
+        chapter: Chapter,
+        stream: Optional[TurnStream] = None,
+    ) -> str:
+        """生成单个顾问的回应，超时或失败时使用默认回应"""
+        try:
+            result = await asyncio.wait_for(
+                self._generate_single_response(advisor, game_state, player_input, analysis, chapter, stream=stream),
+                timeout=settings.advisor_response_timeout,
             )
+        except asyncio.TimeoutError:
+            print(f"[ChapterEngine] {advisor} 回应超时（{settings.advisor_response_timeout}s），使用默认回应")
+            result = self._fallback_advisor_response(advisor, analysis)
+        except Exception as e:
+            print(f"[ChapterEngine] {advisor} 回应异常: {type(e).__name__}: {e}")
+            result = self._fallback_advisor_response(advisor, analysis)
+
+        if stream:
+            await stream.stage_done("advisor_response", {"advisor": advisor, "response": result})
+        return result
 
-        return responses
+    def _fallback_advisor_response(self, advisor: str, analysis: dict) -> str:
+        """顾问回应生成失败时的默认回应"""
+        if analysis.get("followed_advisor") == advisor:
+            return "明智的选择。"
+        elif analysis.get("rejected_advisor") == advisor:
+            return "……如你所愿。"
+        else:
+            return "臣领命。"
 
     async def _generate_single_response(
         self,
@@ -917,6 +1511,7 @@ class ChapterEngine:
         player_input: str,
         analysis: dict,
         chapter: Chapter,
+        stream: Optional[TurnStream] = None,
     ) -> str:
         """生成单个顾问的回应"""
         relation = game_state.relations.get(advisor)
@@ -926,13 +1521,6 @@ class ChapterEngine:
         # 检查把柄
         has_leverage = len(game_state.get_leverages_by_holder(advisor)) > 0
 
-        advisor_names = {"lion": "狮子", "fox": "狐狸", "balance": "天平"}
-        advisor_styles = {
-            "lion": "简洁有力，军人作风，直接表达态度，常引用马基雅维利关于武力和果断的观点",
-            "fox": "绵里藏针，若即若离，喜欢暗示，熟稔马基雅维利关于权谋和欺骗的智慧",
-            "balance": "客观公正，引用数据，关心民众，会从马基雅维利关于民心和稳定的角度分析",
-        }
-
         # 从 prince-skills 技能包中获取相关引用
         skills_service = get_skills_service()
 
@@ -990,50 +1578,45 @@ class ChapterEngine:
         if skill_content:
             skill_reference = f"\n\n【可参考的《君主论》技能包】\n{skill_content}"
 
-        prompt = f"""你是《君主论》博弈游戏中的{advisor_names[advisor]}顾问，深谙马基雅维利的政治智慧。
-
-你的风格：{advisor_styles[advisor]}
-你与君主的关系：信任度 {relation.trust if relation else 50}，忠诚度 {relation.loyalty if relation else 50}
+        # 人设、风格与回应规则在前缀中（每位顾问一个，可被提供方缓存），这里只填本次的局势
+        suffix = f"""你与君主的关系：信任度 {relation.trust if relation else 50}，忠诚度 {relation.loyalty if relation else 50}
 君主{"听从了你的建议" if followed else ("拒绝了你的建议" if rejected else "做出了独立决策")}
 {"你手中握有君主的把柄" if has_leverage else ""}
 
 君主的决策："{player_input}"
 决策分析：{"暴力" if analysis.get("was_violent") else ""}{"欺骗" if analysis.get("was_deceptive") else ""}{"公平" if analysis.get("was_fair") else "普通"}
-{skill_reference}
-
-请生成你的回应（2-3句话）：
-1. 表达对决策的态度
-2. 【重要】自然地引用或化用《君主论》/马基雅维利的观点来评价，可以参考："{quote}"
-3. 如果上面有【技能包】参考内容，可以将其中的策略建议融入你的评论中
-4. {"如果信任度低于0，暗示你的不满" if relation and relation.trust < 0 else ""}
-5. {"如果你有把柄，可以隐晦提及" if has_leverage else ""}
-
-注意：回应要有深度，体现出你对权谋之术的理解。"""
+可以参考的名言："{quote}"
+{skill_reference}"""
+        messages = ADVISOR_RESPONSE_PROMPTS[advisor].messages(suffix, self.model)
 
         try:
             print(f"[ChapterEngine] 生成 {advisor} 顾问回应...")
             print(f"[ChapterEngine] 使用模型: {self.model}")
             print(f"[ChapterEngine] API Key 前8位: {self.api_key[:8] if self.api_key else 'None'}...")
 
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.8,
-                max_tokens=200,
-            )
-            result = response.choices[0].message.content.strip()
+            if stream:
+                result = (await self._stream_chat(
+                    "advisor_response",
+                    messages=messages,
+                    on_delta=lambda delta: stream.advisor_delta(advisor, delta),
+                    temperature=0.8,
+                    max_tokens=200,
+                )).strip()
+            else:
+                response = await self._chat_completion(
+                    "advisor_response",
+                    messages,
+                    temperature=0.8,
+                    max_tokens=200,
+                )
+                result = response.choices[0].message.content.strip()
             print(f"[ChapterEngine] {advisor} 回应生成成功: {result[:50]}...")
             return result
         except Exception as e:
             print(f"[ChapterEngine] 生成 {advisor} 回应失败: {type(e).__name__}: {e}")
             import traceback
             traceback.print_exc()
-            if followed:
-                return "明智的选择。"
-            elif rejected:
-                return "……如你所愿。"
-            else:
-                return "臣领命。"
+            return self._fallback_advisor_response(advisor, analysis)
 
     async def generate_decree_consequences(
         self,
@@ -1132,57 +1715,49 @@ class ChapterEngine:
             print(f"[ChapterEngine] 政令内容: {player_decision[:50]}...")
             print(f"[ChapterEngine] 使用模型: {self.model}")
 
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": context_prompt}],
+            consequences_raw = await self._structured_completion(
+                "decree_consequences",
+                list[DecreeConsequence],
+                [{"role": "user", "content": context_prompt}],
                 temperature=0.7,
                 max_tokens=1200,
             )
-            content = response.choices[0].message.content.strip()
-            print(f"[ChapterEngine] 政令后果响应: {content[:100]}...")
-
-            # 提取JSON
-            json_match = re.search(r'\[[\s\S]*\]', content)
-            if json_match:
-                consequences_raw = json.loads(json_match.group())
-                print(f"[ChapterEngine] 解析到 {len(consequences_raw)} 个后果")
-
-                # 为每个后果生成唯一ID并验证格式
-                consequences = []
-                for c in consequences_raw:
-                    consequence = {
-                        "id": str(uuid.uuid4())[:8],
-                        "title": c.get("title", "未知影响"),
-                        "description": c.get("description", ""),
-                        "severity": c.get("severity", "medium"),
-                        "type": c.get("type", "political"),
-                        "potential_outcomes": c.get("potential_outcomes", []),
-                        "requires_action": c.get("requires_action", False),
-                        "deadline_turns": c.get("deadline_turns", 3) if c.get("requires_action") else None,
-                    }
-                    # 验证severity和type的值
-                    if consequence["severity"] not in ["low", "medium", "high", "critical"]:
-                        consequence["severity"] = "medium"
-                    if consequence["type"] not in ["political", "economic", "military", "social", "diplomatic"]:
-                        consequence["type"] = "political"
-                    consequences.append(consequence)
-
-                # 存储上下文以便后续连续处理
-                session_id = game_state.session_id
-                self.consequence_context[session_id] = {
-                    "original_decision": player_decision,
-                    "consequences": consequences,
-                    "chapter_context": {
-                        "name": chapter.name,
-                        "dilemma": chapter.dilemma,
-                        "background": chapter.background,
-                    },
+            print(f"[ChapterEngine] 解析到 {len(consequences_raw)} 个后果")
+
+            # 为每个后果生成唯一ID并验证格式
+            consequences = []
+            for c in consequences_raw:
+                consequence = {
+                    "id": str(uuid.uuid4())[:8],
+                    "title": c.get("title", "未知影响"),
+                    "description": c.get("description", ""),
+                    "severity": c.get("severity", "medium"),
+                    "type": c.get("type", "political"),
+                    "potential_outcomes": c.get("potential_outcomes", []),
+                    "requires_action": c.get("requires_action", False),
+                    "deadline_turns": c.get("deadline_turns", 3) if c.get("requires_action") else None,
                 }
+                # 验证severity和type的值
+                if consequence["severity"] not in ["low", "medium", "high", "critical"]:
+                    consequence["severity"] = "medium"
+                if consequence["type"] not in ["political", "economic", "military", "social", "diplomatic"]:
+                    consequence["type"] = "political"
+                consequences.append(consequence)
+
+            # 存储上下文以便后续连续处理
+            session_id = game_state.session_id
+            self.consequence_context[session_id] = {
+                "original_decision": player_decision,
+                "consequences": consequences,
+                "chapter_context": {
+                    "name": chapter.name,
+                    "dilemma": chapter.dilemma,
+                    "background": chapter.background,
+                },
+            }
 
-                print(f"[ChapterEngine] 政令后果生成成功")
-                return consequences
-            else:
-                print(f"[ChapterEngine] 无法从响应中提取JSON数组")
+            print(f"[ChapterEngine] 政令后果生成成功")
+            return consequences
 
         except Exception as e:
             print(f"[ChapterEngine] 生成政令后果失败: {type(e).__name__}: {e}")
@@ -1272,22 +1847,15 @@ class ChapterEngine:
             print(f"[ChapterEngine] 玩家应对: {player_response[:50]}...")
             print(f"[ChapterEngine] 使用模型: {self.model}")
 
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": scene_prompt}],
+            result = await self._structured_completion(
+                "continue_consequences",
+                ConsequenceFollowUp,
+                [{"role": "user", "content": scene_prompt}],
                 temperature=0.7,
                 max_tokens=600,
             )
-            content = response.choices[0].message.content.strip()
-            print(f"[ChapterEngine] 后果处理响应: {content[:100]}...")
-
-            json_match = re.search(r'\{[\s\S]*\}', content)
-            if json_match:
-                result = json.loads(json_match.group())
-                print(f"[ChapterEngine] 后果处理成功")
-                return result
-            else:
-                print(f"[ChapterEngine] 无法从响应中提取JSON")
+            print(f"[ChapterEngine] 后果处理成功")
+            return result
 
         except Exception as e:
             print(f"[ChapterEngine] 处理后果失败: {type(e).__name__}: {e}")
@@ -1388,23 +1956,16 @@ class ChapterEngine:
             print(f"[ChapterEngine] 上一轮政令: {previous_decision[:50] if previous_decision else 'None'}...")
             print(f"[ChapterEngine] 使用模型: {self.model}")
 
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
+            result = await self._structured_completion(
+                "next_round_scene",
+                NextRoundScene,
+                [{"role": "user", "content": prompt}],
                 temperature=0.7,
                 max_tokens=800,
             )
-            content = response.choices[0].message.content.strip()
-            print(f"[ChapterEngine] 新回合场景响应: {content[:100]}...")
-
-            json_match = re.search(r'\{[\s\S]*\}', content)
-            if json_match:
-                result = json.loads(json_match.group())
-                print(f"[ChapterEngine] 新回合场景生成成功")
-                print(f"[ChapterEngine] 场景更新: {result.get('scene_update', '')[:50]}...")
-                return result
-            else:
-                print(f"[ChapterEngine] 无法从响应中提取JSON")
+            print(f"[ChapterEngine] 新回合场景生成成功")
+            print(f"[ChapterEngine] 场景更新: {result.get('scene_update', '')[:50]}...")
+            return result
 
         except Exception as e:
             print(f"[ChapterEngine] 生成新回合场景失败: {type(e).__name__}: {e}")
@@ -1489,22 +2050,15 @@ class ChapterEngine:
             print(f"[ChapterEngine] 分析玩家意图: {player_message[:50]}...")
             print(f"[ChapterEngine] 使用模型: {self.model}")
 
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
+            result = await self._structured_completion(
+                "player_intent",
+                PlayerIntent,
+                [{"role": "user", "content": prompt}],
                 temperature=0.3,
                 max_tokens=400,
             )
-            content = response.choices[0].message.content.strip()
-            print(f"[ChapterEngine] 意图分析响应: {content[:100]}...")
-
-            json_match = re.search(r'\{[\s\S]*\}', content)
-            if json_match:
-                result = json.loads(json_match.group())
-                print(f"[ChapterEngine] 意图分析成功: {result.get('intent', 'unknown')}")
-                return result
-            else:
-                print(f"[ChapterEngine] 无法从响应中提取JSON")
+            print(f"[ChapterEngine] 意图分析成功: {result.get('intent', 'unknown')}")
+            return result
 
         except Exception as e:
             print(f"[ChapterEngine] 分析玩家意图失败: {type(e).__name__}: {e}")
@@ -1605,22 +2159,15 @@ class ChapterEngine:
             print(f"[ChapterEngine] 意图: {intent_analysis.get('intent', 'unknown')}")
             print(f"[ChapterEngine] 使用模型: {self.model}")
 
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
+            result = await self._structured_completion(
+                "council_response",
+                CouncilResponse,
+                [{"role": "user", "content": prompt}],
                 temperature=0.8,
                 max_tokens=600,
             )
-            content = response.choices[0].message.content.strip()
-            print(f"[ChapterEngine] 廷议回应响应: {content[:100]}...")
-
-            json_match = re.search(r'\{[\s\S]*\}', content)
-            if json_match:
-                result = json.loads(json_match.group())
-                print(f"[ChapterEngine] 廷议回应生成成功")
-                return result
-            else:
-                print(f"[ChapterEngine] 无法从响应中提取JSON")
+            print(f"[ChapterEngine] 廷议回应生成成功")
+            return result
 
         except Exception as e:
             print(f"[ChapterEngine] 生成廷议回应失败: {type(e).__name__}: {e}")
@@ -1653,6 +2200,17 @@ class ChapterEngine:
         [因果记录协议] 分析决策并生成伏笔种子
         在发布政令后的结算阶段，分析玩家决策的长远副作用
         """
+        seeds_data = await self._plan_decision_seeds(game_state, player_decision, decision_analysis, chapter)
+        return self._plant_seeds(game_state, seeds_data)
+
+    async def _plan_decision_seeds(
+        self,
+        game_state: GameState,
+        player_decision: str,
+        decision_analysis: dict,
+        chapter: Chapter,
+    ) -> List[Dict[str, Any]]:
+        """[因果系统] 调用 LLM 分析决策需要埋下的种子，返回种子数据（不修改游戏状态）"""
         # 获取当前因果上下文
         causal_context = game_state.get_causal_context_for_ai()
 
@@ -1725,45 +2283,20 @@ class ChapterEngine:
             print(f"[ChapterEngine][因果系统] 分析决策种子...")
             print(f"[ChapterEngine][因果系统] 政令: {player_decision[:50]}...")
 
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
+            result = await self._structured_completion(
+                "decision_seeds",
+                DecisionSeeds,
+                [{"role": "user", "content": prompt}],
                 temperature=0.5,
                 max_tokens=800,
             )
-            content = response.choices[0].message.content.strip()
-            print(f"[ChapterEngine][因果系统] 种子分析响应: {content[:100]}...")
-
-            json_match = re.search(r'\{[\s\S]*\}', content)
-            if json_match:
-                result = json.loads(json_match.group())
-                print(f"[ChapterEngine][因果系统] 是否需要种子: {result.get('should_plant_seed')}")
-
-                if result.get("should_plant_seed") and result.get("seeds"):
-                    # 创建实际的种子对象
-                    created_seeds = []
-                    for seed_data in result["seeds"]:
-                        seed = game_state.add_shadow_seed(
-                            description=seed_data.get("description", "未知隐患"),
-                            tag=ShadowSeedTag(seed_data.get("tag", "OTHER")),
-                            severity=ShadowSeedSeverity(seed_data.get("severity", "MEDIUM")),
-                            trigger_delay=seed_data.get("trigger_delay"),
-                            trigger_condition=seed_data.get("trigger_condition"),
-                            player_visible_hint=seed_data.get("player_visible_hint"),
-                        )
-                        created_seeds.append({
-                            "id": seed.id,
-                            "description": seed.description,
-                            "tag": seed.tag.value,
-                            "severity": seed.severity.value,
-                            "trigger_delay": seed.trigger_delay,
-                            "player_visible_hint": seed.player_visible_hint,
-                        })
-                        print(f"[ChapterEngine][因果系统] 创建种子: {seed.description[:30]}...")
-
-                    return created_seeds
-
-                return []
+            print(f"[ChapterEngine][因果系统] 是否需要种子: {result.get('should_plant_seed')}")
+
+            # 标签与严重程度已由响应模型校验
+            if result["should_plant_seed"] and result["seeds"]:
+                return result["seeds"]
+
+            return []
 
         except Exception as e:
             print(f"[ChapterEngine][因果系统] 分析种子失败: {type(e).__name__}: {e}")
@@ -1772,6 +2305,30 @@ class ChapterEngine:
 
         return []
 
+    def _plant_seeds(self, game_state: GameState, seeds_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """[因果系统] 根据分析结果创建实际的种子对象"""
+        created_seeds = []
+        for seed_data in seeds_data:
+            seed = game_state.add_shadow_seed(
+                description=seed_data.get("description", "未知隐患"),
+                tag=ShadowSeedTag(seed_data.get("tag", "OTHER")),
+                severity=ShadowSeedSeverity(seed_data.get("severity", "MEDIUM")),
+                trigger_delay=seed_data.get("trigger_delay"),
+                trigger_condition=seed_data.get("trigger_condition"),
+                player_visible_hint=seed_data.get("player_visible_hint"),
+            )
+            created_seeds.append({
+                "id": seed.id,
+                "description": seed.description,
+                "tag": seed.tag.value,
+                "severity": seed.severity.value,
+                "trigger_delay": seed.trigger_delay,
+                "player_visible_hint": seed.player_visible_hint,
+            })
+            print(f"[ChapterEngine][因果系统] 创建种子: {seed.description[:30]}...")
+
+        return created_seeds
+
     async def check_and_trigger_echoes(
         self,
         game_state: GameState,
@@ -1855,50 +2412,46 @@ class ChapterEngine:
         try:
             print(f"[ChapterEngine][因果系统] 生成回响: {seed.description[:30]}...")
 
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
+            result = await self._structured_completion(
+                "seed_echo",
+                SeedEcho,
+                [{"role": "user", "content": prompt}],
                 temperature=0.7,
                 max_tokens=600,
             )
-            content = response.choices[0].message.content.strip()
-
-            json_match = re.search(r'\{[\s\S]*\}', content)
-            if json_match:
-                result = json.loads(json_match.group())
-
-                # 在游戏状态中记录触发
-                echo = game_state.trigger_seed(
-                    seed_id=seed.id,
-                    echo_narrative=result.get("echo_narrative", "过去的决策显现了后果..."),
-                    crisis_modifier=result.get("crisis_modifier", "局势变得更加复杂"),
-                    advisor_reactions=result.get("advisor_reactions", {}),
-                )
 
-                # [即时标记系统] 根据种子类型创建即时标记
-                self._create_flag_from_seed(game_state, seed, result)
+            # 在游戏状态中记录触发
+            echo = game_state.trigger_seed(
+                seed_id=seed.id,
+                echo_narrative=result.get("echo_narrative", "过去的决策显现了后果..."),
+                crisis_modifier=result.get("crisis_modifier", "局势变得更加复杂"),
+                advisor_reactions=result.get("advisor_reactions", {}),
+            )
 
-                # 应用额外影响
-                impact = result.get("additional_impact", {})
-                if impact:
-                    game_state.power = game_state.power.apply_delta(
-                        delta_a=impact.get("authority", 0),
-                        delta_f=impact.get("fear", 0),
-                        delta_l=impact.get("love", 0),
-                    )
+            # [即时标记系统] 根据种子类型创建即时标记
+            self._create_flag_from_seed(game_state, seed, result)
 
-                print(f"[ChapterEngine][因果系统] 回响生成成功")
+            # 应用额外影响
+            impact = result["additional_impact"]
+            if any(impact.values()):
+                game_state.apply_power_delta(
+                    delta_a=impact.get("authority", 0),
+                    delta_f=impact.get("fear", 0),
+                    delta_l=impact.get("love", 0),
+                )
 
-                return {
-                    "seed_id": seed.id,
-                    "seed_description": seed.description,
-                    "origin_chapter": seed.origin_chapter,
-                    "echo_narrative": result.get("echo_narrative"),
-                    "crisis_modifier": result.get("crisis_modifier"),
-                    "advisor_reactions": result.get("advisor_reactions", {}),
-                    "trigger_chapter": chapter.id.value,
-                    "trigger_turn": game_state.total_turn,
-                }
+            print(f"[ChapterEngine][因果系统] 回响生成成功")
+
+            return {
+                "seed_id": seed.id,
+                "seed_description": seed.description,
+                "origin_chapter": seed.origin_chapter,
+                "echo_narrative": result.get("echo_narrative"),
+                "crisis_modifier": result.get("crisis_modifier"),
+                "advisor_reactions": result.get("advisor_reactions", {}),
+                "trigger_chapter": chapter.id.value,
+                "trigger_turn": game_state.total_turn,
+            }
 
         except Exception as e:
             print(f"[ChapterEngine][因果系统] 生成回响失败: {type(e).__name__}: {e}")
@@ -2028,9 +2581,9 @@ class ChapterEngine:
 直接返回新的场景描述，不要其他解释。"""
 
         try:
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
+            response = await self._chat_completion(
+                "scene_with_echoes",
+                [{"role": "user", "content": prompt}],
                 temperature=0.7,
                 max_tokens=300,
             )
@@ -3,8 +3,8 @@
 基于审计结果和角色人设生成机器人对话
 """
 from typing import Optional
-from openai import AsyncOpenAI
 from config import settings
+from llm import get_llm_client
 from skills import LionSkill, FoxSkill, BalanceSkill, AuditResult
 
 
@@ -14,10 +14,7 @@ class DialogueGenerator:
     def __init__(self, api_key: Optional[str] = None, model: Optional[str] = None):
         self.api_key = api_key or settings.openrouter_api_key
         self.model = model or settings.default_model
-        self.client = AsyncOpenAI(
-            api_key=self.api_key,
-            base_url=settings.openrouter_base_url,
-        )
+        self.client = get_llm_client(self.api_key)
 
         # 初始化 Skill 实例以获取人设
         self.skills = {
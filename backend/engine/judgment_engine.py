@@ -163,6 +163,32 @@ class JudgmentEngine:
         }
         self.interaction_history: List[str] = []  # 记录玩家偏好的顾问
 
+    # 持久化时保留的最近交互记录数（算法只用到最近 5 次）
+    MAX_INTERACTION_HISTORY = 20
+
+    def to_state(self) -> Dict[str, Any]:
+        """导出可序列化的引擎状态（与 GameState 存放在同一会话存储中）"""
+        return {
+            "causal_shadow_pool": [seed.model_dump() for seed in self.causal_shadow_pool],
+            "observation_lens": self.observation_lens.value if self.observation_lens else None,
+            "advisor_states": {
+                advisor: state.model_dump() for advisor, state in self.advisor_states.items()
+            },
+            "interaction_history": self.interaction_history[-self.MAX_INTERACTION_HISTORY:],
+        }
+
+    @classmethod
+    def from_state(cls, data: Dict[str, Any]) -> "JudgmentEngine":
+        """从 to_state 导出的状态恢复引擎"""
+        engine = cls()
+        engine.causal_shadow_pool = [CausalSeed.model_validate(s) for s in data.get("causal_shadow_pool", [])]
+        lens = data.get("observation_lens")
+        engine.observation_lens = ObservationLens(lens) if lens else None
+        for advisor, state in data.get("advisor_states", {}).items():
+            engine.advisor_states[advisor] = AdvisorState.model_validate(state)
+        engine.interaction_history = list(data.get("interaction_history", []))
+        return engine
+
     def set_observation_lens(self, lens: ObservationLens):
         """设置观测透镜"""
         self.observation_lens = lens
@@ -4,8 +4,8 @@ NLP 解析器
 """
 import json
 from typing import Optional
-from openai import AsyncOpenAI
 from config import settings
+from llm import get_llm_client
 
 
 class NLPParser:
@@ -14,10 +14,7 @@ class NLPParser:
     def __init__(self, api_key: Optional[str] = None, model: Optional[str] = None):
         self.api_key = api_key or settings.openrouter_api_key
         self.model = model or settings.default_model
-        self.client = AsyncOpenAI(
-            api_key=self.api_key,
-            base_url=settings.openrouter_base_url,
-        )
+        self.client = get_llm_client(self.api_key)
 
     async def parse(self, player_input: str) -> dict:
         """
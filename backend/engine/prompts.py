@@ -0,0 +1,113 @@
+"""
+提示词注册表
+每个提示词由版本化的固定前缀（人设、规则、输出格式，逐字不变以命中提供方的前缀缓存）
+与每次调用填入的简短动态后缀（关卡、玩家决策、关系数值等）组成。
+修改前缀时递增版本号：依赖版本的缓存（如决策分析缓存）随之失效
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+from llm.prompt_cache import prefixed_messages
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """提示词模板：固定前缀 + 动态后缀"""
+    name: str
+    version: str
+    prefix: str
+
+    @property
+    def cache_version(self) -> str:
+        """用于缓存键的版本标识"""
+        return f"{self.name}@{self.version}"
+
+    def messages(self, suffix: str, model: str) -> list[dict]:
+        """组装消息（前缀为 system，后缀为 user；模型支持时前缀标记 cache_control）"""
+        return prefixed_messages(self.prefix, suffix, model)
+
+
+_registry: dict[str, PromptTemplate] = {}
+
+
+def register_prompt(name: str, version: str, prefix: str) -> PromptTemplate:
+    """注册提示词模板（同名重复注册时覆盖）"""
+    template = PromptTemplate(name=name, version=version, prefix=prefix.strip())
+    _registry[name] = template
+    return template
+
+
+def get_prompt(name: str) -> Optional[PromptTemplate]:
+    """按名称获取提示词模板"""
+    return _registry.get(name)
+
+
+def prompt_versions() -> dict[str, str]:
+    """已注册的提示词及其版本"""
+    return {name: template.version for name, template in sorted(_registry.items())}
+
+
+# ==================== 决策分析 ====================
+
+# 字段顺序：核心字段（ANALYSIS_CORE_FIELDS）在前，流式解析时先于评语类字段就绪
+ANALYSIS_PROMPT = register_prompt("analyze_decision", "v2", """
+分析玩家在《君主论》博弈游戏中的决策。
+用户消息会给出关卡、困境、三位顾问的建议、玩家决策，以及可能相关的《君主论》策略技能包。
+
+请分析并返回JSON：
+{
+  "followed_advisor": "lion/fox/balance/none",
+  "rejected_advisor": "被明确拒绝的顾问，可为null",
+  "was_violent": true/false,
+  "was_deceptive": true/false,
+  "was_fair": true/false,
+  "contains_promise": true/false,
+  "promise_info": {"target": "承诺对象", "content": "承诺内容", "deadline": 3},
+  "is_secret_action": true/false,
+  "leak_probability": 0.3,
+  "impact": {"authority": 数值, "fear": 数值, "love": 数值},
+  "analysis": "简短分析",
+  "machiavelli_assessment": "用一句话从马基雅维利《君主论》的视角评价此决策，可参考技能包内容",
+  "prince_quote": "引用一句最相关的《君主论》名言（中文）",
+  "applied_skill": "应用的技能包名称，如果有相关的话"
+}
+
+数值范围：-20到+20
+
+《君主论》核心观点参考：
+- 被人畏惧比受人爱戴更安全
+- 君主必须学会如何做不善良的事
+- 明智的君主宁可被人视为吝啬
+- 伤害人要一次做尽，恩惠要慢慢施予
+- 君主必须既是狮子又是狐狸
+""")
+
+
+# ==================== 顾问回应 ====================
+
+ADVISOR_NAMES = {"lion": "狮子", "fox": "狐狸", "balance": "天平"}
+
+ADVISOR_STYLES = {
+    "lion": "简洁有力，军人作风，直接表达态度，常引用马基雅维利关于武力和果断的观点",
+    "fox": "绵里藏针，若即若离，喜欢暗示，熟稔马基雅维利关于权谋和欺骗的智慧",
+    "balance": "客观公正，引用数据，关心民众，会从马基雅维利关于民心和稳定的角度分析",
+}
+
+ADVISOR_RESPONSE_PROMPTS = {
+    advisor: register_prompt(f"advisor_response:{advisor}", "v1", f"""
+你是《君主论》博弈游戏中的{ADVISOR_NAMES[advisor]}顾问，深谙马基雅维利的政治智慧。
+
+你的风格：{ADVISOR_STYLES[advisor]}
+
+用户消息会给出你与君主的关系、君主的决策及其分析、可引用的名言，以及可能的技能包参考。
+请生成你的回应（2-3句话）：
+1. 表达对决策的态度
+2. 【重要】自然地引用或化用《君主论》/马基雅维利的观点来评价，可以参考给出的名言
+3. 如果有【技能包】参考内容，可以将其中的策略建议融入你的评论中
+4. 如果信任度低于0，暗示你的不满
+5. 如果你握有君主的把柄，可以隐晦提及
+
+注意：回应要有深度，体现出你对权谋之术的理解。只输出回应本身。
+""")
+    for advisor in ADVISOR_NAMES
+}
@@ -0,0 +1,140 @@
+"""
+LLM 响应模型
+ChapterEngine 各调用位置要求模型返回的 JSON 结构；校验失败时把错误发回模型重试。
+字段尽量宽松（未列出的字段保留，次要字段给默认值），只对后续逻辑依赖的字段做要求
+"""
+from typing import Optional, Union
+
+from pydantic import BaseModel, ConfigDict, Field
+
+from models.game_state import ShadowSeedSeverity, ShadowSeedTag
+
+
+Number = Union[int, float]
+
+
+class LLMResponse(BaseModel):
+    """响应模型基类：保留模型额外返回的字段"""
+    model_config = ConfigDict(extra="allow")
+
+
+class DebateLine(LLMResponse):
+    """议会辩论中的一句发言"""
+    speaker: str
+    content: str
+    target: Optional[str] = None
+
+
+class PowerImpact(LLMResponse):
+    """对三维权力的影响"""
+    authority: Number = 0
+    fear: Number = 0
+    love: Number = 0
+
+
+class PromiseInfo(LLMResponse):
+    """决策中包含的承诺（content 缺省时由调用方用玩家决策原文代替）"""
+    target: Optional[str] = "众人"
+    content: Optional[str] = None
+    deadline: Optional[int] = 3
+
+
+class DecisionAnalysis(LLMResponse):
+    """决策分析（analyze_decision）"""
+    followed_advisor: Optional[str]
+    rejected_advisor: Optional[str] = None
+    was_violent: bool = False
+    was_deceptive: bool = False
+    was_fair: bool = False
+    contains_promise: bool = False
+    promise_info: Optional[PromiseInfo] = None
+    is_secret_action: bool = False
+    leak_probability: Optional[Number] = 0.3
+    impact: PowerImpact
+    analysis: str = ""
+    machiavelli_assessment: str = ""
+    prince_quote: str = ""
+    applied_skill: Optional[str] = None
+
+
+class CrisisResolution(LLMResponse):
+    """危机解决判断（crisis_resolution）"""
+    resolved_crisis_ids: list[str] = Field(default_factory=list)
+    reasoning: str = ""
+
+
+class DecreeConsequence(LLMResponse):
+    """政令的一项后续影响（decree_consequences）；取值在生成后再规范化"""
+    title: str
+    description: str = ""
+    severity: str = "medium"
+    type: str = "political"
+    potential_outcomes: list[str] = Field(default_factory=list)
+    requires_action: bool = False
+    deadline_turns: Optional[int] = 3
+
+
+class ConsequenceFollowUp(LLMResponse):
+    """玩家应对后果后的新局势（continue_consequences）"""
+    scene_update: str
+    advisor_comments: dict[str, str] = Field(default_factory=dict)
+    consequence_resolved: bool = True
+    new_developments: list[str] = Field(default_factory=list)
+
+
+class AdvisorComment(LLMResponse):
+    """顾问对上轮政令的评价"""
+    stance: str = "观望"
+    comment: str = ""
+    suggestion: str = ""
+
+
+class NextRoundScene(LLMResponse):
+    """新回合场景（next_round_scene）"""
+    scene_update: str
+    new_dilemma: str = ""
+    advisor_comments: dict[str, AdvisorComment] = Field(default_factory=dict)
+
+
+class PlayerIntent(LLMResponse):
+    """廷议中玩家发言的意图（player_intent）"""
+    intent: str
+    target: str = "all"
+    tone: str = "neutral"
+    summary: str = ""
+    triggers_conflict: bool = False
+    suggested_reactions: dict[str, str] = Field(default_factory=dict)
+
+
+class CouncilResponse(LLMResponse):
+    """顾问的廷议回应（council_response）"""
+    responses: dict[str, str]
+    conflict_triggered: bool = False
+    conflict_description: Optional[str] = ""
+    trust_changes: dict[str, Number] = Field(default_factory=dict)
+    atmosphere: str = "neutral"
+
+
+class SeedPlan(LLMResponse):
+    """决策埋下的一颗因果种子"""
+    tag: ShadowSeedTag = ShadowSeedTag.OTHER
+    description: str
+    player_visible_hint: Optional[str] = None
+    severity: ShadowSeedSeverity = ShadowSeedSeverity.MEDIUM
+    trigger_delay: Optional[int] = None
+    trigger_condition: Optional[str] = None
+
+
+class DecisionSeeds(LLMResponse):
+    """决策的因果种子分析（decision_seeds）"""
+    should_plant_seed: bool
+    seeds: list[SeedPlan] = Field(default_factory=list)
+    analysis: str = ""
+
+
+class SeedEcho(LLMResponse):
+    """种子触发时的因果回响（seed_echo）"""
+    echo_narrative: str
+    crisis_modifier: str = "局势变得更加复杂"
+    advisor_reactions: dict[str, str] = Field(default_factory=dict)
+    additional_impact: PowerImpact = Field(default_factory=PowerImpact)
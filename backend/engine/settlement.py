@@ -50,7 +50,7 @@ class SettlementEngine:
 
         # 1. 应用权力数值变化
         total_delta = audit_summary["total_delta"]
-        game_state.power = game_state.power.apply_delta(
+        game_state.apply_power_delta(
             delta_a=total_delta["authority"],
             delta_f=total_delta["fear"],
             delta_l=total_delta["love"],
@@ -137,7 +137,7 @@ class SettlementEngine:
         impact = event.get_choice_impacts(choice_id)
 
         # 应用影响
-        game_state.power = game_state.power.apply_delta(
+        game_state.apply_power_delta(
             delta_a=impact.get("authority", 0),
             delta_f=impact.get("fear", 0),
             delta_l=impact.get("love", 0),
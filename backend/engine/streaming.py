@@ -0,0 +1,42 @@
+"""
+流式推送通道
+把 LLM 的增量输出与阶段完成事件以带类型的帧转发给前端
+"""
+from typing import Any, Awaitable, Callable, Optional
+
+
+class TurnStream:
+    """
+    回合流式推送通道
+
+    帧格式：
+    - {"type": "narration_delta", "stage": 阶段名, "delta": 文本增量}
+    - {"type": "advisor_delta", "advisor": lion/fox/balance, "delta": 文本增量}
+    - {"type": "stage_done", "stage": 阶段名, "data": 阶段结果}
+    """
+
+    def __init__(self, send: Callable[[dict], Awaitable[Any]]):
+        self._send = send
+        self.closed = False
+
+    async def send(self, frame: dict) -> None:
+        """发送一帧；连接断开后静默丢弃，不影响回合本身的结算"""
+        if self.closed:
+            return
+        try:
+            await self._send(frame)
+        except Exception as e:
+            self.closed = True
+            print(f"[TurnStream] 推送失败，停止推送: {type(e).__name__}: {e}")
+
+    async def narration_delta(self, delta: str, stage: str = "opening_narration") -> None:
+        await self.send({"type": "narration_delta", "stage": stage, "delta": delta})
+
+    async def advisor_delta(self, advisor: str, delta: str) -> None:
+        await self.send({"type": "advisor_delta", "advisor": advisor, "delta": delta})
+
+    async def stage_done(self, stage: str, data: Optional[Any] = None) -> None:
+        frame = {"type": "stage_done", "stage": stage}
+        if data is not None:
+            frame["data"] = data
+        await self.send(frame)
@@ -0,0 +1,167 @@
+"""
+回合流水线调度器
+按依赖关系调度一个回合内的各个阶段，互不依赖的阶段并发执行
+
+每个阶段分为两部分：
+- run: 异步计算（通常是 LLM 调用），只读取游戏状态，不做修改
+- apply: 把计算结果写入游戏状态，严格按阶段声明顺序执行，保证状态变更的确定性
+"""
+import asyncio
+import inspect
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+
+StageRun = Callable[[Dict[str, Any]], Awaitable[Any]]
+StageApply = Callable[[Any, Dict[str, Any]], Any]
+StageDoneHook = Callable[[str, Any], Awaitable[None]]
+
+
+@dataclass
+class TurnStage:
+    """流水线阶段定义"""
+    name: str
+    run: Optional[StageRun] = None  # 异步计算，参数为已完成阶段的结果
+    deps: tuple = ()  # 依赖的阶段名
+    apply: Optional[StageApply] = None  # 状态变更，参数为 (run 的结果, 已完成阶段的结果)，返回值作为阶段结果
+
+
+@dataclass
+class StageTiming:
+    """阶段耗时记录（毫秒，相对流水线开始）"""
+    run_start: float = 0.0
+    run_end: float = 0.0
+    apply_start: float = 0.0
+    end: float = 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "start_ms": round(self.run_start, 1),
+            "end_ms": round(self.end, 1),
+            "duration_ms": round(self.run_end - self.run_start, 1),
+            "apply_wait_ms": round(self.apply_start - self.run_end, 1),
+        }
+
+
+@dataclass
+class PipelineResult:
+    """流水线执行结果"""
+    results: Dict[str, Any] = field(default_factory=dict)
+    timings: Dict[str, StageTiming] = field(default_factory=dict)
+    total_ms: float = 0.0
+    critical_path: List[str] = field(default_factory=list)
+
+    def timings_summary(self) -> dict:
+        """生成可返回给前端的耗时摘要"""
+        return {
+            "total_ms": round(self.total_ms, 1),
+            "stages": {name: t.to_dict() for name, t in self.timings.items()},
+            "critical_path": self.critical_path,
+        }
+
+
+class TurnPipeline:
+    """回合流水线 - 一个简单的 DAG 调度器"""
+
+    def __init__(self, on_stage_done: Optional[StageDoneHook] = None):
+        self._stages: List[TurnStage] = []
+        # 每个阶段提交完成后回调 (阶段名, 阶段结果)，用于流式推送
+        self.on_stage_done = on_stage_done
+
+    def add_stage(
+        self,
+        name: str,
+        run: Optional[StageRun] = None,
+        deps: tuple = (),
+        apply: Optional[StageApply] = None,
+    ) -> "TurnPipeline":
+        """
+        声明一个阶段
+
+        依赖必须是已声明的阶段，因此声明顺序即为一个合法的拓扑序，
+        apply 也按此顺序依次提交。
+        """
+        declared = {s.name for s in self._stages}
+        if name in declared:
+            raise ValueError(f"阶段重复声明: {name}")
+        for dep in deps:
+            if dep not in declared:
+                raise ValueError(f"阶段 {name} 依赖未声明的阶段: {dep}")
+        self._stages.append(TurnStage(name=name, run=run, deps=tuple(deps), apply=apply))
+        return self
+
+    async def execute(self) -> PipelineResult:
+        """执行流水线，返回各阶段结果与耗时"""
+        result = PipelineResult()
+        started = time.perf_counter()
+
+        def now_ms() -> float:
+            return (time.perf_counter() - started) * 1000
+
+        done: Dict[str, asyncio.Event] = {s.name: asyncio.Event() for s in self._stages}
+
+        async def run_stage(index: int, stage: TurnStage):
+            timing = StageTiming()
+            result.timings[stage.name] = timing
+
+            for dep in stage.deps:
+                await done[dep].wait()
+
+            timing.run_start = now_ms()
+            value = await stage.run(result.results) if stage.run else None
+            timing.run_end = now_ms()
+
+            # 状态变更按声明顺序提交
+            if index > 0:
+                await done[self._stages[index - 1].name].wait()
+            timing.apply_start = now_ms()
+            if stage.apply:
+                value = stage.apply(value, result.results)
+                if inspect.isawaitable(value):
+                    value = await value
+            timing.end = now_ms()
+
+            result.results[stage.name] = value
+            if self.on_stage_done:
+                await self.on_stage_done(stage.name, value)
+            done[stage.name].set()
+
+        tasks = [asyncio.create_task(run_stage(i, s)) for i, s in enumerate(self._stages)]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+        result.total_ms = now_ms()
+        result.critical_path = self._critical_path(result.timings)
+        return result
+
+    def _critical_path(self, timings: Dict[str, StageTiming]) -> List[str]:
+        """从最晚结束的阶段回溯，找出决定回合总耗时的阶段链"""
+        if not self._stages:
+            return []
+
+        index_of = {s.name: i for i, s in enumerate(self._stages)}
+        current = max(self._stages, key=lambda s: timings[s.name].end)
+        path = [current.name]
+
+        while True:
+            timing = timings[current.name]
+            index = index_of[current.name]
+            previous = self._stages[index - 1] if index > 0 else None
+
+            # 计算完成时前一个阶段尚未提交，说明瓶颈是前一个阶段
+            if previous and timings[previous.name].end > timing.run_end:
+                current = previous
+            elif current.deps:
+                slowest_dep = max(current.deps, key=lambda d: timings[d].end)
+                current = self._stages[index_of[slowest_dep]]
+            else:
+                break
+            path.append(current.name)
+
+        path.reverse()
+        return path
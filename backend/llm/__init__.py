@@ -0,0 +1,36 @@
+from .client_pool import LLMClientPool, get_llm_pool, get_llm_client
+from .single_flight import SingleFlight, get_single_flight, make_request_key
+from .scheduler import LLMScheduler, get_llm_scheduler
+from .hedging import CallBudget, hedged_call, get_hedge_stats
+from .structured import StructuredOutputError, parse_structured, repair_json, get_structured_stats
+from .prompt_cache import get_prompt_cache_stats, prefixed_messages, supports_cache_control
+from .circuit_breaker import CircuitBreaker, CircuitOpenError, get_circuit_breakers
+from .cassette import Cassette, CassetteMissError, CassetteTransport, get_cassette
+
+__all__ = [
+    "LLMClientPool",
+    "get_llm_pool",
+    "get_llm_client",
+    "SingleFlight",
+    "get_single_flight",
+    "make_request_key",
+    "LLMScheduler",
+    "get_llm_scheduler",
+    "CallBudget",
+    "hedged_call",
+    "get_hedge_stats",
+    "StructuredOutputError",
+    "parse_structured",
+    "repair_json",
+    "get_structured_stats",
+    "get_prompt_cache_stats",
+    "prefixed_messages",
+    "supports_cache_control",
+    "CircuitBreaker",
+    "CircuitOpenError",
+    "get_circuit_breakers",
+    "Cassette",
+    "CassetteMissError",
+    "CassetteTransport",
+    "get_cassette",
+]
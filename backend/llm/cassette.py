@@ -0,0 +1,329 @@
+"""
+LLM 流量录制与回放（cassette）
+挂在共享 httpx 客户端下的传输层：录制模式把每次请求/响应连同各数据块的到达时间写入 JSONL 文件，
+回放模式按 (模型, 消息, 参数) 的稳定哈希取回录制的响应，按原始或缩放后的延迟返回
+"""
+import asyncio
+import codecs
+import difflib
+import hashlib
+import json
+import os
+import time
+from collections import defaultdict, deque
+from typing import Any, Optional
+
+import httpx
+
+from config import settings
+
+
+# 不写入录音的响应头（由传输层重新计算或与连接相关）
+_SKIPPED_HEADERS = {"content-length", "content-encoding", "transfer-encoding", "connection", "keep-alive"}
+# 写入录音前脱敏的请求字段
+_SECRET_FIELDS = ("api_key",)
+
+
+class CassetteMissError(httpx.TransportError):
+    """回放模式下录音中没有对应的请求"""
+
+
+def cassette_key(body: Any) -> str:
+    """
+    请求的稳定哈希：请求体（模型、消息与全部参数）键排序后序列化
+
+    不含 base_url 与 API Key，线上录制的录音可以在本地以任意地址与 Key 回放
+    """
+    payload = json.dumps(body, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def redact_secrets(body: Any) -> Any:
+    """把请求体中的 API Key 换成稳定的假名（同一个 Key 得到同一个假名，回放时仍能区分玩家）"""
+    if not isinstance(body, dict):
+        return body
+    redacted = dict(body)
+    for name in _SECRET_FIELDS:
+        value = redacted.get(name)
+        if isinstance(value, str) and value:
+            redacted[name] = "sk-replay-" + hashlib.sha256(value.encode("utf-8")).hexdigest()[:12]
+    return redacted
+
+
+class Cassette:
+    """
+    录音文件
+
+    每行一条 JSON 记录：
+    - {"type": "llm", ...}：一次上游 LLM 请求，chunks 为 [[距请求开始的秒数, 文本], ...]
+    - {"type": "api", ...}：一次游戏接口调用（由 main 的中间件写入），用于回放整局会话
+    录制模式追加写入；回放模式启动时载入，相同哈希的多次请求按录制顺序依次返回。
+    提示词含随机内容（随机引用的名言、新生成的危机 ID）时哈希对不上，
+    退而选参数相同、消息文本最相似（相似度不低于 fuzzy_threshold）的录制请求
+    """
+
+    fuzzy_threshold = 0.9
+
+    def __init__(self, path: str, mode: str, latency_scale: float = 1.0):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"未知的录音模式: {mode}")
+        self.path = path
+        self.mode = mode
+        self.latency_scale = max(0.0, latency_scale)
+        self.api_calls: list[dict] = []
+        self._llm: dict[str, deque] = defaultdict(deque)
+        self._entries: list[dict] = []  # 全部 LLM 记录（近似匹配时遍历）
+        self._used: set[int] = set()  # 已回放过的记录（按 id）
+        self._last: dict[str, dict] = {}
+        self._file = None
+        self.stats_counter: dict[str, int] = defaultdict(int)
+        if mode == "replay":
+            self._load()
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    def _load(self) -> None:
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if entry.get("type") == "api":
+                    self.api_calls.append(entry)
+                else:
+                    self._llm[entry["key"]].append(entry)
+                    self._entries.append(entry)
+        print(f"[Cassette] 已载入 {sum(len(v) for v in self._llm.values())} 条 LLM 记录、"
+              f"{len(self.api_calls)} 次接口调用: {self.path}")
+
+    def _write(self, entry: dict) -> None:
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def record_llm(self, key: str, path: str, body: Any, status: int, headers: dict, chunks: list) -> None:
+        """写入一次完整的 LLM 请求"""
+        self._write({
+            "type": "llm",
+            "key": key,
+            "path": path,
+            "model": body.get("model") if isinstance(body, dict) else None,
+            "request": body,
+            "status": status,
+            "headers": headers,
+            "chunks": chunks,
+            "latency": chunks[-1][0] if chunks else 0.0,
+        })
+        self.stats_counter["recorded"] += 1
+
+    def record_api(self, method: str, path: str, body: Any, status: int, response: Any, elapsed: float) -> None:
+        """写入一次游戏接口调用（请求体中的 API Key 已脱敏）"""
+        self._write({
+            "type": "api",
+            "method": method,
+            "path": path,
+            "body": redact_secrets(body),
+            "status": status,
+            "response": response,
+            "elapsed": round(elapsed, 6),
+        })
+        self.stats_counter["api_recorded"] += 1
+
+    def next_llm(self, key: str, body: Any = None) -> Optional[dict]:
+        """
+        取出请求对应的下一条录制响应
+
+        同一请求被调用的次数多于录制次数时重复返回最后一条；哈希未命中时按 body 近似匹配，
+        仍找不到时返回 None
+        """
+        queue = self._llm.get(key)
+        while queue and id(queue[0]) in self._used:
+            queue.popleft()
+        if queue:
+            entry = queue.popleft()
+            self._used.add(id(entry))
+            self._last[key] = entry
+            self.stats_counter["replayed"] += 1
+            return entry
+        entry = self._last.get(key)
+        if entry is not None:
+            self.stats_counter["replayed_repeat"] += 1
+            return entry
+        entry = self._fuzzy_match(body) if isinstance(body, dict) else None
+        if entry is not None:
+            self._used.add(id(entry))
+            self._last[key] = entry
+            self.stats_counter["replayed_fuzzy"] += 1
+            return entry
+        self.stats_counter["misses"] += 1
+        return None
+
+    def _fuzzy_match(self, body: dict) -> Optional[dict]:
+        """在参数（除 messages 外的字段）相同的录制请求中找消息文本最相似的，优先未回放过的"""
+        params = {k: v for k, v in body.items() if k != "messages"}
+        text = json.dumps(body.get("messages"), ensure_ascii=False)
+        candidates = []
+        for entry in self._entries:
+            request = entry["request"]
+            if {k: v for k, v in request.items() if k != "messages"} != params:
+                continue
+            matcher = difflib.SequenceMatcher(None, json.dumps(request.get("messages"), ensure_ascii=False), text)
+            if matcher.quick_ratio() >= self.fuzzy_threshold:
+                candidates.append((id(entry) not in self._used, matcher, entry))
+        # quick_ratio 只是上界，按它粗排后对前几个计算准确的相似度
+        candidates.sort(key=lambda c: (c[0], c[1].quick_ratio()), reverse=True)
+        best, best_ratio = None, self.fuzzy_threshold
+        for unused, matcher, entry in candidates[:8]:
+            ratio = matcher.ratio()
+            if ratio >= best_ratio:
+                best, best_ratio = entry, ratio
+                if unused:
+                    break
+        return best
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "path": self.path,
+            "latency_scale": self.latency_scale,
+            **self.stats_counter,
+        }
+
+
+class _RecordingStream(httpx.AsyncByteStream):
+    """边转发上游响应边记录各数据块的到达时间，完整读完后写入录音"""
+
+    def __init__(self, stream: httpx.AsyncByteStream, on_complete, started: float):
+        self._stream = stream
+        self._on_complete = on_complete
+        self._started = started
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._chunks: list[list] = []
+        self._recorded = False
+
+    def _append(self, text: str) -> None:
+        if text:
+            self._chunks.append([round(time.perf_counter() - self._started, 6), text])
+
+    def _finish(self) -> None:
+        if not self._recorded:
+            self._recorded = True
+            self._on_complete(self._chunks)
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            self._append(self._decoder.decode(chunk))
+            yield chunk
+        self._append(self._decoder.decode(b"", final=True))
+        self._finish()
+
+    async def aclose(self) -> None:
+        # OpenAI SDK 读到 SSE 的 [DONE] 后即关闭响应，此时内容已完整；
+        # 其他中途关闭（如对冲请求中落败的一方被取消）的响应不完整，不写入录音
+        if "data: [DONE]" in "".join(text for _, text in self._chunks[-2:]):
+            self._finish()
+        await self._stream.aclose()
+
+
+class _ReplayStream(httpx.AsyncByteStream):
+    """按录制时的到达时间（乘以缩放系数）依次返回数据块"""
+
+    def __init__(self, chunks: list, started: float, latency_scale: float):
+        self._chunks = chunks
+        self._started = started
+        self._scale = latency_scale
+
+    async def __aiter__(self):
+        for offset, text in self._chunks:
+            if self._scale > 0:
+                delay = self._started + offset * self._scale - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            yield text.encode("utf-8")
+
+
+class CassetteTransport(httpx.AsyncBaseTransport):
+    """
+    录制/回放传输层
+
+    只处理带 JSON 请求体的 POST（chat/completions 等）；其他请求在录制模式下直接转发，
+    在回放模式下视为未录制。回放时找不到录音抛出 CassetteMissError，
+    由调用方按网络错误处理（ChapterEngine 会回退到预设文本）
+    """
+
+    def __init__(self, cassette: Cassette, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.cassette = cassette
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        body = None
+        if request.method == "POST":
+            try:
+                body = json.loads(await request.aread())
+            except ValueError:
+                body = None
+        path = request.url.path
+
+        if self.cassette.mode == "replay":
+            entry = self.cassette.next_llm(cassette_key(body), body) if body is not None else None
+            if entry is None:
+                model = body.get("model") if isinstance(body, dict) else None
+                raise CassetteMissError(f"录音中没有该请求: {request.method} {path} (model={model})", request=request)
+            return httpx.Response(
+                entry["status"],
+                headers=entry["headers"],
+                stream=_ReplayStream(entry["chunks"], started, self.cassette.latency_scale),
+                request=request,
+            )
+
+        if body is None:
+            return await self.transport.handle_async_request(request)
+
+        # 录制时请求不压缩的响应，录音中保存可读的文本
+        request.headers["accept-encoding"] = "identity"
+        response = await self.transport.handle_async_request(request)
+        key = cassette_key(body)
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in _SKIPPED_HEADERS}
+
+        def on_complete(chunks: list) -> None:
+            self.cassette.record_llm(key, path, body, response.status_code, headers, chunks)
+
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=_RecordingStream(response.stream, on_complete, started),
+            request=request,
+            extensions=response.extensions,
+        )
+
+    async def aclose(self) -> None:
+        if self.transport is not None:
+            await self.transport.aclose()
+
+
+# 单例实例
+_cassette: Optional[Cassette] = None
+
+
+def get_cassette() -> Optional[Cassette]:
+    """获取录音单例；未开启录制/回放（llm_cassette_mode=off）时返回 None"""
+    global _cassette
+    if _cassette is None and settings.llm_cassette_mode in ("record", "replay"):
+        _cassette = Cassette(
+            settings.llm_cassette_path,
+            settings.llm_cassette_mode,
+            latency_scale=settings.llm_cassette_latency_scale,
+        )
+    return _cassette
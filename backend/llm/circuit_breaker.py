@@ -0,0 +1,230 @@
+"""
+LLM 熔断器
+按模型统计最近一段时间内上游调用的失败率与慢调用率：超过阈值时熔断（open），
+熔断期间的调用立即抛出 CircuitOpenError，调用方直接回退到预设结果，不再等待上游超时；
+熔断一段时间后进入半开（half_open），放行少量探测请求，全部成功则恢复（closed），否则重新熔断
+"""
+import asyncio
+import time
+from collections import Counter, deque
+from typing import Optional
+
+import httpx
+from openai import APIConnectionError, APIStatusError
+
+from config import settings
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """熔断期间拒绝的调用"""
+
+
+def is_provider_failure(error: BaseException) -> bool:
+    """是否为上游服务的故障（连接失败、超时、5xx）；4xx（含 429 限流）属于请求本身的问题，不计入"""
+    if isinstance(error, (asyncio.TimeoutError, httpx.TransportError, APIConnectionError)):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code >= 500
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    return False
+
+
+class _BreakerCall:
+    """一次经熔断器放行的调用（with 语句块内为上游请求）"""
+
+    def __init__(self, breaker: "CircuitBreaker", probe: bool):
+        self.breaker = breaker
+        self.probe = probe
+        self.started = 0.0
+
+    def __enter__(self) -> "_BreakerCall":
+        self.started = self.breaker.clock()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        elapsed = self.breaker.clock() - self.started
+        slow = elapsed >= self.breaker.slow_call
+        if exc_type is None:
+            self.breaker.record(self.probe, failed=False, slow=slow)
+        elif issubclass(exc_type, asyncio.CancelledError):
+            # 被取消（对冲落败、截止时间到）：已经很慢的算慢调用，否则不计
+            if slow:
+                self.breaker.record(self.probe, failed=False, slow=True)
+            else:
+                self.breaker.release(self.probe)
+        elif is_provider_failure(exc):
+            self.breaker.record(self.probe, failed=True, slow=slow)
+        else:
+            self.breaker.release(self.probe)
+        return False
+
+
+class CircuitBreaker:
+    """单个模型的熔断器"""
+
+    def __init__(
+        self,
+        name: str,
+        window: float = 30.0,
+        min_calls: int = 10,
+        error_rate: float = 0.5,
+        slow_call: float = 20.0,
+        slow_rate: float = 0.8,
+        open_duration: float = 30.0,
+        half_open_calls: int = 3,
+        clock=time.monotonic,
+    ):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call = slow_call
+        self.slow_rate = slow_rate
+        self.open_duration = open_duration
+        self.half_open_calls = half_open_calls
+        self.clock = clock
+
+        self.state = CLOSED
+        self._outcomes: deque[tuple[float, bool, bool]] = deque()  # (时间, 失败, 慢调用)
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self.rejected = 0
+        self.transitions: Counter = Counter()
+        self.history: deque[dict] = deque(maxlen=20)
+
+    def _transition(self, state: str, reason: str) -> None:
+        previous, self.state = self.state, state
+        self.transitions[f"{previous}->{state}"] += 1
+        self.history.append({"from": previous, "to": state, "at": time.time(), "reason": reason})
+        print(f"[CircuitBreaker] {self.name}: {previous} -> {state}（{reason}）")
+        if state == OPEN:
+            self._opened_at = self.clock()
+        elif state == HALF_OPEN:
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+        elif state == CLOSED:
+            self._outcomes.clear()
+
+    def _prune(self, now: float) -> None:
+        while self._outcomes and now - self._outcomes[0][0] > self.window:
+            self._outcomes.popleft()
+
+    def check(self) -> None:
+        """熔断中（且未到半开时间）时抛出 CircuitOpenError；不占用半开探测名额"""
+        if self.state == OPEN and self.clock() - self._opened_at < self.open_duration:
+            self.rejected += 1
+            raise CircuitOpenError(f"模型 {self.name} 已熔断")
+
+    def call(self) -> _BreakerCall:
+        """申请放行一次调用，返回包裹上游请求的上下文；不放行时抛出 CircuitOpenError"""
+        if self.state == OPEN:
+            if self.clock() - self._opened_at < self.open_duration:
+                self.rejected += 1
+                raise CircuitOpenError(f"模型 {self.name} 已熔断")
+            self._transition(HALF_OPEN, "熔断时间已到，开始探测")
+        if self.state == HALF_OPEN:
+            if self._probes_in_flight >= self.half_open_calls:
+                self.rejected += 1
+                raise CircuitOpenError(f"模型 {self.name} 正在探测恢复")
+            self._probes_in_flight += 1
+            return _BreakerCall(self, probe=True)
+        return _BreakerCall(self, probe=False)
+
+    def release(self, probe: bool) -> None:
+        """不计入统计的调用结束（请求本身的错误、很快被取消）"""
+        if probe and self.state == HALF_OPEN:
+            self._probes_in_flight -= 1
+
+    def record(self, probe: bool, failed: bool, slow: bool) -> None:
+        """记录一次调用的结果并按需切换状态"""
+        if self.state == HALF_OPEN:
+            if not probe:
+                return
+            self._probes_in_flight -= 1
+            if failed or slow:
+                self._transition(OPEN, "探测请求" + ("失败" if failed else "过慢"))
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_calls:
+                self._transition(CLOSED, "探测请求全部成功")
+            return
+        if self.state != CLOSED:
+            return
+
+        now = self.clock()
+        self._outcomes.append((now, failed, slow))
+        self._prune(now)
+        calls = len(self._outcomes)
+        if calls < self.min_calls:
+            return
+        failures = sum(1 for _, f, _ in self._outcomes if f)
+        slows = sum(1 for _, _, s in self._outcomes if s)
+        if failures / calls >= self.error_rate:
+            self._transition(OPEN, f"失败率 {failures}/{calls}")
+        elif slows / calls >= self.slow_rate:
+            self._transition(OPEN, f"慢调用率 {slows}/{calls}")
+
+    def stats(self) -> dict:
+        self._prune(self.clock())
+        calls = len(self._outcomes)
+        return {
+            "state": self.state,
+            "window_calls": calls,
+            "error_rate": round(sum(1 for _, f, _ in self._outcomes if f) / calls, 4) if calls else 0.0,
+            "slow_rate": round(sum(1 for _, _, s in self._outcomes if s) / calls, 4) if calls else 0.0,
+            "rejected": self.rejected,
+            "transitions": dict(self.transitions),
+            "history": list(self.history),
+        }
+
+
+class CircuitBreakerRegistry:
+    """按模型名管理熔断器"""
+
+    def __init__(self, enabled: bool = True, **options):
+        self.enabled = enabled
+        self.options = options
+        self._breakers: dict[str, CircuitBreaker] = {}
+
+    def get(self, model: str) -> Optional[CircuitBreaker]:
+        """获取模型的熔断器；未启用时返回 None"""
+        if not self.enabled:
+            return None
+        breaker = self._breakers.get(model)
+        if breaker is None:
+            breaker = self._breakers[model] = CircuitBreaker(model, **self.options)
+        return breaker
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "breakers": {name: breaker.stats() for name, breaker in self._breakers.items()},
+        }
+
+
+# 单例实例
+_circuit_breakers: Optional[CircuitBreakerRegistry] = None
+
+
+def get_circuit_breakers() -> CircuitBreakerRegistry:
+    """获取熔断器注册表单例"""
+    global _circuit_breakers
+    if _circuit_breakers is None:
+        _circuit_breakers = CircuitBreakerRegistry(
+            enabled=settings.llm_breaker_enabled,
+            window=settings.llm_breaker_window,
+            min_calls=settings.llm_breaker_min_calls,
+            error_rate=settings.llm_breaker_error_rate,
+            slow_call=settings.llm_breaker_slow_call,
+            slow_rate=settings.llm_breaker_slow_rate,
+            open_duration=settings.llm_breaker_open_duration,
+            half_open_calls=settings.llm_breaker_half_open_calls,
+        )
+    return _circuit_breakers
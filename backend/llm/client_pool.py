@@ -0,0 +1,245 @@
+"""
+LLM 客户端连接池
+进程级共享的 OpenRouter 客户端注册表，按 (base_url, api_key) 复用连接
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional
+
+import httpx
+from openai import AsyncOpenAI
+
+from config import settings
+from .cassette import CassetteTransport, get_cassette
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """响应流关闭时归还在途计数"""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release):
+        self._stream = stream
+        self._release = release
+        self._released = False
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._released:
+                self._released = True
+                self._release()
+
+
+class _UsageTrackingTransport(httpx.AsyncBaseTransport):
+    """统计客户端的在途请求（含未读完的响应流）与最近一次请求结束的时间"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self.transport = transport
+        self.in_flight = 0
+        self.last_release = time.monotonic()
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        self.last_release = time.monotonic()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.in_flight += 1
+        try:
+            response = await self.transport.handle_async_request(request)
+        except BaseException:
+            self._release()
+            raise
+        response.stream = _ReleasingStream(response.stream, self._release)
+        return response
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+@dataclass
+class PooledClient:
+    """连接池中的一个客户端条目"""
+    http_client: httpx.AsyncClient
+    openai_client: AsyncOpenAI
+    usage: _UsageTrackingTransport
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class LLMClientPool:
+    """
+    LLM 客户端注册表
+
+    - 同一 (base_url, api_key) 共享一个 httpx.AsyncClient，复用 TLS 连接
+    - 连接数有上限，启用 HTTP/2（安装了 h2 时）与 keep-alive
+    - 长时间未使用的客户端会被淘汰；客户端总数超过上限时淘汰最久未用的
+    - 被淘汰的客户端可能仍被某个回合的 ChapterEngine 持有：等它没有在途请求、
+      且最后一次请求结束后空闲 close_grace 秒才关闭，避免回合中途出现 "client has been closed"
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 60.0,
+        idle_ttl: float = 600.0,
+        max_clients: int = 256,
+        timeout: float = 60.0,
+        http2: bool = True,
+        close_grace: float = 60.0,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.idle_ttl = idle_ttl
+        self.max_clients = max_clients
+        self.timeout = timeout
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.close_grace = close_grace
+        self._closing: set[asyncio.Task] = set()  # 等待空闲后关闭的客户端
+        self._closing_entries: dict[asyncio.Task, PooledClient] = {}
+        self._clients: OrderedDict[tuple[str, str], PooledClient] = OrderedDict()
+        self._evicted_total = 0
+
+    def get_client(self, api_key: str, base_url: Optional[str] = None) -> AsyncOpenAI:
+        """获取共享的 AsyncOpenAI 客户端"""
+        return self._get_entry(api_key, base_url).openai_client
+
+    def get_http_client(self, api_key: str, base_url: Optional[str] = None) -> httpx.AsyncClient:
+        """获取共享的底层 httpx 客户端（用于直接调用 REST 接口）"""
+        return self._get_entry(api_key, base_url).http_client
+
+    def _get_entry(self, api_key: str, base_url: Optional[str]) -> PooledClient:
+        key = (base_url or settings.openrouter_base_url, api_key)
+        now = time.monotonic()
+        self._evict_idle(now)
+
+        entry = self._clients.get(key)
+        if entry is None:
+            transport: httpx.AsyncBaseTransport = httpx.AsyncHTTPTransport(http2=self.http2, limits=self.limits)
+            # 开启录制/回放时在真实传输层外包一层录音
+            cassette = get_cassette()
+            if cassette is not None:
+                transport = CassetteTransport(cassette, transport)
+            usage = _UsageTrackingTransport(transport)
+            http_client = httpx.AsyncClient(timeout=self.timeout, transport=usage)
+            entry = PooledClient(
+                http_client=http_client,
+                openai_client=AsyncOpenAI(
+                    api_key=api_key,
+                    base_url=key[0],
+                    http_client=http_client,
+                ),
+                usage=usage,
+            )
+            self._clients[key] = entry
+
+            # 超过客户端数量上限，淘汰最久未使用的
+            while len(self._clients) > self.max_clients:
+                _, oldest = self._clients.popitem(last=False)
+                self._close_later(oldest)
+        else:
+            self._clients.move_to_end(key)
+
+        entry.last_used = now
+        return entry
+
+    def _evict_idle(self, now: float) -> None:
+        """淘汰空闲超时的客户端（OrderedDict 按最近使用排序，从头部检查即可）"""
+        while self._clients:
+            key, entry = next(iter(self._clients.items()))
+            if now - entry.last_used < self.idle_ttl:
+                break
+            del self._clients[key]
+            self._close_later(entry)
+
+    def _close_later(self, entry: PooledClient) -> None:
+        """被淘汰的客户端空闲后再关闭"""
+        self._evicted_total += 1
+        try:
+            task = asyncio.get_running_loop().create_task(self._close_when_idle(entry))
+        except RuntimeError:
+            # 没有运行中的事件循环（如导入阶段），交给垃圾回收
+            return
+        self._closing.add(task)
+        self._closing_entries[task] = entry
+        task.add_done_callback(self._closing.discard)
+        task.add_done_callback(lambda t: self._closing_entries.pop(t, None))
+
+    async def _close_when_idle(self, entry: PooledClient) -> None:
+        """等到没有在途请求且空闲满 close_grace 秒（期间再次使用会重新计时）后关闭"""
+        usage = entry.usage
+        while True:
+            if usage.in_flight:
+                await asyncio.sleep(min(1.0, self.close_grace) or 0.1)
+                continue
+            remaining = usage.last_release + self.close_grace - time.monotonic()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(remaining)
+        await entry.http_client.aclose()
+
+    async def aclose(self) -> None:
+        """关闭所有客户端（应用退出时调用，包括等待空闲的已淘汰客户端）"""
+        entries = list(self._clients.values())
+        self._clients.clear()
+        for task, entry in list(self._closing_entries.items()):
+            task.cancel()
+            entries.append(entry)
+        for entry in entries:
+            await entry.http_client.aclose()
+        cassette = get_cassette()
+        if cassette is not None:
+            cassette.close()
+
+    def stats(self) -> dict:
+        """连接池统计"""
+        cassette = get_cassette()
+        return {
+            "clients": len(self._clients),
+            "evicted_total": self._evicted_total,
+            "closing": len(self._closing),
+            "in_flight": sum(entry.usage.in_flight for entry in self._clients.values()),
+            "http2": self.http2,
+            "max_clients": self.max_clients,
+            "cassette": cassette.stats() if cassette is not None else None,
+        }
+
+
+# 单例实例
+_llm_pool: Optional[LLMClientPool] = None
+
+
+def get_llm_pool() -> LLMClientPool:
+    """获取 LLM 客户端连接池单例"""
+    global _llm_pool
+    if _llm_pool is None:
+        _llm_pool = LLMClientPool(
+            max_connections=settings.llm_pool_max_connections,
+            max_keepalive_connections=settings.llm_pool_max_keepalive,
+            keepalive_expiry=settings.llm_pool_keepalive_expiry,
+            idle_ttl=settings.llm_pool_idle_ttl,
+            max_clients=settings.llm_pool_max_clients,
+            timeout=settings.llm_request_timeout,
+            http2=settings.llm_http2,
+            close_grace=settings.llm_pool_close_grace,
+        )
+    return _llm_pool
+
+
+def get_llm_client(api_key: str, base_url: Optional[str] = None) -> AsyncOpenAI:
+    """从连接池借用 AsyncOpenAI 客户端"""
+    return get_llm_pool().get_client(api_key, base_url)
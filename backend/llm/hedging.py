@@ -0,0 +1,126 @@
+"""
+LLM 对冲请求与备用模型级联
+主模型在对冲延迟内没有返回时，向下一级备用模型发出同样的请求，先成功的结果胜出，其余请求取消；
+所有层级都没有在截止时间内成功时抛出 asyncio.TimeoutError，由调用方回退到预设文本
+"""
+import asyncio
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Optional
+
+
+@dataclass(frozen=True)
+class CallBudget:
+    """调用位置的延迟预算"""
+    hedge_delay: Optional[float]  # 多久未返回时发出下一级请求（None 表示不对冲，只在失败时切换）
+    deadline: float  # 整体截止时间（秒）
+
+
+class HedgeStats:
+    """各调用位置的对冲统计"""
+
+    def __init__(self):
+        self.calls: dict[str, int] = defaultdict(int)
+        self.wins: dict[str, dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.hedges: dict[str, int] = defaultdict(int)
+        self.deadline_misses: dict[str, int] = defaultdict(int)
+        self.failures: dict[str, int] = defaultdict(int)
+
+    def to_dict(self) -> dict:
+        result = {}
+        for call_site, calls in self.calls.items():
+            wins = self.wins[call_site]
+            result[call_site] = {
+                "calls": calls,
+                "hedges": self.hedges[call_site],
+                "deadline_misses": self.deadline_misses[call_site],
+                "failures": self.failures[call_site],
+                "wins": dict(wins),
+                "win_rate": {tier: round(n / calls, 4) for tier, n in wins.items()},
+            }
+        return result
+
+
+async def hedged_call(
+    call_site: str,
+    tiers: list[tuple[str, Callable[[], Awaitable[Any]]]],
+    budget: CallBudget,
+    stats: Optional[HedgeStats] = None,
+) -> Any:
+    """
+    按层级依次发出请求
+
+    tiers: [(层级名, 发起请求的函数)]，第一项为主模型。某一层失败时立即发出下一层；
+    到达 hedge_delay 仍未返回时也发出下一层（同时保留在途请求）。
+    """
+    stats = stats or get_hedge_stats()
+    stats.calls[call_site] += 1
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    deadline_at = start + budget.deadline
+
+    running: dict[asyncio.Task, str] = {}
+    next_tier = 0
+    last_error: Optional[BaseException] = None
+
+    def launch() -> None:
+        nonlocal next_tier
+        name, fn = tiers[next_tier]
+        running[asyncio.ensure_future(fn())] = name
+        if next_tier:
+            stats.hedges[call_site] += 1
+        next_tier += 1
+
+    launch()
+    next_hedge_at = start + budget.hedge_delay if budget.hedge_delay is not None else None
+    try:
+        while True:
+            now = loop.time()
+            if now >= deadline_at:
+                stats.deadline_misses[call_site] += 1
+                raise asyncio.TimeoutError(f"{call_site} 超过截止时间 {budget.deadline}s")
+
+            wake_at = deadline_at
+            if next_hedge_at is not None and next_tier < len(tiers):
+                wake_at = min(wake_at, next_hedge_at)
+            done, _ = await asyncio.wait(
+                running, timeout=max(0.0, wake_at - now), return_when=asyncio.FIRST_COMPLETED,
+            )
+
+            for task in done:
+                tier = running.pop(task)
+                if task.exception() is None:
+                    stats.wins[call_site][tier] += 1
+                    return task.result()
+                last_error = task.exception()
+                print(f"[Hedging] {call_site} {tier} 失败: {type(last_error).__name__}: {last_error}")
+
+            if done and not running:
+                # 在途请求全部失败：有下一层立即发出，否则抛出最后的异常
+                if next_tier < len(tiers):
+                    launch()
+                    if next_hedge_at is not None:
+                        next_hedge_at = loop.time() + budget.hedge_delay
+                    continue
+                stats.failures[call_site] += 1
+                raise last_error
+
+            if next_hedge_at is not None and next_tier < len(tiers) and loop.time() >= next_hedge_at:
+                launch()
+                next_hedge_at = loop.time() + budget.hedge_delay
+    finally:
+        for task in running:
+            task.cancel()
+
+
+# 单例实例
+_hedge_stats: Optional[HedgeStats] = None
+
+
+def get_hedge_stats() -> HedgeStats:
+    """获取对冲统计单例"""
+    global _hedge_stats
+    if _hedge_stats is None:
+        _hedge_stats = HedgeStats()
+    return _hedge_stats
@@ -0,0 +1,491 @@
+"""
+本地模拟 LLM 服务
+OpenAI 兼容的 /chat/completions 接口，按提示词类型返回符合响应模型的预设内容，
+用于压测、基准测试与离线调试（不消耗 OpenRouter 额度，结果不受上游延迟波动影响）
+
+用法（在 backend 目录下）：
+    python -m llm.mock_server --port 8900 --seed 42 --latency lognormal:0.8,0.4
+    OPENROUTER_BASE_URL=http://127.0.0.1:8900/v1 uvicorn main:app
+
+- 延迟：首个 token 前的等待按 --latency 分布抽样，之后每段输出间隔 --token-delay 秒；
+  可用 --kind-latency analysis=fixed:0.3 为某类提示词单独指定
+- 流式：请求带 stream=true 时以 SSE 分段返回
+- 故障注入：--error-rate 返回 500，--rate-limit-rate 返回 429（带 Retry-After），
+  --malformed-rate 返回夹带说明文字或被截断的 JSON
+- 前缀缓存：消息分段上标记了 cache_control 的前缀第二次出现起计入 usage 的 cached_tokens
+- 固定种子：同一请求（模型 + 消息）第 n 次到达时的内容、延迟与故障完全确定，与并发顺序无关
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from .prompt_cache import content_text
+
+
+# ==================== 延迟分布 ====================
+
+@dataclass(frozen=True)
+class LatencyDistribution:
+    """
+    延迟分布（秒）
+
+    规格字符串：fixed:0.5 / uniform:0.2,1.5 / normal:1.0,0.3（均值、标准差）/ lognormal:0.8,0.4（中位数、对数标准差）
+    """
+    kind: str = "fixed"
+    params: tuple = (0.0,)
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyDistribution":
+        kind, _, args = spec.partition(":")
+        params = tuple(float(v) for v in args.split(",")) if args else (0.0,)
+        expected = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+        if kind not in expected or len(params) != expected[kind]:
+            raise ValueError(f"无效的延迟分布: {spec}")
+        return cls(kind, params)
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            value = self.params[0]
+        elif self.kind == "uniform":
+            value = rng.uniform(*self.params)
+        elif self.kind == "normal":
+            value = rng.gauss(*self.params)
+        else:
+            # 对数正态的中位数为 e^mu
+            median, sigma = self.params
+            value = rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+        return max(0.0, value)
+
+
+@dataclass
+class MockLLMConfig:
+    """模拟服务配置"""
+    seed: int = 0
+    latency: LatencyDistribution = field(default_factory=LatencyDistribution)
+    kind_latency: dict = field(default_factory=dict)  # 提示词类型 -> LatencyDistribution
+    token_delay: float = 0.0  # 每段输出的间隔（秒）
+    chunk_chars: int = 4  # 每段输出的字数（约等于一个 token）
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after: float = 1.0
+    malformed_rate: float = 0.0
+
+
+# ==================== 预设内容 ====================
+
+ADVISORS = ("lion", "fox", "balance")
+SEVERITIES = ("low", "medium", "high", "critical")
+CONSEQUENCE_TYPES = ("political", "economic", "military", "social", "diplomatic")
+SEED_TAGS = ("DECEPTION", "VIOLENCE", "BROKEN_PROMISE", "MERCY", "DEBT", "CORRUPTION", "BETRAYAL", "OTHER")
+SEED_SEVERITIES = ("LOW", "MEDIUM", "HIGH", "CRITICAL")
+
+SENTENCES = (
+    "宫墙之内，烛火摇曳，群臣屏息以待君主的裁断。",
+    "城中的流言比信使跑得更快，市井之间已有人窃窃私语。",
+    "狮子按剑而立，目光如炬，似乎随时准备出鞘。",
+    "狐狸把玩着手中的信笺，嘴角挂着意味深长的笑。",
+    "天平低头翻阅账册，眉头越锁越紧。",
+    "远处的钟声回荡在广场上空，像是某种不祥的预兆。",
+    "被人畏惧比受人爱戴更安全，但切莫招致憎恨。",
+    "君主必须既是狮子又是狐狸，方能识破陷阱、震慑豺狼。",
+    "国库的银币叮当作响，却填不满人心的沟壑。",
+    "夜色渐深，议事厅的大门缓缓合上，新的风暴正在酝酿。",
+)
+QUOTES = (
+    "被人畏惧比受人爱戴更安全。",
+    "君主必须学会如何做不善良的事。",
+    "伤害人要一次做尽，恩惠要慢慢施予。",
+    "君主必须既是狮子又是狐狸。",
+)
+
+
+def _text(rng: random.Random, min_chars: int, max_chars: int) -> str:
+    """拼接预设句子，长度落在 [min_chars, max_chars] 附近"""
+    target = rng.randint(min_chars, max_chars)
+    parts = []
+    while sum(len(p) for p in parts) < target:
+        parts.append(rng.choice(SENTENCES))
+    return "".join(parts)
+
+
+def _impact(rng: random.Random, bound: int) -> dict:
+    return {k: rng.randint(-bound, bound) for k in ("authority", "fear", "love")}
+
+
+def build_analysis(rng: random.Random, prompt: str) -> dict:
+    """决策分析：核心字段在前，评语类字段在后（与真实模型的输出顺序一致）"""
+    followed = rng.choice(ADVISORS + ("none",))
+    contains_promise = rng.random() < 0.2
+    return {
+        "followed_advisor": followed,
+        "rejected_advisor": rng.choice([a for a in ADVISORS if a != followed] + [None]),
+        "was_violent": rng.random() < 0.3,
+        "was_deceptive": rng.random() < 0.2,
+        "was_fair": rng.random() < 0.5,
+        "contains_promise": contains_promise,
+        "promise_info": {"target": "众人", "content": "减免赋税", "deadline": rng.randint(2, 4)} if contains_promise else None,
+        "is_secret_action": rng.random() < 0.1,
+        "leak_probability": round(rng.uniform(0.1, 0.5), 2),
+        "impact": _impact(rng, 15),
+        "analysis": _text(rng, 40, 80),
+        "machiavelli_assessment": _text(rng, 20, 40),
+        "prince_quote": rng.choice(QUOTES),
+        "applied_skill": None,
+    }
+
+
+def build_consequences(rng: random.Random, prompt: str) -> list:
+    result = []
+    for i in range(rng.randint(1, 3)):
+        requires_action = rng.random() < 0.4
+        result.append({
+            "title": f"政令余波{i + 1}",
+            "description": _text(rng, 30, 60),
+            "severity": rng.choice(SEVERITIES),
+            "type": rng.choice(CONSEQUENCE_TYPES),
+            "potential_outcomes": [_text(rng, 10, 20), _text(rng, 10, 20)],
+            "requires_action": requires_action,
+            "deadline_turns": rng.randint(2, 4) if requires_action else None,
+        })
+    return result
+
+
+def build_seeds(rng: random.Random, prompt: str) -> dict:
+    plant = rng.random() < 0.5
+    seeds = [{
+        "tag": rng.choice(SEED_TAGS),
+        "description": _text(rng, 15, 30),
+        "player_visible_hint": "有些事情不会被遗忘……",
+        "severity": rng.choice(SEED_SEVERITIES),
+        "trigger_delay": rng.randint(2, 4),
+        "trigger_condition": None,
+    }] if plant else []
+    return {"should_plant_seed": plant, "seeds": seeds, "analysis": _text(rng, 20, 40)}
+
+
+def build_echo(rng: random.Random, prompt: str) -> dict:
+    return {
+        "echo_narrative": _text(rng, 50, 100),
+        "crisis_modifier": _text(rng, 30, 50),
+        "advisor_reactions": {a: _text(rng, 15, 30) for a in ADVISORS},
+        "additional_impact": _impact(rng, 10),
+    }
+
+
+def build_intent(rng: random.Random, prompt: str) -> dict:
+    return {
+        "intent": rng.choice(("question", "challenge", "provoke", "debate", "negotiate", "command", "other")),
+        "target": rng.choice(ADVISORS + ("all", "none")),
+        "tone": rng.choice(("friendly", "neutral", "hostile", "manipulative")),
+        "summary": _text(rng, 10, 20),
+        "triggers_conflict": rng.random() < 0.3,
+        "suggested_reactions": {a: "正常回应" for a in ADVISORS},
+    }
+
+
+def build_council(rng: random.Random, prompt: str) -> dict:
+    conflict = rng.random() < 0.3
+    return {
+        "responses": {a: _text(rng, 20, 50) for a in ADVISORS},
+        "conflict_triggered": conflict,
+        "conflict_description": _text(rng, 20, 30) if conflict else "",
+        "trust_changes": {a: rng.randint(-3, 3) for a in ADVISORS},
+        "atmosphere": rng.choice(("friendly", "tense", "hostile", "chaotic")),
+    }
+
+
+def build_crisis(rng: random.Random, prompt: str) -> dict:
+    ids = re.findall(r'"id": "([^"]+)"', prompt)
+    resolved = [i for i in ids if rng.random() < 0.3]
+    return {"resolved_crisis_ids": resolved, "reasoning": _text(rng, 20, 40)}
+
+
+def build_continue(rng: random.Random, prompt: str) -> dict:
+    return {
+        "scene_update": _text(rng, 50, 100),
+        "advisor_comments": {a: _text(rng, 15, 30) for a in ADVISORS},
+        "consequence_resolved": rng.random() < 0.6,
+        "new_developments": [_text(rng, 15, 30)] if rng.random() < 0.4 else [],
+    }
+
+
+def build_next_round(rng: random.Random, prompt: str) -> dict:
+    return {
+        "scene_update": _text(rng, 50, 80),
+        "new_dilemma": _text(rng, 20, 40),
+        "advisor_comments": {
+            a: {"stance": rng.choice(("支持", "反对", "观望")), "comment": _text(rng, 20, 40), "suggestion": _text(rng, 10, 20)}
+            for a in ADVISORS
+        },
+    }
+
+
+def build_debate(rng: random.Random, prompt: str) -> list:
+    lines = []
+    for i in range(rng.randint(3, 5)):
+        speaker = ADVISORS[i % 3] if i < 3 else rng.choice(ADVISORS)
+        lines.append({"speaker": speaker, "content": _text(rng, 20, 50), "target": rng.choice(ADVISORS)})
+    return lines
+
+
+def build_nlp_parse(rng: random.Random, prompt: str) -> dict:
+    return {
+        "intent": rng.choice(("军事行动", "经济政策", "内政改革", "应对危机")),
+        "target": rng.choice(("农民", "贵族", "军队")),
+        "method": rng.choice(("武力镇压", "怀柔安抚", "税收调整")),
+        "goal": "稳定局势",
+        "cost": "未明确",
+        "tone": rng.choice(("果断", "冷静", "试探")),
+        "keywords": ["政令", "局势"],
+    }
+
+
+# 按提示词中的标志文字识别类型（按顺序匹配，第一个命中的生效）
+PROMPT_KINDS: tuple[tuple[str, str, Optional[Callable[[random.Random, str], object]]], ...] = (
+    ("analysis", "分析玩家在《君主论》博弈游戏中的决策", build_analysis),
+    ("consequences", "政治分析师", build_consequences),
+    ("seeds", "因果记录协议", build_seeds),
+    ("echo", "因果回响生成", build_echo),
+    ("intent", "意图分析器", build_intent),
+    ("council", "根据玩家的发言生成回应", build_council),
+    ("crisis", "是否解决了以下危机", build_crisis),
+    ("continue", "选择继续处理其中一个后果", build_continue),
+    ("next_round", "叙事者和三位顾问", build_next_round),
+    ("debate", "对话生成器", build_debate),
+    ("nlp_parse", "解析政治决策意图", build_nlp_parse),
+)
+
+
+def classify(messages: list) -> tuple[str, Optional[Callable]]:
+    """识别提示词类型；未识别的按叙事文本处理（开场白、顾问回应、密谈等）"""
+    text = "\n".join(content_text(m.get("content")) for m in messages)
+    for kind, marker, builder in PROMPT_KINDS:
+        if marker in text:
+            return kind, builder
+    return "narration", None
+
+
+def _malform(rng: random.Random, content: str) -> str:
+    """制造常见的坏输出：夹带说明文字、代码块、尾随逗号或被截断"""
+    choice = rng.randrange(3)
+    if choice == 0:
+        return f"好的，以下是结果：\n```json\n{content}\n```\n希望对您有帮助。"
+    if choice == 1:
+        return re.sub(r"\}$", ",}", content) if content.endswith("}") else content[:-1] + ",]"
+    return content[: max(1, int(len(content) * rng.uniform(0.5, 0.9)))]
+
+
+# ==================== 服务 ====================
+
+class MockLLM:
+    """按配置生成确定性的响应"""
+
+    def __init__(self, config: MockLLMConfig):
+        self.config = config
+        self._attempts: dict[str, int] = defaultdict(int)
+        self.requests: dict[str, int] = defaultdict(int)
+        self.errors = 0
+        self.rate_limited = 0
+        self.malformed = 0
+        self.streamed = 0
+        self._cached_prefixes: set[str] = set()
+        self.cached_tokens = 0
+
+    def cached_tokens_for(self, body: dict) -> int:
+        """模拟提供方的前缀缓存：标记了 cache_control 的分段及其之前的内容，第二次出现起算作命中"""
+        prefix = []
+        cached = 0
+        for message in body.get("messages") or []:
+            content = message.get("content")
+            parts = content if isinstance(content, list) else [{"text": content_text(content)}]
+            for part in parts:
+                prefix.append(part.get("text", ""))
+                if not part.get("cache_control"):
+                    continue
+                text = "".join(prefix)
+                key = hashlib.sha256(f"{body.get('model')}:{text}".encode("utf-8")).hexdigest()
+                if key in self._cached_prefixes:
+                    cached = len(text)
+                else:
+                    self._cached_prefixes.add(key)
+        self.cached_tokens += cached
+        return cached
+
+    def rng_for(self, body: dict) -> random.Random:
+        """同一请求第 n 次到达时使用同一个随机序列"""
+        payload = json.dumps([body.get("model"), body.get("messages")], ensure_ascii=False, sort_keys=True)
+        key = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        attempt = self._attempts[key]
+        self._attempts[key] += 1
+        return random.Random(f"{self.config.seed}:{key}:{attempt}")
+
+    def generate(self, body: dict, rng: random.Random) -> tuple[str, str]:
+        """返回 (提示词类型, 响应文本)"""
+        messages = body.get("messages") or []
+        kind, builder = classify(messages)
+        self.requests[kind] += 1
+        if builder is None:
+            max_chars = int(body.get("max_tokens") or 300)
+            return kind, _text(rng, min(60, max_chars), min(150, max_chars))
+        prompt = "\n".join(content_text(m.get("content")) for m in messages)
+        content = json.dumps(builder(rng, prompt), ensure_ascii=False)
+        if rng.random() < self.config.malformed_rate:
+            self.malformed += 1
+            content = _malform(rng, content)
+        return kind, content
+
+    def stats(self) -> dict:
+        return {
+            "seed": self.config.seed,
+            "requests": dict(self.requests),
+            "errors": self.errors,
+            "rate_limited": self.rate_limited,
+            "malformed": self.malformed,
+            "streamed": self.streamed,
+            "cached_tokens": self.cached_tokens,
+        }
+
+
+def create_app(config: Optional[MockLLMConfig] = None) -> FastAPI:
+    """创建模拟服务应用（OpenAI 兼容，同时挂在 / 与 /v1 下）"""
+    mock = MockLLM(config or MockLLMConfig())
+    app = FastAPI(title="Mock LLM")
+    app.state.mock = mock
+
+    async def chat_completions(request: Request):
+        body = await request.json()
+        cfg = mock.config
+        rng = mock.rng_for(body)
+
+        # 故障注入
+        roll = rng.random()
+        if roll < cfg.rate_limit_rate:
+            mock.rate_limited += 1
+            return JSONResponse(
+                {"error": {"message": "Rate limit exceeded (mock)", "type": "rate_limit_exceeded", "code": 429}},
+                status_code=429,
+                headers={"retry-after": str(cfg.retry_after)},
+            )
+        if roll < cfg.rate_limit_rate + cfg.error_rate:
+            mock.errors += 1
+            return JSONResponse(
+                {"error": {"message": "Internal error (mock)", "type": "server_error", "code": 500}},
+                status_code=500,
+            )
+
+        kind, content = mock.generate(body, rng)
+        latency = cfg.kind_latency.get(kind, cfg.latency).sample(rng)
+        step = max(1, cfg.chunk_chars)
+        chunks = [content[i:i + step] for i in range(0, len(content), step)]
+        model = body.get("model") or "mock"
+        completion_id = f"chatcmpl-mock-{uuid.UUID(int=rng.getrandbits(128)).hex[:24]}"
+        created = int(time.time())
+        prompt_tokens = sum(len(content_text(m.get("content"))) for m in body.get("messages") or [])
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "prompt_tokens_details": {"cached_tokens": mock.cached_tokens_for(body)},
+            "completion_tokens": len(chunks),
+            "total_tokens": prompt_tokens + len(chunks),
+        }
+
+        if body.get("stream"):
+            mock.streamed += 1
+
+            async def events():
+                await asyncio.sleep(latency)
+                for i, chunk in enumerate(chunks):
+                    if i:
+                        await asyncio.sleep(cfg.token_delay)
+                    delta = {"role": "assistant", "content": chunk} if i == 0 else {"content": chunk}
+                    yield "data: " + json.dumps({
+                        "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                        "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+                    }, ensure_ascii=False) + "\n\n"
+                yield "data: " + json.dumps({
+                    "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                    "usage": usage,
+                }) + "\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        await asyncio.sleep(latency + cfg.token_delay * max(0, len(chunks) - 1))
+        return JSONResponse({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": usage,
+        })
+
+    async def stats():
+        return mock.stats()
+
+    for prefix in ("", "/v1", "/api/v1"):
+        app.add_api_route(f"{prefix}/chat/completions", chat_completions, methods=["POST"])
+    app.add_api_route("/stats", stats, methods=["GET"])
+    return app
+
+
+def config_from_args(args: argparse.Namespace) -> MockLLMConfig:
+    kind_latency = {}
+    for item in args.kind_latency:
+        kind, _, spec = item.partition("=")
+        kind_latency[kind] = LatencyDistribution.parse(spec)
+    return MockLLMConfig(
+        seed=args.seed,
+        latency=LatencyDistribution.parse(args.latency),
+        kind_latency=kind_latency,
+        token_delay=args.token_delay,
+        chunk_chars=args.chunk_chars,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        malformed_rate=args.malformed_rate,
+    )
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", default="fixed:0", help="首 token 延迟分布，如 lognormal:0.8,0.4")
+    parser.add_argument("--kind-latency", action="append", default=[], help="按提示词类型覆盖，如 analysis=fixed:0.3")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="每段输出的间隔（秒）")
+    parser.add_argument("--chunk-chars", type=int, default=4)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="本地模拟 LLM 服务（OpenAI 兼容）")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    add_arguments(parser)
+    args = parser.parse_args()
+    print(f"[MockLLM] 监听 http://{args.host}:{args.port}/v1（seed={args.seed}, latency={args.latency}）")
+    uvicorn.run(create_app(config_from_args(args)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
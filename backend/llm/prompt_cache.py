@@ -0,0 +1,92 @@
+"""
+提示词前缀缓存
+把提示词的固定前缀标记为可缓存（cache_control），并按调用位置统计命中缓存的 prompt token 比例
+"""
+from collections import defaultdict
+from typing import Any, Optional
+
+from config import settings
+
+
+# 支持在消息中显式标记 cache_control 的模型（OpenRouter 模型名前缀）；
+# 其他提供方（如 OpenAI）对足够长的相同前缀自动缓存，不需要标记
+CACHE_CONTROL_MODEL_PREFIXES = ("anthropic/", "google/gemini")
+
+
+def supports_cache_control(model: str) -> bool:
+    """该模型是否接受 cache_control 标记"""
+    return settings.llm_prompt_cache_control and model.startswith(CACHE_CONTROL_MODEL_PREFIXES)
+
+
+def content_text(content: Any) -> str:
+    """消息内容的纯文本（content 可能是字符串或 [{"type": "text", "text": ...}] 分段）"""
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return "" if content is None else str(content)
+
+
+def prefixed_messages(prefix: str, suffix: str, model: str) -> list[dict]:
+    """
+    组装消息：固定前缀作为 system 消息，动态后缀作为 user 消息
+
+    模型支持时前缀以分段形式发送并标记 cache_control，否则发送普通字符串
+    （前缀逐字相同，自动前缀缓存同样能命中）
+    """
+    if supports_cache_control(model):
+        system = [{"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}}]
+    else:
+        system = prefix
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": suffix},
+    ]
+
+
+def _usage_value(usage: Any, name: str) -> Any:
+    if isinstance(usage, dict):
+        return usage.get(name)
+    return getattr(usage, name, None)
+
+
+class PromptCacheStats:
+    """各调用位置的 prompt token 与命中缓存的 token 统计"""
+
+    def __init__(self):
+        self.calls: dict[str, int] = defaultdict(int)
+        self.prompt_tokens: dict[str, int] = defaultdict(int)
+        self.cached_tokens: dict[str, int] = defaultdict(int)
+
+    def record(self, call_site: str, usage: Any) -> None:
+        """记录一次响应的 usage（OpenAI SDK 对象或 dict；cached_tokens 位于 prompt_tokens_details）"""
+        if usage is None:
+            return
+        prompt_tokens = _usage_value(usage, "prompt_tokens") or 0
+        details = _usage_value(usage, "prompt_tokens_details")
+        cached = (_usage_value(details, "cached_tokens") if details is not None else None) or 0
+        self.calls[call_site] += 1
+        self.prompt_tokens[call_site] += prompt_tokens
+        self.cached_tokens[call_site] += cached
+
+    def to_dict(self) -> dict:
+        result = {}
+        for call_site, calls in self.calls.items():
+            prompt_tokens = self.prompt_tokens[call_site]
+            result[call_site] = {
+                "calls": calls,
+                "prompt_tokens": prompt_tokens,
+                "cached_tokens": self.cached_tokens[call_site],
+                "cached_ratio": round(self.cached_tokens[call_site] / prompt_tokens, 4) if prompt_tokens else 0.0,
+            }
+        return result
+
+
+# 单例实例
+_prompt_cache_stats: Optional[PromptCacheStats] = None
+
+
+def get_prompt_cache_stats() -> PromptCacheStats:
+    """获取提示词缓存统计单例"""
+    global _prompt_cache_stats
+    if _prompt_cache_stats is None:
+        _prompt_cache_stats = PromptCacheStats()
+    return _prompt_cache_stats
@@ -0,0 +1,229 @@
+"""
+LLM 请求调度
+按 API Key 的令牌桶限制请求速率（每秒请求数）与 token 用量（每分钟 token 数），
+超出预算的请求排队等待，按优先级通道放行：玩家可见的叙事与顾问回复先于后台分析
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from config import settings
+from .prompt_cache import content_text
+
+
+# 优先级通道（数值越小越优先）
+LANE_INTERACTIVE = "interactive"  # 玩家正在等待的叙事、顾问回复
+LANE_NORMAL = "normal"
+LANE_BACKGROUND = "background"  # 伏笔分析等不影响当前画面的请求
+LANES = (LANE_INTERACTIVE, LANE_NORMAL, LANE_BACKGROUND)
+_LANE_PRIORITY = {lane: i for i, lane in enumerate(LANES)}
+
+# 排队等待时间直方图的桶上界（秒）
+WAIT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def estimate_tokens(messages: list, max_tokens: Optional[int]) -> int:
+    """粗略估计一次请求的 token 用量（中文约每字一个 token），响应后按实际用量校正"""
+    prompt = sum(len(content_text(m.get("content"))) for m in messages)
+    return prompt + (max_tokens or 512)
+
+
+class _WaitHistogram:
+    """排队等待时间直方图"""
+
+    def __init__(self):
+        self.counts = [0] * (len(WAIT_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        for i, bound in enumerate(WAIT_BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+                return
+        self.counts[-1] += 1
+
+    def to_dict(self) -> dict:
+        buckets = {}
+        cumulative = 0
+        for bound, count in zip(WAIT_BUCKETS, self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        buckets["+Inf"] = self.count
+        return {
+            "count": self.count,
+            "sum": round(self.total, 4),
+            "avg": round(self.total / self.count, 4) if self.count else 0.0,
+            "buckets": buckets,
+        }
+
+
+class _KeyBucket:
+    """单个 API Key 的请求桶与 token 桶，以及等待队列"""
+
+    def __init__(self, rps: float, burst: float, tpm: float):
+        now = time.monotonic()
+        self.rps = rps
+        self.burst = burst
+        self.tpm = tpm
+        self.requests = burst
+        self.tokens = tpm
+        self.updated = now
+        self.blocked_until = 0.0
+        self.waiters: list = []  # (优先级, 序号, 预估 token, future)
+        self.dispatcher: Optional[asyncio.Task] = None
+
+    def refill(self, now: float) -> None:
+        elapsed = now - self.updated
+        self.updated = now
+        if self.rps:
+            self.requests = min(self.burst, self.requests + elapsed * self.rps)
+        if self.tpm:
+            self.tokens = min(self.tpm, self.tokens + elapsed * self.tpm / 60.0)
+
+    def delay_for(self, tokens: int, now: float) -> float:
+        """还需等待多久才能放行一个请求（0 表示可以立即放行）"""
+        delay = max(0.0, self.blocked_until - now)
+        if self.rps and self.requests < 1:
+            delay = max(delay, (1 - self.requests) / self.rps)
+        if self.tpm:
+            # 单个请求超过整桶容量时，只要桶满就放行
+            needed = min(tokens, self.tpm)
+            if self.tokens < needed:
+                delay = max(delay, (needed - self.tokens) * 60.0 / self.tpm)
+        return delay
+
+    def take(self, tokens: int) -> None:
+        if self.rps:
+            self.requests -= 1
+        if self.tpm:
+            self.tokens -= tokens
+
+
+class LLMScheduler:
+    """
+    按 API Key 的令牌桶调度器
+
+    - acquire() 在预算不足或有更高优先级请求排队时等待；同一 Key 的等待者按 (通道优先级, 到达顺序) 放行
+    - 响应后用 record_usage() 按实际 token 数校正（桶可以透支，之后的请求相应等待）
+    - 上游返回 429 时 backoff() 暂停该 Key 的放行
+    """
+
+    def __init__(self, rps: float = 0, burst: float = 0, tpm: float = 0, max_keys: int = 1024):
+        self.rps = rps
+        self.burst = burst or max(1.0, rps)
+        self.tpm = tpm
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, _KeyBucket] = OrderedDict()
+        self._seq = itertools.count()
+        self._histograms = {lane: _WaitHistogram() for lane in LANES}
+        self.backoffs = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.rps or self.tpm)
+
+    def _bucket(self, api_key: str) -> _KeyBucket:
+        bucket = self._buckets.get(api_key)
+        if bucket is None:
+            bucket = _KeyBucket(self.rps, self.burst, self.tpm)
+            self._buckets[api_key] = bucket
+            self._evict()
+        else:
+            self._buckets.move_to_end(api_key)
+        return bucket
+
+    def _evict(self) -> None:
+        """淘汰最久未用且没有等待者的桶"""
+        for key in list(self._buckets):
+            if len(self._buckets) <= self.max_keys:
+                break
+            if not self._buckets[key].waiters:
+                del self._buckets[key]
+
+    async def acquire(self, api_key: str, lane: str = LANE_NORMAL, tokens: int = 0) -> None:
+        """等待放行一个请求（预估 tokens 个 token）"""
+        if not self.enabled:
+            return
+        lane = lane if lane in _LANE_PRIORITY else LANE_NORMAL
+        bucket = self._bucket(api_key)
+        now = time.monotonic()
+        bucket.refill(now)
+
+        if not bucket.waiters and bucket.delay_for(tokens, now) == 0:
+            bucket.take(tokens)
+            self._histograms[lane].observe(0.0)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(bucket.waiters, (_LANE_PRIORITY[lane], next(self._seq), tokens, future))
+        if bucket.dispatcher is None or bucket.dispatcher.done():
+            bucket.dispatcher = asyncio.create_task(self._dispatch(bucket))
+        await future
+        self._histograms[lane].observe(time.monotonic() - now)
+
+    async def _dispatch(self, bucket: _KeyBucket) -> None:
+        """按优先级依次放行等待者，预算不足时睡到足够为止"""
+        while bucket.waiters:
+            _, _, tokens, future = bucket.waiters[0]
+            if future.done():
+                # 等待者已取消
+                heapq.heappop(bucket.waiters)
+                continue
+            now = time.monotonic()
+            bucket.refill(now)
+            delay = bucket.delay_for(tokens, now)
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            heapq.heappop(bucket.waiters)
+            bucket.take(tokens)
+            future.set_result(None)
+
+    def record_usage(self, api_key: str, estimated: int, actual: Optional[int]) -> None:
+        """按实际 token 用量校正预估值"""
+        if not self.tpm or actual is None:
+            return
+        bucket = self._buckets.get(api_key)
+        if bucket is not None:
+            bucket.tokens -= actual - estimated
+
+    def backoff(self, api_key: str, seconds: float) -> None:
+        """上游限流时暂停该 Key 的放行"""
+        if not self.enabled:
+            return
+        bucket = self._bucket(api_key)
+        bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + seconds)
+        self.backoffs += 1
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "rps": self.rps,
+            "tpm": self.tpm,
+            "keys": len(self._buckets),
+            "waiting": sum(len(b.waiters) for b in self._buckets.values()),
+            "backoffs": self.backoffs,
+            "queue_wait_seconds": {lane: h.to_dict() for lane, h in self._histograms.items()},
+        }
+
+
+# 单例实例
+_scheduler: Optional[LLMScheduler] = None
+
+
+def get_llm_scheduler() -> LLMScheduler:
+    """获取 LLM 请求调度器单例"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = LLMScheduler(
+            rps=settings.llm_rate_rps,
+            burst=settings.llm_rate_burst,
+            tpm=settings.llm_rate_tpm,
+        )
+    return _scheduler
@@ -0,0 +1,71 @@
+"""
+LLM 请求合并（single-flight）
+相同的请求（同一 API Key、模型、消息与参数）同时在途时只发出一次上游请求，
+所有调用方共享同一结果或异常
+"""
+import asyncio
+import hashlib
+import json
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Optional
+
+
+def make_request_key(api_key: str, base_url: str, model: str, messages: list, params: dict) -> str:
+    """请求合并键；包含 API Key，不同玩家的 Key 不会共享结果"""
+    payload = json.dumps(
+        [api_key, base_url, model, messages, params],
+        ensure_ascii=False,
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """
+    在途请求合并
+
+    上游调用在独立任务中执行：发起者被取消（如客户端断开）不会中断其他等待者，
+    所有等待者都取消后请求仍会完成，结果不保留。
+    """
+
+    def __init__(self):
+        self._inflight: dict[str, asyncio.Task] = {}
+        self.leaders: dict[str, int] = defaultdict(int)
+        self.shared: dict[str, int] = defaultdict(int)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]], call_site: str = "default") -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            self.leaders[call_site] += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            self.shared[call_site] += 1
+        return await asyncio.shield(task)
+
+    def _done(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # 标记异常已读取，无人等待时不打印警告
+
+    def stats(self) -> dict:
+        return {
+            "inflight": len(self._inflight),
+            "leaders": dict(self.leaders),
+            "shared": dict(self.shared),
+        }
+
+
+# 单例实例
+_single_flight: Optional[SingleFlight] = None
+
+
+def get_single_flight() -> SingleFlight:
+    """获取请求合并单例"""
+    global _single_flight
+    if _single_flight is None:
+        _single_flight = SingleFlight()
+    return _single_flight
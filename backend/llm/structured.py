@@ -0,0 +1,313 @@
+"""
+LLM 结构化输出
+容错解析模型返回的 JSON（去掉代码块与前后文字、补全被截断的括号、删除尾随逗号），
+按响应模型校验，并按调用位置统计解析失败次数
+"""
+import json
+from collections import defaultdict
+from functools import lru_cache
+from typing import Any, Optional, get_origin
+
+from pydantic import TypeAdapter, ValidationError
+
+
+class StructuredOutputError(ValueError):
+    """模型输出无法解析为 JSON 或不符合响应模型"""
+
+
+# Python 风格的字面量（模型偶尔会输出）
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+
+def _strip_trailing_comma(out: list[str]) -> None:
+    """删除末尾的逗号（忽略其后的空白）"""
+    i = len(out) - 1
+    while i >= 0 and out[i].isspace():
+        i -= 1
+    if i >= 0 and out[i] == ",":
+        del out[i:]
+
+
+def repair_json(text: str, expect: str = "{", drop_partial: bool = False) -> str:
+    """
+    从模型输出中截取第一个 JSON 对象（expect="{"）或数组（expect="["）并修复常见错误
+
+    - 忽略前后的说明文字与 ``` 代码块标记，按括号配对截取（跳过字符串内的括号）
+    - 删除 } 与 ] 前的尾随逗号，把 True/False/None 换成 JSON 字面量
+    - 输出被 max_tokens 截断时补全字符串与括号；补全后仍不合法则退回到最后一个完整的元素。
+      drop_partial=True 时直接丢弃最外层最后一个不完整的元素（如数组中写了一半的对象）
+    """
+    start = text.find(expect)
+    if start < 0:
+        raise StructuredOutputError("响应中没有 JSON " + ("对象" if expect == "{" else "数组"))
+
+    out: list[str] = []
+    stack: list[str] = []
+    checkpoint: Optional[tuple[int, list[str]]] = None  # 最后一个逗号之前的位置与当时的括号栈
+    top_checkpoint: Optional[int] = None  # 最外层最后一个逗号之前的位置
+    in_string = False
+    escape = False
+    closed = False
+    i, n = start, len(text)
+    while i < n:
+        ch = text[i]
+        if in_string:
+            out.append(ch)
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            i += 1
+            continue
+        if ch == '"':
+            in_string = True
+            out.append(ch)
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+            out.append(ch)
+        elif ch in "}]":
+            if ch != stack[-1]:
+                break
+            _strip_trailing_comma(out)
+            out.append(ch)
+            stack.pop()
+            if not stack:
+                closed = True
+                break
+        elif ch == ",":
+            checkpoint = (len(out), list(stack))
+            if len(stack) == 1:
+                top_checkpoint = len(out)
+            out.append(ch)
+        elif ch.isalpha():
+            j = i
+            while j < n and (text[j].isalnum() or text[j] == "_"):
+                j += 1
+            word = text[i:j]
+            out.append(_LITERALS.get(word, word))
+            i = j
+            continue
+        else:
+            out.append(ch)
+        i += 1
+
+    if closed:
+        return "".join(out)
+
+    if drop_partial:
+        if top_checkpoint is None:
+            raise StructuredOutputError("JSON 被截断且没有完整的元素")
+        return "".join(out[:top_checkpoint]) + stack[0]
+
+    # 输出被截断：先就地补全，不合法时退回到最后一个逗号之前
+    tail = list(out)
+    if in_string:
+        tail.append('"')
+    _strip_trailing_comma(tail)
+    if "".join(tail).rstrip().endswith(":"):
+        tail.append("null")
+    candidate = "".join(tail) + "".join(reversed(stack))
+    try:
+        json.loads(candidate, strict=False)
+        return candidate
+    except json.JSONDecodeError:
+        pass
+    if checkpoint is None:
+        raise StructuredOutputError("JSON 被截断且无法补全")
+    length, saved_stack = checkpoint
+    return "".join(out[:length]) + "".join(reversed(saved_stack))
+
+
+@lru_cache(maxsize=None)
+def _adapter(schema: Any) -> TypeAdapter:
+    return TypeAdapter(schema)
+
+
+def expects_array(schema: Any) -> bool:
+    """响应模型是否为数组（list[...]）"""
+    return get_origin(schema) is list
+
+
+def _format_validation_error(error: ValidationError, limit: int = 8) -> str:
+    lines = []
+    for item in error.errors()[:limit]:
+        loc = ".".join(str(part) for part in item["loc"]) or "(根)"
+        lines.append(f"{loc}: {item['msg']}")
+    return "; ".join(lines)
+
+
+def _loads_repaired(text: str, expect: str, drop_partial: bool = False) -> Any:
+    fixed = repair_json(text, expect, drop_partial)
+    try:
+        return json.loads(fixed, strict=False)
+    except json.JSONDecodeError as e:
+        raise StructuredOutputError(f"JSON 语法错误: {e}") from e
+
+
+def validate_structured(value: Any, schema: Any) -> Any:
+    """按响应模型校验已解析的值，返回转换后的 dict/list；不符合时抛出 StructuredOutputError"""
+    adapter = _adapter(schema)
+    try:
+        return adapter.dump_python(adapter.validate_python(value), mode="json")
+    except ValidationError as e:
+        raise StructuredOutputError(f"字段不符合要求: {_format_validation_error(e)}") from e
+
+
+def parse_structured(text: str, schema: Any) -> tuple[Any, bool]:
+    """
+    解析并校验模型输出
+
+    schema 为 Pydantic 模型或 list[模型]；返回 (校验后转换成的 dict/list, 是否经过修复)，
+    失败时抛出 StructuredOutputError（消息可直接发回模型要求修正）
+    """
+    adapter = _adapter(schema)
+    expect = "[" if expects_array(schema) else "{"
+    repaired = False
+    try:
+        value = json.loads(text, strict=False)
+    except json.JSONDecodeError:
+        repaired = True
+        value = _loads_repaired(text, expect)
+    try:
+        validated = adapter.validate_python(value)
+    except ValidationError as e:
+        error = StructuredOutputError(f"字段不符合要求: {_format_validation_error(e)}")
+        if not repaired:
+            raise error from e
+        # 截断的输出：丢弃最后一个写了一半的元素再试
+        try:
+            validated = adapter.validate_python(_loads_repaired(text, expect, drop_partial=True))
+        except (StructuredOutputError, ValidationError):
+            raise error from e
+    return adapter.dump_python(validated, mode="json"), repaired
+
+
+def retry_message(error: StructuredOutputError) -> str:
+    """校验失败后发回模型的修正要求"""
+    return f"上面的输出无法解析：{error}\n请按要求的格式重新输出，只返回 JSON，不要其他文字。"
+
+
+class StreamingJSONParser:
+    """
+    流式输出的增量 JSON 解析
+
+    逐段喂入模型的增量文本，每个顶层字段的值一完整就返回，调用方不必等整个对象生成完。
+    对象开始前的说明文字与代码块标记会被跳过；单个字段的值无法解析时跳过该字段，
+    由完整输出的校验兜底
+    """
+
+    def __init__(self):
+        self.fields: dict[str, Any] = {}
+        self.done = False  # 顶层对象已闭合
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._key_start: Optional[int] = None
+        self._key: Optional[str] = None
+        self._value_start: Optional[int] = None
+
+    @property
+    def text(self) -> str:
+        """目前收到的全部文本"""
+        return self._text
+
+    def feed(self, delta: str) -> list[tuple[str, Any]]:
+        """喂入一段增量文本，返回其中新完成的顶层字段 [(键, 值)]"""
+        self._text += delta
+        text = self._text
+        completed: list[tuple[str, Any]] = []
+        i = self._pos
+        while i < len(text) and not self.done:
+            ch = text[i]
+            if self._depth == 0:
+                if ch == "{":
+                    self._depth = 1
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._value_start is None and self._key_start is not None:
+                        self._key = json.loads(text[self._key_start:i + 1], strict=False)
+                        self._key_start = None
+            elif ch == '"':
+                self._in_string = True
+                if self._depth == 1 and self._value_start is None:
+                    self._key_start = i
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._complete(text[:i], completed)
+                    self.done = True
+            elif ch == ":" and self._depth == 1 and self._value_start is None:
+                self._value_start = i + 1
+            elif ch == "," and self._depth == 1:
+                self._complete(text[:i], completed)
+            i += 1
+        self._pos = i
+        return completed
+
+    def _complete(self, text: str, completed: list) -> None:
+        key, start = self._key, self._value_start
+        self._key = self._value_start = None
+        if key is None or start is None:
+            return
+        raw = text[start:].strip()
+        try:
+            if raw[:1] in ("{", "["):
+                raw = repair_json(raw, raw[0])
+            value = json.loads(_LITERALS.get(raw, raw), strict=False)
+        except (StructuredOutputError, json.JSONDecodeError):
+            return
+        self.fields[key] = value
+        completed.append((key, value))
+
+
+class StructuredStats:
+    """各调用位置的结构化输出统计"""
+
+    def __init__(self):
+        self.calls: dict[str, int] = defaultdict(int)
+        self.parse_failures: dict[str, int] = defaultdict(int)  # 无法使用的输出（含重试前的）
+        self.repaired: dict[str, int] = defaultdict(int)  # 经修复后才能解析的输出
+        self.retries: dict[str, int] = defaultdict(int)
+        self.retry_successes: dict[str, int] = defaultdict(int)
+        self.failures: dict[str, int] = defaultdict(int)  # 重试后仍失败、回退到默认值的调用
+        self.json_mode_unsupported: set[str] = set()  # 不支持 JSON 模式的模型
+
+    def to_dict(self) -> dict:
+        result = {}
+        for call_site, calls in self.calls.items():
+            result[call_site] = {
+                "calls": calls,
+                "parse_failures": self.parse_failures[call_site],
+                "repaired": self.repaired[call_site],
+                "retries": self.retries[call_site],
+                "retry_successes": self.retry_successes[call_site],
+                "failures": self.failures[call_site],
+                "failure_rate": round(self.failures[call_site] / calls, 4),
+            }
+        return {
+            "call_sites": result,
+            "json_mode_unsupported": sorted(self.json_mode_unsupported),
+        }
+
+
+# 单例实例
+_structured_stats: Optional[StructuredStats] = None
+
+
+def get_structured_stats() -> StructuredStats:
+    """获取结构化输出统计单例"""
+    global _structured_stats
+    if _structured_stats is None:
+        _structured_stats = StructuredStats()
+    return _structured_stats
@@ -3,25 +3,46 @@
 支持关卡系统、议会辩论和高级博弈机制
 """
 import asyncio
-from contextlib import asynccontextmanager
+import json
+import time
+from contextlib import asynccontextmanager, nullcontext
+import httpx
 from typing import Optional, List
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 from config import settings
 from models import GameState, PowerVector, ChapterLibrary, ChapterID
 from engine import (
-    ChapterEngine, DialogueGenerator,
+    ChapterEngine, DialogueGenerator, TurnStream,
     JudgmentEngine, ObservationLens, AdvancedDialogueGenerator,
     judgment_engine, advanced_dialogue_generator,
+    register_prompt, prompt_versions,
+)
+from storage import create_session_store, get_analysis_cache, get_variant_store
+from llm import (
+    CircuitOpenError, get_cassette, get_circuit_breakers, get_hedge_stats, get_llm_pool, get_llm_scheduler,
+    get_prompt_cache_stats, get_single_flight, get_structured_stats,
 )
-from storage import InMemorySessionStore
 from routes.skills_routes import router as skills_router
 
 
 # 全局存储
-session_store = InMemorySessionStore()
+session_store = create_session_store()
+
+# 后台执行的回合任务（保持强引用，避免任务在执行中途被垃圾回收；应用退出时等待其完成）
+_background_tasks: set[asyncio.Task] = set()
+
+
+def _spawn_background(coro) -> asyncio.Task:
+    """在后台执行协程并保持对任务的引用，完成后自动移除"""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
 
 
 @asynccontextmanager
@@ -31,7 +52,13 @@ async def lifespan(app: FastAPI):
     port = os.getenv("PORT", "8710")
     print("👁️ 影子执政者 (Shadow Regent) 服务启动...")
     print(f"📍 后端地址: http://0.0.0.0:{port}")
+    await session_store.start()
     yield
+    # 等待客户端断开后仍在后台结算的回合完成并保存
+    if _background_tasks:
+        await asyncio.gather(*_background_tasks, return_exceptions=True)
+    await session_store.close()
+    await get_llm_pool().aclose()
     print("👁️ 游戏服务关闭")
 
 
@@ -51,6 +78,36 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+
+@app.middleware("http")
+async def record_game_calls(request: Request, call_next):
+    """LLM 录制模式下同时记录游戏接口调用，供 benchmarks/replay_session.py 回放整局会话"""
+    cassette = get_cassette()
+    if (
+        cassette is None or not cassette.recording
+        or request.method != "POST" or not request.url.path.startswith("/api/game/")
+    ):
+        return await call_next(request)
+
+    raw = await request.body()
+    started = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - started
+
+    content = None
+    if response.headers.get("content-type", "").startswith("application/json"):
+        payload = b"".join([chunk async for chunk in response.body_iterator])
+        content = json.loads(payload)
+        response = Response(content=payload, status_code=response.status_code, headers=dict(response.headers))
+    try:
+        body = json.loads(raw) if raw else None
+    except ValueError:
+        body = None
+    cassette.record_api(request.method, request.url.path, body, response.status_code, content, elapsed)
+    return response
+
+
 # 注册技能包路由
 app.include_router(skills_router, prefix="/api")
 
@@ -217,6 +274,34 @@ ADVISOR_PERSONAS = {
     },
 }
 
+# 密谈提示词：人设、语调与密谈规则是每位顾问固定的前缀，当前局势与君主的话作为动态后缀
+AUDIENCE_PROMPTS = {
+    advisor: register_prompt(f"private_audience:{advisor}", "v1", f"""
+你是《君主论》博弈游戏中的顾问角色：{persona['name']}
+
+{persona['philosophy']}
+
+【对话风格】
+语调: {persona['tone']}
+你掌握的秘密: {persona['secret_knowledge']}
+
+【密谈规则】
+1. 这是私密对话，其他顾问听不到。你可以更坦诚。
+2. 根据君主的问题，用符合你性格的方式回应。
+3. 如果君主的问题与当前困境相关，给出符合你立场的建议。
+4. 如果君主试图探听其他顾问的信息，你可以有选择地透露一些。
+5. 回复要简洁有力，像真正的谋臣一样说话，不超过150字。
+6. 用第一人称，不要解释你是AI。
+
+【重要】
+- 用户消息会给出当前游戏状态、君主与你的信任度，以及君主对你说的话
+- 如果信任度低于30，你会更加警惕和保守
+- 如果信任度高于70，你会更加坦诚和亲近
+- 保持角色性格的一致性
+""")
+    for advisor, persona in ADVISOR_PERSONAS.items()
+}
+
 
 # ==================== 游戏介绍 ====================
 
@@ -314,8 +399,17 @@ OBSERVATION_LENS_CONFIG = {
 }
 
 
-# 存储每个会话的裁决引擎状态
-session_judgment_engines: dict[str, JudgmentEngine] = {}
+async def load_judgment_engine(session_id: str) -> JudgmentEngine:
+    """从会话存储恢复该会话的裁决引擎（不存在时新建）"""
+    state = await session_store.get_judgment_state(session_id)
+    if state is None:
+        return JudgmentEngine()
+    return JudgmentEngine.from_state(state)
+
+
+async def save_judgment_engine(session_id: str, engine: JudgmentEngine) -> None:
+    """把裁决引擎状态写回会话存储"""
+    await session_store.set_judgment_state(session_id, engine.to_state())
 
 
 # ==================== API 路由 ====================
@@ -335,6 +429,26 @@ async def root():
     }
 
 
+@app.get("/api/metrics")
+async def get_metrics():
+    """运行指标（LLM 连接池、响应缓存命中率等）"""
+    return {
+        "llm_pool": get_llm_pool().stats(),
+        "llm_single_flight": get_single_flight().stats(),
+        "llm_scheduler": get_llm_scheduler().stats(),
+        "llm_hedging": get_hedge_stats().to_dict(),
+        "llm_structured_output": get_structured_stats().to_dict(),
+        "llm_circuit_breaker": get_circuit_breakers().stats(),
+        "llm_prompt_cache": {
+            "versions": prompt_versions(),
+            "call_sites": get_prompt_cache_stats().to_dict(),
+        },
+        "session_store": session_store.stats(),
+        "analysis_cache": get_analysis_cache().stats(),
+        "chapter_variants": get_variant_store().stats(),
+    }
+
+
 @app.get("/api/game/initialization")
 async def get_initialization_scene():
     """获取游戏初始化场景（纯白虚空 + 观测透镜选择）"""
@@ -366,7 +480,7 @@ async def new_game(request: NewGameRequest):
     )
 
     # 创建该会话的裁决引擎实例
-    session_judgment_engines[game_state.session_id] = JudgmentEngine()
+    await save_judgment_engine(game_state.session_id, JudgmentEngine())
 
     # 存储会话
     await session_store.set(game_state.session_id, game_state)
@@ -418,12 +532,12 @@ async def set_observation_lens(request: SetObservationLensRequest):
         raise HTTPException(status_code=400, detail="无效的观测透镜选择")
 
     # 获取或创建该会话的裁决引擎
-    if request.session_id not in session_judgment_engines:
-        session_judgment_engines[request.session_id] = JudgmentEngine()
+    judgment_eng = await load_judgment_engine(request.session_id)
 
     # 设置观测透镜
     lens_config = OBSERVATION_LENS_CONFIG[request.lens]
-    session_judgment_engines[request.session_id].set_observation_lens(lens_config["enum_value"])
+    judgment_eng.set_observation_lens(lens_config["enum_value"])
+    await save_judgment_engine(request.session_id, judgment_eng)
 
     # 存储透镜选择到游戏状态（可选，用于持久化）
     game_state.observation_lens = request.lens
@@ -447,6 +561,11 @@ async def set_observation_lens(request: SetObservationLensRequest):
 @app.post("/api/game/chapter/start")
 async def start_chapter(request: StartChapterRequest):
     """开始指定关卡"""
+    return await _start_chapter(request)
+
+
+async def _start_chapter(request: StartChapterRequest, stream: Optional[TurnStream] = None) -> dict:
+    """开始指定关卡（传入 stream 时开场白逐字推送）"""
     game_state = await session_store.get(request.session_id)
     if not game_state:
         raise HTTPException(status_code=404, detail="游戏会话不存在")
@@ -455,7 +574,7 @@ async def start_chapter(request: StartChapterRequest):
         raise HTTPException(status_code=400, detail="游戏已结束")
 
     chapter_engine = ChapterEngine(api_key=request.api_key, model=request.model)
-    result = await chapter_engine.start_chapter(game_state, request.chapter_id)
+    result = await chapter_engine.start_chapter(game_state, request.chapter_id, stream=stream)
 
     await session_store.set(request.session_id, game_state)
 
@@ -465,6 +584,11 @@ async def start_chapter(request: StartChapterRequest):
 @app.post("/api/game/decision")
 async def make_decision(request: PlayerDecisionRequest):
     """处理玩家决策 - 集成新裁决系统"""
+    return await _make_decision(request)
+
+
+async def _make_decision(request: PlayerDecisionRequest, stream: Optional[TurnStream] = None) -> dict:
+    """处理玩家决策（传入 stream 时顾问回应逐字推送）"""
     print(f"[API] /api/game/decision 被调用")
     print(f"[API] session_id: {request.session_id}")
     print(f"[API] decision: {request.decision[:50] if request.decision else 'None'}...")
@@ -481,10 +605,7 @@ async def make_decision(request: PlayerDecisionRequest):
     chapter_engine = ChapterEngine(api_key=request.api_key, model=request.model)
 
     # 获取该会话的裁决引擎
-    judgment_eng = session_judgment_engines.get(request.session_id)
-    if not judgment_eng:
-        judgment_eng = JudgmentEngine()
-        session_judgment_engines[request.session_id] = judgment_eng
+    judgment_eng = await load_judgment_engine(request.session_id)
 
     # 执行裁决分析（四大算法模块）
     judgment_context = {
@@ -493,22 +614,29 @@ async def make_decision(request: PlayerDecisionRequest):
         "followed_advisor": request.followed_advisor,
     }
     judgment_result = judgment_eng.analyze_strategy(request.decision, judgment_context)
+    await save_judgment_engine(request.session_id, judgment_eng)
+    judgment_metadata = {
+        "player_strategy": judgment_result.player_strategy,
+        "machiavelli_traits": [t.value for t in judgment_result.machiavelli_traits],
+        "machiavelli_critique": judgment_result.machiavelli_critique,
+        "outcome_level": judgment_result.outcome_level.value,
+        "consequence": judgment_result.consequence,
+    }
+    if stream:
+        await stream.stage_done("judgment_metadata", judgment_metadata)
 
     # 处理决策
     result = await chapter_engine.process_player_decision(
         game_state=game_state,
         player_input=request.decision,
         followed_advisor=request.followed_advisor,
+        stream=stream,
+        with_advisor_responses=True,  # 顾问回应在决策分析核心字段结算后即开始生成
     )
+    advisor_responses = result.pop("advisor_responses")
 
     # 添加裁决元数据到结果
-    result["judgment_metadata"] = {
-        "player_strategy": judgment_result.player_strategy,
-        "machiavelli_traits": [t.value for t in judgment_result.machiavelli_traits],
-        "machiavelli_critique": judgment_result.machiavelli_critique,
-        "outcome_level": judgment_result.outcome_level.value,
-        "consequence": judgment_result.consequence,
-    }
+    result["judgment_metadata"] = judgment_metadata
 
     # 添加因果种子信息（如果产生）
     if judgment_result.causal_seed:
@@ -540,13 +668,6 @@ async def make_decision(request: PlayerDecisionRequest):
         is_lie=result["decision_analysis"].get("is_secret_action", False),
     )
 
-    # 生成顾问回应（考虑异化状态）
-    advisor_responses = await chapter_engine.generate_advisor_responses(
-        game_state=game_state,
-        player_input=request.decision,
-        decision_analysis=result["decision_analysis"],
-    )
-
     # 应用顾问异化修正
     for advisor in ["lion", "fox", "balance"]:
         if advisor in advisor_responses:
@@ -603,9 +724,63 @@ async def make_decision(request: PlayerDecisionRequest):
     return result
 
 
+@app.post("/api/game/decision/stream")
+async def make_decision_stream(request: PlayerDecisionRequest):
+    """处理玩家决策 - SSE 流式版本，每个阶段完成即推送（适用于不支持 WebSocket 的代理环境）"""
+    if not await session_store.exists(request.session_id):
+        raise HTTPException(status_code=404, detail="游戏会话不存在")
+
+    queue: asyncio.Queue = asyncio.Queue()
+    stream = TurnStream(queue.put)
+
+    async def run_decision():
+        try:
+            result = await _make_decision(request, stream=stream)
+            await queue.put({"type": "decision_result", "data": result})
+        except HTTPException as e:
+            await queue.put({"type": "error", "message": e.detail})
+        except Exception as e:
+            print(f"[API] SSE 决策处理失败: {type(e).__name__}: {e}")
+            await queue.put({"type": "error", "message": "决策处理失败"})
+        finally:
+            await queue.put(None)
+
+    # 决策在独立任务中执行，返回响应前即开始（不等客户端开始读取）；
+    # 即使客户端中途断开，回合也会完整结算并保存
+    task = _spawn_background(run_decision())
+
+    async def event_source():
+        try:
+            while True:
+                frame = await queue.get()
+                if frame is None:
+                    break
+                payload = json.dumps(jsonable_encoder(frame), ensure_ascii=False)
+                yield f"event: {frame['type']}\ndata: {payload}\n\n"
+        finally:
+            if not task.done():
+                # 客户端断开：停止向队列推送，回合在后台继续
+                stream.closed = True
+                print(f"[API] SSE 客户端断开，回合在后台继续结算: {request.session_id}")
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # 禁止 nginx 缓冲
+        },
+    )
+
+
 @app.post("/api/game/private-audience")
 async def private_audience(request: PrivateAudienceRequest):
     """单独召见顾问 - 密谈API"""
+    return await _private_audience(request)
+
+
+async def _private_audience(request: PrivateAudienceRequest, stream: Optional[TurnStream] = None) -> dict:
+    """单独召见顾问（传入 stream 时回复逐字推送）"""
     game_state = await session_store.get(request.session_id)
     if not game_state:
         raise HTTPException(status_code=404, detail="游戏会话不存在")
@@ -613,8 +788,6 @@ async def private_audience(request: PrivateAudienceRequest):
     if request.advisor not in ADVISOR_PERSONAS:
         raise HTTPException(status_code=400, detail="无效的顾问")
 
-    advisor_persona = ADVISOR_PERSONAS[request.advisor]
-
     # 获取当前关卡信息
     chapter = ChapterLibrary.get_chapter(ChapterID(game_state.current_chapter))
     chapter_context = f"当前关卡: {chapter.name if chapter else '未知'}\n困境: {chapter.dilemma if chapter else '未知'}"
@@ -623,56 +796,51 @@ async def private_audience(request: PrivateAudienceRequest):
     relation = getattr(game_state.relations, request.advisor, None)
     trust_level = relation.trust if relation else 50
 
-    # 构建密谈提示词
-    system_prompt = f"""你是《君主论》博弈游戏中的顾问角色：{advisor_persona['name']}
-
-{advisor_persona['philosophy']}
-
-【当前游戏状态】
+    # 人设与密谈规则在固定前缀中（可被提供方缓存），这里只填当前局势与君主的话
+    model = request.model or "anthropic/claude-3.5-sonnet"
+    suffix = f"""【当前游戏状态】
 {chapter_context}
 君主与你的信任度: {trust_level}/100
 
-【对话风格】
-语调: {advisor_persona['tone']}
-你掌握的秘密: {advisor_persona['secret_knowledge']}
-
-【密谈规则】
-1. 这是私密对话，其他顾问听不到。你可以更坦诚。
-2. 根据君主的问题，用符合你性格的方式回应。
-3. 如果君主的问题与当前困境相关，给出符合你立场的建议。
-4. 如果君主试图探听其他顾问的信息，你可以有选择地透露一些。
-5. 回复要简洁有力，像真正的谋臣一样说话，不超过150字。
-6. 用第一人称，不要解释你是AI。
-
-【重要】
-- 如果信任度低于30，你会更加警惕和保守
-- 如果信任度高于70，你会更加坦诚和亲近
-- 保持角色性格的一致性
-"""
+君主对你说: \"{request.message}\""""
 
-    user_prompt = f"君主对你说: \"{request.message}\""
+    # 模型熔断时立即返回，不等待上游超时
+    breaker = get_circuit_breakers().get(model)
+    if breaker:
+        try:
+            breaker.check()
+        except CircuitOpenError as e:
+            raise HTTPException(status_code=503, detail=f"模型服务暂不可用: {e}")
 
     try:
-        # 调用OpenRouter API
-        import httpx
-
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                "https://openrouter.ai/api/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {request.api_key}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "model": request.model or "anthropic/claude-3.5-sonnet",
-                    "messages": [
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt},
-                    ],
-                    "max_tokens": 300,
-                    "temperature": 0.8,
-                },
-            )
+        # 调用OpenRouter API（复用连接池中的 httpx 客户端）
+        client = get_llm_pool().get_http_client(request.api_key)
+        request_kwargs = dict(
+            headers={
+                "Authorization": f"Bearer {request.api_key}",
+                "Content-Type": "application/json",
+            },
+            json={
+                "model": model,
+                "messages": AUDIENCE_PROMPTS[request.advisor].messages(suffix, model),
+                "max_tokens": 300,
+                "temperature": 0.8,
+            },
+            timeout=30.0,
+        )
+
+        if stream:
+            with breaker.call() if breaker else nullcontext():
+                advisor_reply = await _stream_audience_reply(client, request.advisor, request_kwargs, stream)
+        else:
+            with breaker.call() if breaker else nullcontext():
+                response = await client.post(
+                    f"{settings.openrouter_base_url}/chat/completions",
+                    **request_kwargs,
+                )
+                # httpx 不对 5xx 抛出异常：在熔断器块内抛出，计为上游故障
+                if response.status_code >= 500:
+                    response.raise_for_status()
 
             if response.status_code != 200:
                 raise HTTPException(
@@ -682,31 +850,88 @@ async def private_audience(request: PrivateAudienceRequest):
 
             result = response.json()
             advisor_reply = result["choices"][0]["message"]["content"]
+            get_prompt_cache_stats().record("private_audience", result.get("usage"))
+
+        # 根据对话内容微调顾问关系（简单规则）
+        relation_change = 0
+        if "感谢" in request.message or "信任" in request.message:
+            relation_change = 2
+        elif "威胁" in request.message or "惩罚" in request.message:
+            relation_change = -3
+
+        if relation and relation_change != 0:
+            relation.trust = max(0, min(100, relation.trust + relation_change))
+            await session_store.set(request.session_id, game_state)
+
+        return {
+            "advisor": request.advisor,
+            "response": advisor_reply,
+            "trust_change": relation_change,
+            "new_trust": relation.trust if relation else 50,
+        }
 
-            # 根据对话内容微调顾问关系（简单规则）
-            relation_change = 0
-            if "感谢" in request.message or "信任" in request.message:
-                relation_change = 2
-            elif "威胁" in request.message or "惩罚" in request.message:
-                relation_change = -3
-
-            if relation and relation_change != 0:
-                relation.trust = max(0, min(100, relation.trust + relation_change))
-                await session_store.set(request.session_id, game_state)
-
-            return {
-                "advisor": request.advisor,
-                "response": advisor_reply,
-                "trust_change": relation_change,
-                "new_trust": relation.trust if relation else 50,
-            }
-
+    except CircuitOpenError as e:
+        # 半开状态下探测名额已满
+        raise HTTPException(status_code=503, detail=f"模型服务暂不可用: {e}")
     except httpx.TimeoutException:
         raise HTTPException(status_code=504, detail="API 请求超时")
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(
+            status_code=e.response.status_code,
+            detail=f"OpenRouter API 错误: {e.response.text}"
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"密谈失败: {str(e)}")
 
 
+async def _stream_audience_reply(
+    client: httpx.AsyncClient,
+    advisor: str,
+    request_kwargs: dict,
+    stream: TurnStream,
+) -> str:
+    """以 SSE 方式请求密谈回复，逐段推送 advisor_delta，返回完整回复"""
+    request_kwargs["json"]["stream"] = True
+    parts = []
+
+    async with client.stream(
+        "POST",
+        f"{settings.openrouter_base_url}/chat/completions",
+        **request_kwargs,
+    ) as response:
+        if response.status_code >= 500:
+            await response.aread()
+            response.raise_for_status()
+        if response.status_code != 200:
+            body = await response.aread()
+            raise HTTPException(
+                status_code=response.status_code,
+                detail=f"OpenRouter API 错误: {body.decode(errors='replace')}"
+            )
+
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            payload = line[len("data:"):].strip()
+            if payload == "[DONE]":
+                break
+            try:
+                chunk = json.loads(payload)
+            except json.JSONDecodeError:
+                continue
+            if chunk.get("usage"):
+                get_prompt_cache_stats().record("private_audience", chunk["usage"])
+            choices = chunk.get("choices") or []
+            delta = (choices[0].get("delta") or {}).get("content") if choices else None
+            if delta:
+                parts.append(delta)
+                await stream.advisor_delta(advisor, delta)
+
+    reply = "".join(parts)
+    await stream.stage_done("private_audience", {"advisor": advisor, "response": reply})
+    return reply
+
+
 @app.post("/api/game/consequence")
 async def handle_consequence(request: HandleConsequenceRequest):
     """处理政令后果 - 玩家选择继续处理某个影响"""
@@ -918,10 +1143,11 @@ async def end_chapter_early(request: EndChapterRequest):
 @app.get("/api/game/{session_id}/judgment")
 async def get_judgment_state(session_id: str):
     """获取裁决引擎状态（调试用）"""
-    if session_id not in session_judgment_engines:
+    state = await session_store.get_judgment_state(session_id)
+    if state is None:
         raise HTTPException(status_code=404, detail="会话的裁决引擎不存在")
 
-    eng = session_judgment_engines[session_id]
+    eng = JudgmentEngine.from_state(state)
 
     return {
         "observation_lens": eng.observation_lens.value if eng.observation_lens else None,
@@ -952,7 +1178,7 @@ async def get_judgment_state(session_id: str):
 @app.get("/api/game/{session_id}")
 async def get_game_state(session_id: str):
     """获取游戏状态"""
-    game_state = await session_store.get(session_id)
+    game_state = await session_store.peek(session_id)
     if not game_state:
         raise HTTPException(status_code=404, detail="游戏会话不存在")
 
@@ -980,10 +1206,79 @@ async def get_game_state(session_id: str):
     }
 
 
+@app.get("/api/game/{session_id}/history")
+async def get_history_page(session_id: str, before: Optional[int] = None, limit: int = 20):
+    """
+    分页读取对话历史（按时间顺序返回）
+
+    before 为全局序号（不含），默认从最新一条往前读；返回的 next_before 用于请求更早的一页。
+    环形窗口内的条目从会话状态读取，更早的条目从归档读取。
+    """
+    game_state = await session_store.peek(session_id)
+    if not game_state:
+        raise HTTPException(status_code=404, detail="游戏会话不存在")
+
+    limit = max(1, min(limit, 100))
+    total = game_state.history_total
+    end = total if before is None else max(0, min(before, total))
+    start = max(0, end - limit)
+    archived = game_state.history_archived
+
+    entries = []
+    if start < archived:
+        entries.extend(await session_store.get_history_archive(session_id, start, min(end, archived)))
+    if end > archived:
+        entries.extend(game_state.history[max(start, archived) - archived:end - archived])
+
+    return {
+        "entries": [
+            {
+                "index": start + i,
+                "turn": e.turn,
+                "chapter": e.chapter,
+                "speaker": e.speaker,
+                "content": e.content,
+                "timestamp": e.timestamp.isoformat(),
+            }
+            for i, e in enumerate(entries)
+        ],
+        "total": total,
+        "next_before": start if start > 0 else None,
+    }
+
+
+@app.get("/api/game/{session_id}/events")
+async def get_event_log(session_id: str, seq: Optional[int] = None):
+    """
+    会话事件日志（调试用）
+
+    不带 seq 时返回事件摘要列表；带 seq 时重放到第 seq 个事件，返回当时的状态。
+    """
+    if seq is None:
+        events = await session_store.get_event_log(session_id)
+        if events is None:
+            raise HTTPException(status_code=404, detail="会话存储未启用事件日志")
+        return {"events": jsonable_encoder(events)}
+
+    if seq < 0:
+        raise HTTPException(status_code=400, detail="seq 不能为负数")
+    game_state = await session_store.rebuild_state(session_id, seq)
+    if game_state is None:
+        raise HTTPException(status_code=404, detail="会话存储未启用事件日志、会话不存在或 seq 不在保留的事件日志范围内")
+    return {
+        "seq": seq,
+        "state": game_state.to_summary(),
+        "history": [
+            {"turn": e.turn, "speaker": e.speaker, "content": e.content}
+            for e in game_state.history[-20:]
+        ],
+    }
+
+
 @app.get("/api/game/{session_id}/audit")
 async def get_audit(session_id: str):
     """获取审计报告（用于第五关）"""
-    game_state = await session_store.get(session_id)
+    game_state = await session_store.peek(session_id)
     if not game_state:
         raise HTTPException(status_code=404, detail="游戏会话不存在")
 
@@ -1052,6 +1347,9 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
             data = await websocket.receive_json()
             msg_type = data.get("type")
 
+            # "stream": true 时先推送 LLM 增量帧，最后再发送完整结果
+            stream = TurnStream(websocket.send_json) if data.get("stream") else None
+
             if msg_type == "start_chapter":
                 request = StartChapterRequest(
                     session_id=session_id,
@@ -1060,7 +1358,7 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
                     model=data.get("model"),
                 )
                 try:
-                    result = await start_chapter(request)
+                    result = await _start_chapter(request, stream=stream)
                     await websocket.send_json({"type": "chapter_started", "data": result})
                 except HTTPException as e:
                     await websocket.send_json({"type": "error", "message": e.detail})
@@ -1074,11 +1372,25 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
                     model=data.get("model"),
                 )
                 try:
-                    result = await make_decision(request)
+                    result = await _make_decision(request, stream=stream)
                     await websocket.send_json({"type": "decision_result", "data": result})
                 except HTTPException as e:
                     await websocket.send_json({"type": "error", "message": e.detail})
 
+            elif msg_type == "private_audience":
+                request = PrivateAudienceRequest(
+                    session_id=session_id,
+                    advisor=data.get("advisor", ""),
+                    message=data.get("message", ""),
+                    api_key=data.get("api_key", ""),
+                    model=data.get("model"),
+                )
+                try:
+                    result = await _private_audience(request, stream=stream)
+                    await websocket.send_json({"type": "private_audience_result", "data": result})
+                except HTTPException as e:
+                    await websocket.send_json({"type": "error", "message": e.detail})
+
     except WebSocketDisconnect:
         manager.disconnect(session_id)
 
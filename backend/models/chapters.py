@@ -2,8 +2,9 @@
 关卡系统模型
 定义5个关卡的场景、困境和博弈机制
 """
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, Field
+from types import MappingProxyType
+from typing import Mapping, Optional
 from enum import Enum
 
 
@@ -26,6 +27,8 @@ class ChapterStatus(str, Enum):
 
 class AdvisorSuggestion(BaseModel):
     """顾问建议"""
+    model_config = ConfigDict(frozen=True)
+
     advisor: str  # lion / fox / balance
     suggestion: str
     reasoning: str
@@ -33,7 +36,9 @@ class AdvisorSuggestion(BaseModel):
 
 
 class Chapter(BaseModel):
-    """关卡定义"""
+    """关卡定义（注册表中的共享实例，只读）"""
+    model_config = ConfigDict(frozen=True)
+
     id: ChapterID
     name: str
     subtitle: str
@@ -91,10 +96,10 @@ class ChapterProgress(BaseModel):
 
 
 class ChapterLibrary:
-    """关卡库"""
+    """关卡库（注册表在导入时构建一次，查询不再重建模型）"""
 
     @staticmethod
-    def get_all_chapters() -> dict[ChapterID, Chapter]:
+    def _build_chapters() -> dict[ChapterID, Chapter]:
         return {
             ChapterID.CHAPTER_1: Chapter(
                 id=ChapterID.CHAPTER_1,
@@ -512,23 +517,31 @@ class ChapterLibrary:
         }
 
     @staticmethod
-    def get_chapter(chapter_id: ChapterID) -> Chapter:
-        chapters = ChapterLibrary.get_all_chapters()
-        return chapters.get(chapter_id)
+    def get_all_chapters() -> Mapping[ChapterID, Chapter]:
+        return _CHAPTERS
+
+    @staticmethod
+    def get_chapter(chapter_id: ChapterID) -> Optional[Chapter]:
+        return _CHAPTERS.get(chapter_id)
+
+    @staticmethod
+    def get_chapter_order() -> tuple[ChapterID, ...]:
+        return _CHAPTER_ORDER
 
     @staticmethod
     def get_next_chapter(current_id: ChapterID) -> Optional[ChapterID]:
-        order = [
-            ChapterID.CHAPTER_1,
-            ChapterID.CHAPTER_2,
-            ChapterID.CHAPTER_3,
-            ChapterID.CHAPTER_4,
-            ChapterID.CHAPTER_5,
-        ]
-        try:
-            idx = order.index(current_id)
-            if idx < len(order) - 1:
-                return order[idx + 1]
-        except ValueError:
-            pass
-        return None
+        return _NEXT_CHAPTER.get(current_id)
+
+
+# 只读注册表与索引
+_CHAPTERS: Mapping[ChapterID, Chapter] = MappingProxyType(ChapterLibrary._build_chapters())
+_CHAPTER_ORDER: tuple[ChapterID, ...] = (
+    ChapterID.CHAPTER_1,
+    ChapterID.CHAPTER_2,
+    ChapterID.CHAPTER_3,
+    ChapterID.CHAPTER_4,
+    ChapterID.CHAPTER_5,
+)
+_NEXT_CHAPTER: Mapping[ChapterID, ChapterID] = MappingProxyType(
+    dict(zip(_CHAPTER_ORDER, _CHAPTER_ORDER[1:]))
+)
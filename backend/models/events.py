@@ -2,8 +2,9 @@
 事件系统模型
 定义游戏中的突发事件和困境
 """
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, Field
+from types import MappingProxyType
+from typing import Mapping, Optional
 from enum import Enum
 import random
 
@@ -24,7 +25,8 @@ class EventType(str, Enum):
 
 
 class Event(BaseModel):
-    """事件定义"""
+    """事件定义（注册表中的共享实例，只读）"""
+    model_config = ConfigDict(frozen=True)
 
     id: str
     type: EventType
@@ -45,11 +47,11 @@ class Event(BaseModel):
 
 
 class EventLibrary:
-    """事件库"""
+    """事件库（注册表在导入时构建一次，按类型与触发条件预建索引）"""
 
     @staticmethod
-    def get_all_events() -> dict[str, Event]:
-        """获取所有事件定义"""
+    def _build_events() -> dict[str, Event]:
+        """构建所有事件定义"""
         return {
             # 骚乱事件 (L < 20% 触发)
             "riot_peasant": Event(
@@ -277,30 +279,35 @@ class EventLibrary:
             ),
         }
 
+    @staticmethod
+    def get_all_events() -> Mapping[str, Event]:
+        """获取所有事件定义"""
+        return _EVENTS
+
+    @staticmethod
+    def get_events_by_type(event_type: EventType) -> tuple[Event, ...]:
+        """按事件类型查询"""
+        return _EVENTS_BY_TYPE.get(event_type, ())
+
+    @staticmethod
+    def get_events_by_trigger(trigger_condition: str) -> tuple[Event, ...]:
+        """按触发条件查询"""
+        return _EVENTS_BY_TRIGGER.get(trigger_condition, ())
+
     @staticmethod
     def get_riot_event() -> Event:
         """获取骚乱事件"""
-        events = EventLibrary.get_all_events()
-        riot_events = [e for e in events.values() if e.type == EventType.RIOT]
-        return random.choice(riot_events)
+        return random.choice(_EVENTS_BY_TYPE[EventType.RIOT])
 
     @staticmethod
     def get_coup_event() -> Event:
         """获取政变事件"""
-        events = EventLibrary.get_all_events()
-        coup_events = [e for e in events.values() if e.type == EventType.COUP]
-        return random.choice(coup_events)
+        return random.choice(_EVENTS_BY_TYPE[EventType.COUP])
 
     @staticmethod
     def get_random_event() -> Event:
         """获取随机事件"""
-        events = EventLibrary.get_all_events()
-        random_events = [
-            e
-            for e in events.values()
-            if e.trigger_condition == "random"
-        ]
-        return random.choice(random_events)
+        return random.choice(_EVENTS_BY_TRIGGER["random"])
 
     @staticmethod
     def check_triggered_events(power) -> Optional[Event]:
@@ -313,3 +320,16 @@ class EventLibrary:
         if random.random() < 0.1:
             return EventLibrary.get_random_event()
         return None
+
+
+def _build_index(events: Mapping[str, Event], key) -> Mapping:
+    index: dict = {}
+    for event in events.values():
+        index.setdefault(key(event), []).append(event)
+    return MappingProxyType({k: tuple(v) for k, v in index.items()})
+
+
+# 只读注册表与索引
+_EVENTS: Mapping[str, Event] = MappingProxyType(EventLibrary._build_events())
+_EVENTS_BY_TYPE: Mapping[EventType, tuple[Event, ...]] = _build_index(_EVENTS, lambda e: e.type)
+_EVENTS_BY_TRIGGER: Mapping[str, tuple[Event, ...]] = _build_index(_EVENTS, lambda e: e.trigger_condition)
@@ -2,16 +2,38 @@
 游戏状态模型
 管理玩家与三机器人的关系、对话历史和游戏进程
 """
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Field, PrivateAttr
+from typing import ClassVar, Optional
 from datetime import datetime
 from enum import Enum
+import functools
 import uuid
 import random
 
 from .power_vector import PowerVector
 
 
+def journaled(method):
+    """
+    状态操作记录：调用时把方法名追加到 GameState 的操作日志，
+    由会话存储写入事件日志。只记录最外层调用（内部互相调用不重复记录）。
+    """
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        private = self.__pydantic_private__
+        if private["_journal_depth"] == 0:
+            private["_journal"].append(name)
+        private["_journal_depth"] += 1
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            private["_journal_depth"] -= 1
+
+    return wrapper
+
+
 class RobotType(str, Enum):
     """机器人类型"""
     LION = "lion"  # 狮子 - 暴力与效率审计
@@ -229,8 +251,13 @@ class GameState(BaseModel):
     # 关卡进度
     chapter_states: dict[str, ChapterState] = Field(default_factory=dict)
 
-    # 对话历史
+    # 对话历史（只保留最近 HISTORY_RING_SIZE 条，更早的条目由会话存储归档）
+    HISTORY_RING_SIZE: ClassVar[int] = 50
     history: list[DialogueEntry] = Field(default_factory=list)
+    history_archived: int = 0  # 已归档的条目数，即 history[0] 的全局序号
+    _archive_pending: list[DialogueEntry] = PrivateAttr(default_factory=list)  # 待写入归档的条目
+    _journal: list[str] = PrivateAttr(default_factory=list)  # 上次保存以来的状态操作
+    _journal_depth: int = PrivateAttr(default=0)
 
     # 承诺追踪系统
     promises: list[Promise] = Field(default_factory=list)
@@ -274,8 +301,34 @@ class GameState(BaseModel):
     # 待处理危机列表
     pending_crises: list[dict] = Field(default_factory=list)
 
+    # ==================== 数值变化 ====================
+
+    @journaled
+    def apply_power_delta(self, delta_a: float = 0, delta_f: float = 0, delta_l: float = 0) -> PowerVector:
+        """应用三维权力变化"""
+        self.power = self.power.apply_delta(delta_a, delta_f, delta_l)
+        return self.power
+
+    @journaled
+    def apply_relation_delta(self, advisor: str, delta_trust: float, delta_loyalty: float = 0) -> Optional[RobotRelation]:
+        """应用顾问关系变化"""
+        if advisor not in self.relations:
+            return None
+        self.relations[advisor] = self.relations[advisor].apply_delta(delta_trust, delta_loyalty)
+        return self.relations[advisor]
+
+    @property
+    def journal(self) -> list[str]:
+        """上次保存以来调用过的状态操作"""
+        return self._journal
+
+    def clear_journal(self) -> None:
+        """操作已写入事件日志后清空"""
+        self._journal = []
+
     # ==================== 危机处理系统 ====================
 
+    @journaled
     def add_crisis(
         self,
         crisis_id: str,
@@ -307,6 +360,7 @@ class GameState(BaseModel):
         self.pending_crises.append(crisis)
         return crisis
 
+    @journaled
     def resolve_crisis(self, crisis_id: str) -> bool:
         """标记危机为已解决"""
         for crisis in self.pending_crises:
@@ -316,6 +370,7 @@ class GameState(BaseModel):
                 return True
         return False
 
+    @journaled
     def tick_crises(self) -> list[dict]:
         """每回合更新危机状态，返回触发的危机"""
         triggered = []
@@ -337,7 +392,7 @@ class GameState(BaseModel):
             # 未处理的惩罚（每回合累积）
             if not crisis["resolved"] and crisis.get("unresolved_penalty"):
                 penalty = crisis["unresolved_penalty"]
-                self.power = self.power.apply_delta(
+                self.apply_power_delta(
                     delta_a=penalty.get("authority", 0),
                     delta_l=penalty.get("love", 0),
                     delta_f=penalty.get("fear", 0),
@@ -365,6 +420,7 @@ class GameState(BaseModel):
             if not c["resolved"] and c.get("deadline_turns") == 1
         ]
 
+    @journaled
     def carry_over_crises_to_next_chapter(self) -> list[dict]:
         """将未解决的危机带到下一关（恶化）"""
         carried = []
@@ -391,6 +447,7 @@ class GameState(BaseModel):
 
     # ==================== 承诺系统 ====================
 
+    @journaled
     def make_promise(
         self,
         target: str,
@@ -411,6 +468,7 @@ class GameState(BaseModel):
         self.stats["promises_made"] += 1
         return promise
 
+    @journaled
     def fulfill_promise(self, promise_id: str) -> bool:
         """兑现承诺"""
         for p in self.promises:
@@ -421,6 +479,7 @@ class GameState(BaseModel):
                 return True
         return False
 
+    @journaled
     def check_broken_promises(self) -> list[Promise]:
         """检查过期未兑现的承诺"""
         broken = []
@@ -442,6 +501,7 @@ class GameState(BaseModel):
 
     # ==================== 把柄系统 ====================
 
+    @journaled
     def add_leverage(
         self,
         holder: str,
@@ -465,6 +525,7 @@ class GameState(BaseModel):
         """获取某人持有的所有把柄"""
         return [l for l in self.leverages if l.holder == holder and not l.used]
 
+    @journaled
     def use_leverage(self, leverage_id: str) -> Optional[Leverage]:
         """使用把柄"""
         for l in self.leverages:
@@ -475,6 +536,7 @@ class GameState(BaseModel):
 
     # ==================== 秘密系统 ====================
 
+    @journaled
     def add_secret(
         self,
         action: str,
@@ -492,6 +554,7 @@ class GameState(BaseModel):
         self.secrets.append(secret)
         return secret
 
+    @journaled
     def check_secret_leaks(self) -> list[Secret]:
         """检查秘密泄露"""
         leaked = []
@@ -513,6 +576,7 @@ class GameState(BaseModel):
 
     # ==================== 决策记录 ====================
 
+    @journaled
     def record_decision(
         self,
         decision: str,
@@ -621,6 +685,7 @@ class GameState(BaseModel):
 
     # ==================== 因果系统 ====================
 
+    @journaled
     def add_shadow_seed(
         self,
         description: str,
@@ -691,6 +756,7 @@ class GameState(BaseModel):
         # 可以添加更多条件
         return False
 
+    @journaled
     def trigger_seed(
         self,
         seed_id: str,
@@ -717,6 +783,7 @@ class GameState(BaseModel):
                 return echo
         return None
 
+    @journaled
     def add_immediate_flag(
         self,
         name: str,
@@ -740,6 +807,7 @@ class GameState(BaseModel):
         self.causal_state.immediate_flags.append(flag)
         return flag
 
+    @journaled
     def remove_immediate_flag(self, flag_id: str) -> bool:
         """移除即时状态标记"""
         for i, flag in enumerate(self.causal_state.immediate_flags):
@@ -748,6 +816,7 @@ class GameState(BaseModel):
                 return True
         return False
 
+    @journaled
     def tick_immediate_flags(self):
         """处理即时标记的回合计时"""
         expired = []
@@ -800,6 +869,7 @@ class GameState(BaseModel):
 
     # ==================== 基础方法 ====================
 
+    @journaled
     def add_dialogue(
         self,
         speaker: str,
@@ -821,13 +891,34 @@ class GameState(BaseModel):
             is_promise=is_promise,
         )
         self.history.append(entry)
+        # 超出环形窗口的旧条目移入待归档列表，由会话存储在保存时写入归档
+        overflow = len(self.history) - self.HISTORY_RING_SIZE
+        if overflow > 0:
+            self._archive_pending.extend(self.history[:overflow])
+            del self.history[:overflow]
+            self.history_archived += overflow
         self.updated_at = datetime.now()
         return entry
 
+    @property
+    def archive_pending(self) -> list[DialogueEntry]:
+        """待归档的对话条目（全局序号从 history_archived - len 开始）"""
+        return self._archive_pending
+
+    def clear_archive_pending(self) -> None:
+        """归档写入成功后清空"""
+        self._archive_pending = []
+
+    @property
+    def history_total(self) -> int:
+        """对话总条数（含已归档）"""
+        return self.history_archived + len(self.history)
+
     def get_recent_history(self, n: int = 10) -> list[DialogueEntry]:
         """获取最近n条对话"""
         return self.history[-n:] if len(self.history) > n else self.history
 
+    @journaled
     def next_turn(self):
         """进入下一回合"""
         self.chapter_turn += 1
@@ -838,6 +929,7 @@ class GameState(BaseModel):
         self.check_broken_promises()
         self.check_secret_leaks()
 
+    @journaled
     def start_chapter(self, chapter_id: str, initial_power: dict = None):
         """开始新关卡"""
         self.current_chapter = chapter_id
@@ -856,6 +948,7 @@ class GameState(BaseModel):
             start_turn=self.total_turn,
         )
 
+    @journaled
     def complete_chapter(self, ending_type: str, score: int):
         """完成关卡"""
         if self.current_chapter in self.chapter_states:
@@ -865,6 +958,7 @@ class GameState(BaseModel):
             state.ending_type = ending_type
             state.score = score
 
+    @journaled
     def fail_chapter(self, reason: str):
         """关卡失败"""
         if self.current_chapter in self.chapter_states:
@@ -873,6 +967,7 @@ class GameState(BaseModel):
             state.end_turn = self.total_turn
             state.ending_type = reason
 
+    @journaled
     def end_game(self, reason: str, ending_type: str = "neutral"):
         """结束游戏"""
         self.game_over = True
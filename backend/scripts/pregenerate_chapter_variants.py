@@ -0,0 +1,90 @@
+"""
+预生成关卡开场白与议会辩论变体
+
+用法（在 backend 目录下）：
+    python scripts/pregenerate_chapter_variants.py --api-key sk-... --variants 3
+    python scripts/pregenerate_chapter_variants.py --chapters chapter_1 chapter_2 --power 50,40,45 --credit 70
+
+默认为每个关卡的开局状态（新游戏初始值 + 关卡初始修正）生成变体；
+--power/--credit 可追加其它权力/信用区间。已有足够变体的分桶会被跳过。
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import settings  # noqa: E402
+from engine import ChapterEngine  # noqa: E402
+from models import GameState, PowerVector, ChapterLibrary, ChapterID  # noqa: E402
+from storage.variant_store import get_variant_store, variant_bucket_key  # noqa: E402
+
+
+def build_states(chapter_id: ChapterID, extra_powers: list, credit: float) -> list:
+    """构造需要预生成的游戏状态（与 /api/game/new 的初始权力一致）"""
+    chapter = ChapterLibrary.get_chapter(chapter_id)
+    states = []
+    for power in [None] + extra_powers:
+        state = GameState(power=PowerVector(authority=50.0, fear=40.0, love=45.0))
+        state.credit_score = credit
+        state.start_chapter(chapter_id.value, chapter.initial_modifiers or None)
+        if power:
+            # 关卡初始修正会覆盖开局权力，追加的权力区间在其后设置，否则与开局状态落入同一分桶
+            authority, fear, love = power
+            state.power = PowerVector(authority=authority, fear=fear, love=love)
+        states.append(state)
+    return states
+
+
+async def pregenerate(args) -> None:
+    store = get_variant_store()
+    engine = ChapterEngine(api_key=args.api_key, model=args.model)
+    engine.use_pregenerated = False
+
+    chapter_ids = [ChapterID(c) for c in args.chapters] if args.chapters else ChapterLibrary.get_chapter_order()
+    extra_powers = [tuple(float(v) for v in p.split(",")) for p in args.power]
+
+    for chapter_id in chapter_ids:
+        chapter = ChapterLibrary.get_chapter(chapter_id)
+        for state in build_states(chapter_id, extra_powers, args.credit):
+            key = variant_bucket_key(chapter_id.value, state)
+
+            while store.count(key, "opening") < args.variants:
+                opening = await engine.generate_chapter_opening(chapter, state)
+                if opening == chapter.background:
+                    print(f"[Pregenerate] {key} 开场白生成失败，跳过")
+                    break
+                store.add(key, "opening", opening)
+
+            while store.count(key, "debate_dialogue") < args.variants:
+                dialogue = await engine._generate_debate_dialogue(chapter, state)
+                if len(dialogue) == 2 and dialogue[0]["content"] == chapter.lion_suggestion.suggestion:
+                    print(f"[Pregenerate] {key} 辩论对话生成失败，跳过")
+                    break
+                store.add(key, "debate_dialogue", dialogue)
+
+            store.save()
+            print(f"[Pregenerate] {key}: 开场白 {store.count(key, 'opening')} 个, "
+                  f"辩论 {store.count(key, 'debate_dialogue')} 个")
+
+    print(f"[Pregenerate] 完成，变体文件: {store.path} {store.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="预生成关卡开场白与议会辩论变体")
+    parser.add_argument("--api-key", default=settings.openrouter_api_key or os.environ.get("OPENROUTER_API_KEY", ""))
+    parser.add_argument("--model", default=settings.default_model)
+    parser.add_argument("--variants", type=int, default=3, help="每个分桶的变体数量")
+    parser.add_argument("--chapters", nargs="*", help="关卡ID，默认全部")
+    parser.add_argument("--power", action="append", default=[], help="追加的权力状态 掌控,畏惧,爱戴，可重复")
+    parser.add_argument("--credit", type=float, default=100.0, help="信用分")
+    args = parser.parse_args()
+
+    if not args.api_key:
+        parser.error("需要 --api-key 或 OPENROUTER_API_KEY")
+    asyncio.run(pregenerate(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,32 @@
-from .session_store import SessionStore, InMemorySessionStore
+from .session_store import SessionStore, InMemorySessionStore, create_session_store
+from .response_cache import (
+    ResponseCache,
+    InMemoryResponseCache,
+    get_analysis_cache,
+    normalize_player_input,
+)
+from .session_cache import CachedSessionStore
+from .sqlite_store import SqliteSessionStore
+from .codec import StateCodec, JsonCodec, get_codec
+from .trusted_loader import trusted_load, trusted_load_json
+from .variant_store import ChapterVariantStore, get_variant_store, variant_bucket_key
 
-__all__ = ["SessionStore", "InMemorySessionStore"]
+__all__ = [
+    "SessionStore",
+    "InMemorySessionStore",
+    "create_session_store",
+    "CachedSessionStore",
+    "SqliteSessionStore",
+    "ResponseCache",
+    "InMemoryResponseCache",
+    "get_analysis_cache",
+    "normalize_player_input",
+    "StateCodec",
+    "JsonCodec",
+    "get_codec",
+    "trusted_load",
+    "trusted_load_json",
+    "ChapterVariantStore",
+    "get_variant_store",
+    "variant_bucket_key",
+]
@@ -0,0 +1,220 @@
+"""
+会话状态编解码
+把 GameState（或其中的字段、列表元素）编码为字节，供会话存储使用
+
+- json: 与 model_dump_json 相同的 JSON 文本
+- msgpack: 紧凑二进制格式（需要安装 msgpack）
+  - 已知字段名编码为短整数标签
+  - 枚举编码为整数
+  - uuid 字符串编码为 16 字节 bin
+  - 时间编码为纪元微秒
+
+字典键需为字符串（与 JSON 相同）。
+二进制数据以 0xC1（msgpack 与 JSON 都不会使用的首字节）加模式版本号开头，
+解码时据此区分二进制与旧的 JSON 数据，因此已有的 JSON 数据无需迁移脚本即可读取，
+下次保存时自动改写为当前编码。
+"""
+import json
+import re
+import struct
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from enum import Enum
+from typing import Any
+
+import pydantic_core
+
+from models.game_state import ImmediateFlagType, ShadowSeedSeverity, ShadowSeedTag
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    msgpack = None
+    MSGPACK_AVAILABLE = False
+
+
+BINARY_MARKER = b"\xc1"
+SCHEMA_VERSION = 1
+
+# 字段名标签表（只能在末尾追加；删除或调整顺序需要提升 SCHEMA_VERSION）
+FIELD_TAGS_V1 = (
+    # GameState 及其子模型的字段
+    "session_id", "created_at", "updated_at", "power", "authority", "fear", "love",
+    "relations", "trust", "loyalty", "current_chapter", "chapter_turn", "total_turn",
+    "chapter_states", "chapter_id", "status", "start_turn", "end_turn", "decisions",
+    "turn", "chapter", "decision", "followed_advisor", "was_violent", "was_deceptive",
+    "was_fair", "impact", "ending_type", "score", "history", "id", "timestamp",
+    "speaker", "content", "target", "intent", "is_lie", "is_promise", "promises",
+    "deadline", "fulfilled", "broken", "keywords", "credit_score", "leverages",
+    "holder", "type", "description", "severity", "turn_acquired", "used", "secrets",
+    "action", "known_by", "leak_probability", "leaked", "consequences_if_leaked",
+    "all_decisions", "stats", "game_over", "game_over_reason", "hide_values",
+    "observation_lens", "causal_state", "shadow_seeds", "origin_chapter",
+    "origin_turn", "trigger_chapter", "trigger_delay", "trigger_condition", "tag",
+    "player_visible_hint", "is_triggered", "triggered_at", "immediate_flags", "name",
+    "effect_on_scene", "duration_turns", "source_seed_id", "modifiers",
+    "triggered_echoes", "seed_id", "seed_description", "trigger_turn",
+    "echo_narrative", "crisis_modifier", "advisor_reactions", "pending_crises",
+    # 常见的字典键
+    "lion", "fox", "balance",
+    "promises_made", "promises_kept", "promises_broken", "lies_told", "lies_caught",
+    "violent_decisions", "fair_decisions", "deceptive_decisions",
+    "title", "requires_action", "deadline_turns", "auto_trigger_effect",
+    "unresolved_penalty", "created_turn", "created_chapter", "resolved", "resolution_turn",
+    "history_archived",
+)
+
+# 枚举表（同样只能在末尾追加）
+ENUM_TABLE_V1 = (ShadowSeedTag, ShadowSeedSeverity, ImmediateFlagType)
+_ENUM_MEMBERS = tuple(tuple(enum_cls) for enum_cls in ENUM_TABLE_V1)
+
+# msgpack 扩展类型（uuid 直接用 bin 类型，不占用扩展类型）
+_EXT_DATETIME = 2  # 无时区时间，int64 纪元微秒
+_EXT_ENUM = 3  # (枚举表序号, 成员序号)
+
+_UUID_RE = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+_INT64 = struct.Struct(">q")
+_PLAIN_TYPES = frozenset({int, float, bool, type(None)})
+
+
+class StateCodec(ABC):
+    """会话状态编解码器"""
+
+    name = "abstract"
+
+    @abstractmethod
+    def encode(self, value: Any) -> bytes:
+        """编码 model_dump() 得到的值（字典、列表或标量）"""
+        pass
+
+    def decode(self, data: bytes) -> Any:
+        """解码；自动识别二进制数据与 JSON 数据"""
+        if data[:1] == BINARY_MARKER:
+            return _decode_binary(data)
+        return json.loads(data)
+
+
+class JsonCodec(StateCodec):
+    """JSON 编码（与 model_dump_json 一致）"""
+
+    name = "json"
+
+    def encode(self, value: Any) -> bytes:
+        return pydantic_core.to_json(value)
+
+
+class MsgpackCodec(StateCodec):
+    """紧凑二进制编码"""
+
+    name = "msgpack"
+
+    def __init__(self):
+        if not MSGPACK_AVAILABLE:
+            raise ImportError("需要安装 msgpack")
+        self._tags = {name: i for i, name in enumerate(FIELD_TAGS_V1)}
+        self._enums = {
+            member: struct.pack(">BB", table_index, member_index)
+            for table_index, enum_cls in enumerate(ENUM_TABLE_V1)
+            for member_index, member in enumerate(enum_cls)
+        }
+
+    def encode(self, value: Any) -> bytes:
+        header = BINARY_MARKER + bytes([SCHEMA_VERSION])
+        return header + msgpack.packb(self._compact(value), use_bin_type=True)
+
+    def _compact(self, value: Any) -> Any:
+        """把字段名替换为标签并预先转换特殊类型（按精确类型分派，避免逐个 isinstance）"""
+        value_type = type(value)
+        if value_type is dict:
+            tags = self._tags
+            compact = self._compact
+            result = {}
+            for k, v in value.items():
+                # 普通标量直接写入，省去递归调用
+                v_type = type(v)
+                if v_type in _PLAIN_TYPES or (v_type is str and len(v) != 36):
+                    result[tags.get(k, k)] = v
+                else:
+                    result[tags.get(k, k)] = compact(v)
+            return result
+        if value_type is list or value_type is tuple:
+            compact = self._compact
+            return [compact(v) for v in value]
+        if value_type is str:
+            if len(value) == 36 and _UUID_RE.match(value):
+                # uuid 以 16 字节 bin 存储（GameState 中没有其它字节类型字段）
+                return bytes.fromhex(value.replace("-", ""))
+            return value
+        if value_type in _PLAIN_TYPES:
+            return value
+        if value_type is datetime:
+            if value.tzinfo is None:
+                micros = (value - _EPOCH) // _MICROSECOND
+                return msgpack.ExtType(_EXT_DATETIME, _INT64.pack(micros))
+            return value.isoformat()
+        if isinstance(value, Enum):
+            packed = self._enums.get(value)
+            if packed is not None:
+                return msgpack.ExtType(_EXT_ENUM, packed)
+            return value.value
+        return value
+
+
+def _ext_hook(code: int, data: bytes) -> Any:
+    if code == _EXT_DATETIME:
+        return _EPOCH + timedelta(microseconds=_INT64.unpack(data)[0])
+    if code == _EXT_ENUM:
+        table_index, member_index = struct.unpack(">BB", data)
+        return _ENUM_MEMBERS[table_index][member_index]
+    return msgpack.ExtType(code, data)
+
+
+def _restore(value: Any) -> Any:
+    """bin 还原为 uuid 字符串；列表逐项处理"""
+    value_type = type(value)
+    if value_type is bytes:
+        h = value.hex()
+        return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+    if value_type is list:
+        return [_restore(v) if type(v) in (bytes, list) else v for v in value]
+    return value
+
+
+def _object_hook(obj: dict) -> dict:
+    """解码每个字典时把标签还原为字段名（由 msgpack 自底向上调用，内层字典已处理）"""
+    result = {}
+    for k, v in obj.items():
+        if type(k) is int:
+            k = FIELD_TAGS_V1[k]
+        if type(v) in (bytes, list):
+            v = _restore(v)
+        result[k] = v
+    return result
+
+
+def _decode_binary(data: bytes) -> Any:
+    if not MSGPACK_AVAILABLE:
+        raise ImportError("读取二进制会话数据需要安装 msgpack")
+    version = data[1]
+    if version != SCHEMA_VERSION:
+        raise ValueError(f"不支持的会话编码版本: {version}")
+    value = msgpack.unpackb(
+        data[2:],
+        ext_hook=_ext_hook,
+        object_hook=_object_hook,
+        raw=False,
+        strict_map_key=False,
+    )
+    return _restore(value)
+
+
+def get_codec(name: str) -> StateCodec:
+    """按名称获取编解码器；msgpack 未安装时退回 JSON"""
+    if name == "msgpack":
+        if MSGPACK_AVAILABLE:
+            return MsgpackCodec()
+        print("[StateCodec] 未安装 msgpack，使用 JSON 编码")
+    return JsonCodec()
@@ -0,0 +1,303 @@
+"""
+会话事件日志
+每次保存把本次的状态变化作为一个事件追加到会话的事件日志，定期写入快照；
+读取时从最近的快照开始重放之后的事件。保存只追加一个小事件，
+任意历史时刻的状态都可以从日志重放得到，便于调试。
+
+事件格式（各值为 model_dump() 的取值，整体由 StateCodec 编码）：
+- seq / turn / chapter / at: 事件序号、回合、关卡与状态更新时间
+- ops: 上次保存以来调用的状态操作（record_decision、apply_power_delta 等）
+- kind: full（完整状态）或 delta（增量）
+- fields: 变化的标量字段；removed: 删除的字段
+- lists: 变化的列表字段，{路径: {drop, truncate, set, append}}，按此顺序应用
+
+操作本身依赖随机数、uuid 与当前时间，引擎也会直接修改字段，所以事件记录的是操作产生的结果，
+操作名只用于说明这次变化的来源。
+"""
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from config import settings
+from models.game_state import GameState
+from .session_store import (
+    RedisSessionStore,
+    join_game_data,
+    load_stored_state,
+    split_game_data,
+)
+
+
+@dataclass
+class _EventFingerprint:
+    """本进程最后一次读写某会话时的状态（拆分后的取值）与对应事件序号"""
+    seq: int
+    fields: dict
+    lists: dict[str, list]
+
+
+def diff_list(old: list, new: list) -> Optional[dict]:
+    """计算列表增量；没有变化时返回 None"""
+    if old == new:
+        return None
+
+    # 环形窗口滚动：旧列表去掉开头若干项后是新列表的前缀
+    if old and new and old[0] != new[0]:
+        try:
+            shift = old.index(new[0])
+        except ValueError:
+            shift = 0
+        kept = len(old) - shift
+        if shift and kept <= len(new) and old[shift:] == new[:kept]:
+            delta = {"drop": shift}
+            if len(new) > kept:
+                delta["append"] = new[kept:]
+            return delta
+
+    delta = {}
+    if len(new) < len(old):
+        delta["truncate"] = len(new)
+    changed = [[i, new[i]] for i in range(min(len(old), len(new))) if old[i] != new[i]]
+    if changed:
+        delta["set"] = changed
+    if len(new) > len(old):
+        delta["append"] = new[len(old):]
+    return delta
+
+
+def build_event(
+    seq: int,
+    state: GameState,
+    previous: Optional[_EventFingerprint],
+    fields: dict,
+    lists: dict[str, list],
+) -> Optional[dict]:
+    """与上次状态比较生成事件；previous 为 None 时生成完整事件，没有变化时返回 None"""
+    event = {
+        "seq": seq,
+        "turn": state.total_turn,
+        "chapter": state.current_chapter,
+        "at": state.updated_at,
+        "ops": list(state.journal),
+    }
+    if previous is None:
+        event.update(kind="full", fields=fields, lists=lists)
+        return event
+
+    changed_fields = {
+        name: value for name, value in fields.items()
+        if name not in previous.fields or previous.fields[name] != value
+    }
+    removed = [name for name in previous.fields if name not in fields]
+    changed_lists = {}
+    for path, items in lists.items():
+        delta = diff_list(previous.lists.get(path, []), items)
+        if delta is not None:
+            changed_lists[path] = delta
+
+    if not changed_fields and not removed and not changed_lists:
+        return None
+    event.update(kind="delta", fields=changed_fields, lists=changed_lists)
+    if removed:
+        event["removed"] = removed
+    return event
+
+
+def apply_event(fields: dict, lists: dict[str, list], event: dict) -> tuple[dict, dict[str, list]]:
+    """把事件应用到拆分后的状态上，返回新的 (fields, lists)"""
+    if event["kind"] == "full":
+        return dict(event["fields"]), {path: list(items) for path, items in event["lists"].items()}
+
+    fields.update(event["fields"])
+    for name in event.get("removed", ()):
+        fields.pop(name, None)
+    for path, delta in event["lists"].items():
+        items = lists.setdefault(path, [])
+        if "drop" in delta:
+            del items[:delta["drop"]]
+        if "truncate" in delta:
+            del items[delta["truncate"]:]
+        for index, value in delta.get("set", ()):
+            items[index] = value
+        items.extend(delta.get("append", ()))
+    return fields, lists
+
+
+def event_summary(event: dict) -> dict:
+    """事件摘要（不含具体取值）"""
+    return {
+        "seq": event["seq"],
+        "kind": event["kind"],
+        "turn": event.get("turn"),
+        "chapter": event.get("chapter"),
+        "at": event.get("at"),
+        "ops": event.get("ops", []),
+        "fields": sorted(event["fields"]),
+        "lists": sorted(event["lists"]),
+    }
+
+
+if RedisSessionStore is not None:
+    from redis.exceptions import WatchError
+
+    class RedisEventSessionStore(RedisSessionStore):
+        """
+        以事件日志保存会话的 Redis 存储
+
+        布局（裁决引擎状态与对话归档与 RedisSessionStore 相同）：
+        - {prefix}{session_id}:events     列表，从最近快照的事件（没有快照时从第 0 个事件）起依次保存
+        - {prefix}{session_id}:snapshot   哈希，seq + 该事件之后的完整状态
+
+        写入快照时裁掉快照之前的事件，列表长度不超过 snapshot_interval + 1；
+        列表第 0 项为第 base 个事件（base 为快照的 seq，没有快照时为 0）。
+        第一个事件与并发写入后的第一个事件为完整状态，其余为增量。
+        没有事件日志的会话（分字段布局或旧版整块 JSON）按原布局读取，下次保存时迁移。
+        """
+
+        def __init__(self, redis_url: str, snapshot_interval: Optional[int] = None, **kwargs):
+            super().__init__(redis_url, **kwargs)
+            self.snapshot_interval = snapshot_interval or settings.session_snapshot_interval
+            self._event_fingerprints: OrderedDict[str, _EventFingerprint] = OrderedDict()
+
+        def _events_key(self, session_id: str) -> str:
+            return f"{self.prefix}{session_id}:events"
+
+        def _snapshot_key(self, session_id: str) -> str:
+            return f"{self.prefix}{session_id}:snapshot"
+
+        def _remember_event(self, session_id: str, fingerprint: _EventFingerprint) -> None:
+            self._event_fingerprints[session_id] = fingerprint
+            self._event_fingerprints.move_to_end(session_id)
+            while len(self._event_fingerprints) > self.fingerprint_cache_size:
+                self._event_fingerprints.popitem(last=False)
+
+        async def _base_seq(self, redis, session_id: str) -> int:
+            """事件列表第 0 项的序号（最近快照的 seq，没有快照时为 0）"""
+            seq = await redis.hget(self._snapshot_key(session_id), "seq")
+            return int(seq) if seq is not None else 0
+
+        async def _replay(self, session_id: str, until: Optional[int] = None) -> Optional[tuple[int, dict, dict]]:
+            """
+            从快照重放事件到第 until 个（默认到最后），返回 (最后事件序号, fields, lists)
+
+            until 早于快照（对应的事件已裁掉）或超出日志末尾时返回 None
+            """
+            fields, lists, start = {}, {}, 0
+            snapshot = await self.redis.hgetall(self._snapshot_key(session_id))
+            if snapshot:
+                data = self.codec.decode(snapshot[b"data"])
+                fields, lists = data["fields"], data["lists"]
+                start = int(snapshot[b"seq"]) + 1
+            if until is not None and until < start - 1:
+                return None
+            # 列表第 0 项为快照对应的事件，之后的事件从第 1 项开始
+            offset = 1 if snapshot else 0
+            raw_events = await self.redis.lrange(
+                self._events_key(session_id), offset, -1 if until is None else until - start + offset,
+            )
+            if start == 0 and not raw_events:
+                return None
+            last = start + len(raw_events) - 1
+            if until is not None and last != until:
+                return None
+            for raw in raw_events:
+                fields, lists = apply_event(fields, lists, self.codec.decode(raw))
+            return last, fields, lists
+
+        async def get(self, session_id: str) -> Optional[GameState]:
+            replayed = await self._replay(session_id)
+            if replayed is None:
+                return await super().get(session_id)
+            seq, fields, lists = replayed
+            state = load_stored_state(join_game_data(fields, lists))
+            # 以重新导出的取值作为比较基准（存储中的取值可能与模型共享对象，或时间为字符串）
+            self._remember_event(session_id, _EventFingerprint(seq, *split_game_data(state.model_dump())))
+            return state
+
+        async def set(self, session_id: str, state: GameState) -> None:
+            fields, lists = split_game_data(state.model_dump())
+            events_key = self._events_key(session_id)
+
+            async with self.redis.pipeline(transaction=True) as pipe:
+                try:
+                    await pipe.watch(events_key)
+                    base = await self._base_seq(pipe, session_id)
+                    seq = base + await pipe.llen(events_key)
+                    previous = self._event_fingerprints.get(session_id)
+                    if previous is None or previous.seq != seq - 1:
+                        previous = None
+                    event = build_event(seq, state, previous, fields, lists)
+                    if event is None:
+                        await pipe.unwatch()
+                        state.clear_journal()
+                        return
+                    pipe.multi()
+                    self._write_event(pipe, session_id, state, event, base, fields, lists)
+                    await pipe.execute()
+                except WatchError:
+                    # 其他进程同时写入，追加完整状态事件（与旧版一样后写者生效）
+                    pipe.reset()
+                    base = await self._base_seq(self.redis, session_id)
+                    seq = base + await self.redis.llen(events_key)
+                    event = build_event(seq, state, None, fields, lists)
+                    pipe.multi()
+                    self._write_event(pipe, session_id, state, event, base, fields, lists)
+                    await pipe.execute()
+
+            state.clear_archive_pending()
+            state.clear_journal()
+            self._remember_event(session_id, _EventFingerprint(event["seq"], fields, lists))
+
+        def _write_event(
+            self, pipe, session_id: str, state: GameState, event: dict, base: int, fields: dict, lists: dict,
+        ) -> None:
+            seq = event["seq"]
+            events_key = self._events_key(session_id)
+            snapshot_key = self._snapshot_key(session_id)
+
+            self._write_archive(pipe, session_id, state)
+            if seq == 0:
+                # 从分字段布局或旧版整块 JSON 迁移
+                pipe.delete(*self._all_keys(session_id))
+            pipe.rpush(events_key, self.codec.encode(event))
+            if seq and seq % self.snapshot_interval == 0:
+                pipe.hset(snapshot_key, mapping={
+                    "seq": seq,
+                    "data": self.codec.encode({"fields": fields, "lists": lists}),
+                })
+                # 快照之前的事件不再用于重放，裁掉（保留快照对应的事件本身）
+                pipe.ltrim(events_key, seq - base, -1)
+            pipe.expire(events_key, self.ttl)
+            pipe.expire(snapshot_key, self.ttl)
+
+        async def delete(self, session_id: str) -> None:
+            self._event_fingerprints.pop(session_id, None)
+            await self.redis.delete(self._events_key(session_id), self._snapshot_key(session_id))
+            await super().delete(session_id)
+
+        async def exists(self, session_id: str) -> bool:
+            if await self.redis.exists(self._events_key(session_id)):
+                return True
+            return await super().exists(session_id)
+
+        async def get_event_log(self, session_id: str) -> Optional[list[dict]]:
+            raw_events = await self.redis.lrange(self._events_key(session_id), 0, -1)
+            return [event_summary(self.codec.decode(raw)) for raw in raw_events]
+
+        async def rebuild_state(self, session_id: str, seq: int) -> Optional[GameState]:
+            replayed = await self._replay(session_id, until=seq)
+            if replayed is None:
+                return None
+            _, fields, lists = replayed
+            return load_stored_state(join_game_data(fields, lists))
+
+        def stats(self) -> dict:
+            return {
+                **super().stats(),
+                "event_log": True,
+                "snapshot_interval": self.snapshot_interval,
+                "event_fingerprints": len(self._event_fingerprints),
+            }
+
+else:
+    RedisEventSessionStore = None
@@ -0,0 +1,166 @@
+"""
+LLM 响应缓存
+缓存可复用的 LLM 分析结果（如决策分析），相同关卡下近似相同的输入直接命中，不再调用 LLM
+"""
+import copy
+import hashlib
+import json
+import re
+import time
+import unicodedata
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional
+
+from config import settings
+
+
+# 输入末尾可忽略的标点（NFKC 归一化后全角标点已转为半角）
+_TRAILING_PUNCTUATION = "。.!！?？~～…,，;；"
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_player_input(text: str) -> str:
+    """
+    归一化玩家输入
+
+    - NFKC 归一化（全角/半角统一）
+    - 去除多余空白、忽略大小写
+    - 去除末尾标点
+    """
+    normalized = unicodedata.normalize("NFKC", text or "")
+    normalized = _WHITESPACE_RE.sub(" ", normalized).strip().lower()
+    return normalized.rstrip(_TRAILING_PUNCTUATION + " ")
+
+
+def make_cache_key(*parts: str) -> str:
+    """由若干字段生成缓存键"""
+    raw = "\x1f".join(str(p) for p in parts)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache(ABC):
+    """响应缓存抽象基类"""
+
+    backend = "abstract"
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[dict]:
+        """获取缓存，未命中返回 None"""
+        pass
+
+    @abstractmethod
+    async def set(self, key: str, value: dict) -> None:
+        """写入缓存"""
+        pass
+
+    def _record(self, value: Optional[dict]) -> Optional[dict]:
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def stats(self) -> dict:
+        """命中统计"""
+        total = self.hits + self.misses
+        return {
+            "backend": self.backend,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class InMemoryResponseCache(ResponseCache):
+    """内存响应缓存（LRU + TTL）"""
+
+    backend = "memory"
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600.0):
+        super().__init__()
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+
+    async def get(self, key: str) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return self._record(None)
+
+        expires_at, value = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            return self._record(None)
+
+        self._entries.move_to_end(key)
+        # 返回副本，调用方修改结果不会污染缓存
+        return self._record(copy.deepcopy(value))
+
+    async def set(self, key: str, value: dict) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, copy.deepcopy(value))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {**super().stats(), "entries": len(self._entries), "max_entries": self.max_entries}
+
+
+# 尝试导入 Redis 缓存
+try:
+    import redis.asyncio as redis
+
+    class RedisResponseCache(ResponseCache):
+        """Redis 响应缓存（多副本共享命中）"""
+
+        backend = "redis"
+
+        def __init__(self, redis_url: str, ttl: float = 3600.0, prefix: str = "prince_game:llm_cache:"):
+            super().__init__()
+            self.redis = redis.from_url(redis_url)
+            self.prefix = prefix
+            self.ttl = int(ttl)
+
+        async def get(self, key: str) -> Optional[dict]:
+            try:
+                data = await self.redis.get(f"{self.prefix}{key}")
+            except Exception as e:
+                print(f"[ResponseCache] Redis 读取失败: {type(e).__name__}: {e}")
+                data = None
+            return self._record(json.loads(data) if data else None)
+
+        async def set(self, key: str, value: dict) -> None:
+            try:
+                await self.redis.setex(
+                    f"{self.prefix}{key}",
+                    self.ttl,
+                    json.dumps(value, ensure_ascii=False),
+                )
+            except Exception as e:
+                print(f"[ResponseCache] Redis 写入失败: {type(e).__name__}: {e}")
+
+except ImportError:
+    RedisResponseCache = None
+
+
+# 单例实例
+_analysis_cache: Optional[ResponseCache] = None
+
+
+def get_analysis_cache() -> ResponseCache:
+    """获取决策分析缓存单例"""
+    global _analysis_cache
+    if _analysis_cache is None:
+        if settings.analysis_cache_backend == "redis" and RedisResponseCache is not None:
+            _analysis_cache = RedisResponseCache(settings.redis_url, ttl=settings.analysis_cache_ttl)
+        else:
+            _analysis_cache = InMemoryResponseCache(
+                max_entries=settings.analysis_cache_max_entries,
+                ttl=settings.analysis_cache_ttl,
+            )
+    return _analysis_cache
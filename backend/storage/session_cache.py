@@ -0,0 +1,191 @@
+"""
+两级会话缓存
+在 Redis 会话存储前加一层进程内 LRU，缓存已反序列化的 GameState
+"""
+import asyncio
+import json
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+from models.game_state import DialogueEntry, GameState
+from .session_store import SessionStore
+
+
+class CachedSessionStore(SessionStore):
+    """
+    读穿透、写穿透的本地会话缓存
+
+    - get 命中本地缓存时直接返回对象，不访问 Redis；取出后条目从本地缓存移除（借出），
+      请求处理中途失败时不会留下未保存的修改，set 时再放回
+    - peek 供只读接口使用：命中时返回副本，条目留在本地缓存中
+    - set / delete 写穿透到下层存储，并在 Redis 频道上发布失效消息，其他进程收到后丢弃本地副本
+    - 失效订阅未运行时不使用本地缓存，避免读到其他进程已修改的旧状态
+    """
+
+    CHANNEL = "prince_game:session_invalidate"
+
+    def __init__(self, inner: SessionStore, redis_client, max_entries: int = 1000, ttl: float = 30.0):
+        self.inner = inner
+        self.redis = redis_client
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.worker_id = uuid.uuid4().hex
+        self._local: OrderedDict[str, tuple[float, GameState]] = OrderedDict()
+        self._listener: Optional[asyncio.Task] = None
+        self._listening = False
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    # ==================== 生命周期 ====================
+
+    async def start(self) -> None:
+        """启动失效消息订阅"""
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def close(self) -> None:
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        self._listening = False
+        self._local.clear()
+        await self.inner.close()
+
+    async def _listen(self) -> None:
+        """订阅失效频道；断线后清空本地缓存并重连"""
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(self.CHANNEL)
+                self._listening = True
+                print(f"[SessionCache] 已订阅失效频道: {self.CHANNEL}")
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    payload = json.loads(message["data"])
+                    if payload.get("origin") != self.worker_id:
+                        self._local.pop(payload.get("session_id"), None)
+                        self.invalidations += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[SessionCache] 失效订阅中断，暂停本地缓存: {type(e).__name__}: {e}")
+            finally:
+                self._listening = False
+                self._local.clear()
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+            await asyncio.sleep(1.0)
+
+    async def _publish(self, session_id: str) -> None:
+        try:
+            await self.redis.publish(
+                self.CHANNEL,
+                json.dumps({"session_id": session_id, "origin": self.worker_id}),
+            )
+        except Exception as e:
+            # 发布失败时其他进程可能持有旧副本，最多在 ttl 后过期
+            print(f"[SessionCache] 发布失效消息失败: {type(e).__name__}: {e}")
+
+    # ==================== 本地缓存 ====================
+
+    def _take(self, session_id: str) -> Optional[GameState]:
+        entry = self._local.pop(session_id, None)
+        if entry is None:
+            return None
+        expires_at, state = entry
+        if time.monotonic() >= expires_at:
+            return None
+        return state
+
+    def _peek(self, session_id: str) -> Optional[GameState]:
+        entry = self._local.get(session_id)
+        if entry is None:
+            return None
+        expires_at, state = entry
+        if time.monotonic() >= expires_at:
+            del self._local[session_id]
+            return None
+        return state
+
+    def _put(self, session_id: str, state: GameState) -> None:
+        if not self._listening:
+            return
+        self._local[session_id] = (time.monotonic() + self.ttl, state)
+        self._local.move_to_end(session_id)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+
+    # ==================== SessionStore 接口 ====================
+
+    async def get(self, session_id: str) -> Optional[GameState]:
+        if self._listening:
+            state = self._take(session_id)
+            if state is not None:
+                self.hits += 1
+                return state
+        self.misses += 1
+        return await self.inner.get(session_id)
+
+    async def peek(self, session_id: str) -> Optional[GameState]:
+        if self._listening:
+            state = self._peek(session_id)
+            if state is not None:
+                self.hits += 1
+                # 返回副本：本地条目仍可能被之后的 get 借出修改
+                return state.model_copy(deep=True)
+        self.misses += 1
+        return await self.inner.get(session_id)
+
+    async def set(self, session_id: str, state: GameState) -> None:
+        await self.inner.set(session_id, state)
+        self._put(session_id, state)
+        await self._publish(session_id)
+
+    async def delete(self, session_id: str) -> None:
+        self._local.pop(session_id, None)
+        await self.inner.delete(session_id)
+        await self._publish(session_id)
+
+    async def exists(self, session_id: str) -> bool:
+        if self._listening and session_id in self._local:
+            return True
+        return await self.inner.exists(session_id)
+
+    async def get_judgment_state(self, session_id: str) -> Optional[dict]:
+        return await self.inner.get_judgment_state(session_id)
+
+    async def set_judgment_state(self, session_id: str, state: dict) -> None:
+        await self.inner.set_judgment_state(session_id, state)
+
+    async def get_history_archive(self, session_id: str, start: int, end: int) -> list[DialogueEntry]:
+        return await self.inner.get_history_archive(session_id, start, end)
+
+    async def get_event_log(self, session_id: str) -> Optional[list[dict]]:
+        return await self.inner.get_event_log(session_id)
+
+    async def rebuild_state(self, session_id: str, seq: int) -> Optional[GameState]:
+        return await self.inner.rebuild_state(session_id, seq)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            **self.inner.stats(),
+            "local_cache": {
+                "listening": self._listening,
+                "entries": len(self._local),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "invalidations": self.invalidations,
+            },
+        }
@@ -2,9 +2,18 @@
 会话存储
 管理游戏会话状态
 """
+import hashlib
+import json
+import time
+import uuid
 from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
 from typing import Optional
-from models.game_state import GameState
+from config import settings
+from models.game_state import DialogueEntry, GameState
+from .codec import StateCodec, get_codec
+from .trusted_loader import trusted_load, trusted_load_json
 
 
 class SessionStore(ABC):
@@ -15,6 +24,10 @@ class SessionStore(ABC):
         """获取会话"""
         pass
 
+    async def peek(self, session_id: str) -> Optional[GameState]:
+        """只读获取会话（调用方不修改、不保存返回的状态）；默认等同于 get"""
+        return await self.get(session_id)
+
     @abstractmethod
     async def set(self, session_id: str, state: GameState) -> None:
         """保存会话"""
@@ -30,26 +43,96 @@ class SessionStore(ABC):
         """检查会话是否存在"""
         pass
 
+    @abstractmethod
+    async def get_judgment_state(self, session_id: str) -> Optional[dict]:
+        """获取会话的裁决引擎状态"""
+        pass
+
+    @abstractmethod
+    async def set_judgment_state(self, session_id: str, state: dict) -> None:
+        """保存会话的裁决引擎状态"""
+        pass
+
+    @abstractmethod
+    async def get_history_archive(self, session_id: str, start: int, end: int) -> list[DialogueEntry]:
+        """读取已归档的对话条目（全局序号 [start, end)）"""
+        pass
+
+    async def get_event_log(self, session_id: str) -> Optional[list[dict]]:
+        """会话事件日志摘要；存储不记录事件日志时返回 None"""
+        return None
+
+    async def rebuild_state(self, session_id: str, seq: int) -> Optional[GameState]:
+        """重放事件日志，重建第 seq 个事件之后的状态；存储不记录事件日志或 seq 不在保留的日志范围内时返回 None"""
+        return None
+
+    async def start(self) -> None:
+        """启动后台任务（应用启动时调用）"""
+        pass
+
+    async def close(self) -> None:
+        """释放连接等资源（应用退出时调用）"""
+        pass
+
+    def stats(self) -> dict:
+        """存储统计"""
+        return {"backend": type(self).__name__}
+
 
 class InMemorySessionStore(SessionStore):
     """内存会话存储（开发用）"""
 
-    def __init__(self):
+    def __init__(self, max_judgment_states: int = 10000, judgment_ttl: float = 3600 * 24):
         self._sessions: dict[str, GameState] = {}
+        # 裁决引擎状态：LRU + TTL 有界，内存占用不随历史会话数增长
+        self._judgment_states: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self.max_judgment_states = max_judgment_states
+        self.judgment_ttl = judgment_ttl
+        self._archives: dict[str, list[DialogueEntry]] = {}
 
     async def get(self, session_id: str) -> Optional[GameState]:
         return self._sessions.get(session_id)
 
     async def set(self, session_id: str, state: GameState) -> None:
+        pending = state.archive_pending
+        if pending:
+            archive = self._archives.setdefault(session_id, [])
+            # 按全局序号对齐，重复保存同一批条目时不会重复追加
+            del archive[state.history_archived - len(pending):]
+            archive.extend(pending)
+            state.clear_archive_pending()
+        state.clear_journal()
         self._sessions[session_id] = state
 
     async def delete(self, session_id: str) -> None:
         if session_id in self._sessions:
             del self._sessions[session_id]
+        self._judgment_states.pop(session_id, None)
+        self._archives.pop(session_id, None)
 
     async def exists(self, session_id: str) -> bool:
         return session_id in self._sessions
 
+    async def get_judgment_state(self, session_id: str) -> Optional[dict]:
+        entry = self._judgment_states.get(session_id)
+        if entry is None:
+            return None
+        expires_at, state = entry
+        if time.monotonic() >= expires_at:
+            del self._judgment_states[session_id]
+            return None
+        self._judgment_states.move_to_end(session_id)
+        return state
+
+    async def set_judgment_state(self, session_id: str, state: dict) -> None:
+        self._judgment_states[session_id] = (time.monotonic() + self.judgment_ttl, state)
+        self._judgment_states.move_to_end(session_id)
+        while len(self._judgment_states) > self.max_judgment_states:
+            self._judgment_states.popitem(last=False)
+
+    async def get_history_archive(self, session_id: str, start: int, end: int) -> list[DialogueEntry]:
+        return self._archives.get(session_id, [])[start:end]
+
     async def list_sessions(self) -> list[str]:
         """列出所有会话ID"""
         return list(self._sessions.keys())
@@ -57,39 +140,368 @@ class InMemorySessionStore(SessionStore):
     async def clear_all(self) -> None:
         """清除所有会话"""
         self._sessions.clear()
+        self._judgment_states.clear()
+        self._archives.clear()
+
+
+# ==================== Redis 分字段布局 ====================
+# 只追加或局部修改的集合存为 Redis 列表（每个元素一项），其余字段各占哈希的一个字段，
+# 保存时只写入发生变化的字段与列表元素。各值由 StateCodec 编码。
+LIST_FIELDS = (
+    "history",
+    "promises",
+    "leverages",
+    "secrets",
+    "all_decisions",
+    "pending_crises",
+    "causal_state.shadow_seeds",
+    "causal_state.immediate_flags",
+    "causal_state.triggered_echoes",
+)
+VERSION_FIELD = "__version__"
+
+
+def _digest(value: bytes) -> bytes:
+    return hashlib.blake2b(value, digest_size=8).digest()
+
+
+def split_game_data(data: dict) -> tuple[dict, dict[str, list]]:
+    """把 model_dump() 的结果拆成 (标量字段, 列表字段)；会修改传入的字典"""
+    lists = {}
+    for path in LIST_FIELDS:
+        *parents, name = path.split(".")
+        container = data
+        for parent in parents:
+            container = container[parent]
+        lists[path] = container.pop(name)
+    return data, lists
+
+
+def join_game_data(fields: dict, lists: dict[str, list]) -> dict:
+    """split_game_data 的逆操作；会修改传入的字典"""
+    for path, items in lists.items():
+        *parents, name = path.split(".")
+        container = fields
+        for parent in parents:
+            container = container.setdefault(parent, {})
+        container[name] = items
+    return fields
+
+
+def split_game_state(
+    state: GameState,
+    codec: StateCodec,
+) -> tuple[dict[str, bytes], dict[str, list[bytes]]]:
+    """把 GameState 拆成 (哈希字段, 列表字段)，值均已编码"""
+    data, lists = split_game_data(state.model_dump())
+    fields = {name: codec.encode(value) for name, value in data.items()}
+    return fields, {path: [codec.encode(item) for item in items] for path, items in lists.items()}
+
+
+def join_game_state(
+    fields: dict[str, bytes],
+    lists: dict[str, list[bytes]],
+    codec: StateCodec,
+) -> GameState:
+    """由 split_game_state 的结果重建 GameState"""
+    return load_stored_state(join_game_data(
+        {name: codec.decode(value) for name, value in fields.items()},
+        {path: [codec.decode(item) for item in items] for path, items in lists.items()},
+    ))
+
+
+def load_stored_state(data: dict) -> GameState:
+    """由存储中读出的数据构建 GameState（session_trusted_load 开启时跳过校验）"""
+    if settings.session_trusted_load:
+        return trusted_load(GameState, data)
+    return GameState.model_validate(data)
+
+
+@dataclass
+class _StateFingerprint:
+    """本进程最后一次读写某会话时的各字段摘要，用于计算增量"""
+    version: str
+    fields: dict[str, bytes]
+    lists: dict[str, list[bytes]]
+
+    @classmethod
+    def of(cls, version: str, fields: dict[str, bytes], lists: dict[str, list[bytes]]) -> "_StateFingerprint":
+        return cls(
+            version=version,
+            fields={name: _digest(value) for name, value in fields.items()},
+            lists={name: [_digest(item) for item in items] for name, items in lists.items()},
+        )
 
 
 # 尝试导入 Redis 存储
 try:
     import redis.asyncio as redis
-    import json
+    from redis.exceptions import WatchError
 
     class RedisSessionStore(SessionStore):
-        """Redis 会话存储（生产用）"""
+        """
+        Redis 会话存储（生产用）
 
-        def __init__(self, redis_url: str):
+        布局：
+        - {prefix}{session_id}:state          哈希，标量字段 + 写入版本标识
+        - {prefix}{session_id}:list:{字段}     列表，history / all_decisions 等集合
+        - {prefix}{session_id}:judgment       裁决引擎状态
+        - {prefix}{session_id}:archive        列表，移出 history 环形窗口的旧对话（只追加）
+
+        保存时与本进程记录的摘要比较，只写变化的哈希字段；列表只 RPUSH 新元素、
+        LSET 被修改的元素或 LTRIM 截断。每次写入生成新的版本标识，与本进程记录的不一致
+        （其他进程写过）时整体重写。
+        """
+
+        def __init__(
+            self,
+            redis_url: str,
+            codec: Optional[StateCodec] = None,
+            fingerprint_cache_size: int = 10000,
+        ):
             self.redis = redis.from_url(redis_url)
+            self.codec = codec or get_codec(settings.session_codec)
             self.prefix = "prince_game:"
-            self.ttl = 3600 * 24  # 24小时过期
+            self.ttl = int(settings.session_ttl)  # 默认24小时过期
+            self.fingerprint_cache_size = fingerprint_cache_size
+            self._fingerprints: OrderedDict[str, _StateFingerprint] = OrderedDict()
+
+        def _state_key(self, session_id: str) -> str:
+            return f"{self.prefix}{session_id}:state"
+
+        def _list_key(self, session_id: str, name: str) -> str:
+            return f"{self.prefix}{session_id}:list:{name}"
+
+        def _archive_key(self, session_id: str) -> str:
+            return f"{self.prefix}{session_id}:archive"
+
+        def _legacy_key(self, session_id: str) -> str:
+            """旧版整块 JSON 布局的键"""
+            return f"{self.prefix}{session_id}"
+
+        def _all_keys(self, session_id: str) -> list[str]:
+            return [
+                self._state_key(session_id),
+                *(self._list_key(session_id, name) for name in LIST_FIELDS),
+                self._legacy_key(session_id),
+            ]
+
+        def _remember(self, session_id: str, fingerprint: _StateFingerprint) -> None:
+            self._fingerprints[session_id] = fingerprint
+            self._fingerprints.move_to_end(session_id)
+            while len(self._fingerprints) > self.fingerprint_cache_size:
+                self._fingerprints.popitem(last=False)
 
         async def get(self, session_id: str) -> Optional[GameState]:
-            data = await self.redis.get(f"{self.prefix}{session_id}")
-            if data:
-                return GameState.model_validate_json(data)
-            return None
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.hgetall(self._state_key(session_id))
+                for name in LIST_FIELDS:
+                    pipe.lrange(self._list_key(session_id, name), 0, -1)
+                raw_fields, *raw_lists = await pipe.execute()
+
+            if not raw_fields:
+                # 兼容旧版整块 JSON，下次保存时迁移为分字段布局
+                data = await self.redis.get(self._legacy_key(session_id))
+                if data:
+                    if settings.session_trusted_load:
+                        return trusted_load_json(GameState, data)
+                    return GameState.model_validate_json(data)
+                return None
+
+            fields = {k.decode(): v for k, v in raw_fields.items()}
+            version = fields.pop(VERSION_FIELD, b"").decode()
+            lists = dict(zip(LIST_FIELDS, raw_lists))
+            self._remember(session_id, _StateFingerprint.of(version, fields, lists))
+            return join_game_state(fields, lists, self.codec)
 
         async def set(self, session_id: str, state: GameState) -> None:
-            await self.redis.setex(
-                f"{self.prefix}{session_id}",
-                self.ttl,
-                state.model_dump_json(),
+            fields, lists = split_game_state(state, self.codec)
+            state_key = self._state_key(session_id)
+            version = uuid.uuid4().hex
+
+            async with self.redis.pipeline(transaction=True) as pipe:
+                try:
+                    await pipe.watch(state_key)
+                    stored = await pipe.hget(state_key, VERSION_FIELD)
+                    previous = self._fingerprints.get(session_id)
+                    if previous is None or stored is None or previous.version != stored.decode():
+                        previous = None
+                    pipe.multi()
+                    self._write_archive(pipe, session_id, state)
+                    self._write_state(pipe, session_id, previous, fields, lists, version)
+                    await pipe.execute()
+                except WatchError:
+                    # 其他进程同时写入，退回整体重写（与旧版一样后写者生效）
+                    pipe.reset()
+                    pipe.multi()
+                    self._write_archive(pipe, session_id, state)
+                    self._write_state(pipe, session_id, None, fields, lists, version)
+                    await pipe.execute()
+
+            state.clear_archive_pending()
+            state.clear_journal()
+            self._remember(session_id, _StateFingerprint.of(version, fields, lists))
+
+        def _write_archive(self, pipe, session_id: str, state: GameState) -> None:
+            """在同一事务中追加归档条目；先截断到这批条目的起始序号，保证与 history_archived 对齐"""
+            archive_key = self._archive_key(session_id)
+            pending = state.archive_pending
+            if pending:
+                start = state.history_archived - len(pending)
+                if start == 0:
+                    pipe.delete(archive_key)
+                else:
+                    pipe.ltrim(archive_key, 0, start - 1)
+                pipe.rpush(archive_key, *(self.codec.encode(entry.model_dump()) for entry in pending))
+            if state.history_archived:
+                pipe.expire(archive_key, self.ttl)
+
+        def _write_state(
+            self,
+            pipe,
+            session_id: str,
+            previous: Optional[_StateFingerprint],
+            fields: dict[str, bytes],
+            lists: dict[str, list[bytes]],
+            version: str,
+        ) -> None:
+            """向事务中写入状态；previous 为 None 时整体重写"""
+            state_key = self._state_key(session_id)
+
+            if previous is None:
+                pipe.delete(*self._all_keys(session_id))
+                pipe.hset(state_key, mapping=fields)
+                for name, items in lists.items():
+                    if items:
+                        pipe.rpush(self._list_key(session_id, name), *items)
+            else:
+                changed = {
+                    name: value for name, value in fields.items()
+                    if previous.fields.get(name) != _digest(value)
+                }
+                if changed:
+                    pipe.hset(state_key, mapping=changed)
+                removed = set(previous.fields) - set(fields)
+                if removed:
+                    pipe.hdel(state_key, *removed)
+                for name, items in lists.items():
+                    self._write_list(pipe, self._list_key(session_id, name), previous.lists.get(name, []), items)
+
+            pipe.hset(state_key, VERSION_FIELD, version)
+            for key in self._all_keys(session_id)[:-1]:
+                pipe.expire(key, self.ttl)
+
+        @staticmethod
+        def _write_list(pipe, key: str, old_digests: list[bytes], items: list[bytes]) -> None:
+            """列表增量写入：追加用 RPUSH，截断用 LTRIM，少量修改用 LSET，变化过大时重写"""
+            new_digests = [_digest(item) for item in items]
+            common = min(len(old_digests), len(new_digests))
+            changed = [i for i in range(common) if old_digests[i] != new_digests[i]]
+
+            if not items:
+                if old_digests:
+                    pipe.delete(key)
+                return
+
+            # 环形窗口滚动：旧列表去掉开头若干项后是新列表的前缀，用 LTRIM 丢弃开头再 RPUSH
+            if changed:
+                try:
+                    shift = old_digests.index(new_digests[0])
+                except ValueError:
+                    shift = 0
+                kept = len(old_digests) - shift
+                if shift and kept <= len(new_digests) and old_digests[shift:] == new_digests[:kept]:
+                    pipe.ltrim(key, shift, -1)
+                    if len(items) > kept:
+                        pipe.rpush(key, *items[kept:])
+                    return
+
+            rewrite = (
+                (len(items) < len(old_digests) and changed)
+                or len(changed) > len(items) // 2
             )
+            if rewrite:
+                pipe.delete(key)
+                pipe.rpush(key, *items)
+                return
+
+            if len(items) < len(old_digests):
+                pipe.ltrim(key, 0, len(items) - 1)
+            for i in changed:
+                pipe.lset(key, i, items[i])
+            if len(items) > len(old_digests):
+                pipe.rpush(key, *items[len(old_digests):])
 
         async def delete(self, session_id: str) -> None:
-            await self.redis.delete(f"{self.prefix}{session_id}")
+            self._fingerprints.pop(session_id, None)
+            await self.redis.delete(
+                *self._all_keys(session_id),
+                self._archive_key(session_id),
+                f"{self.prefix}{session_id}:judgment",
+            )
 
         async def exists(self, session_id: str) -> bool:
-            return await self.redis.exists(f"{self.prefix}{session_id}") > 0
+            return await self.redis.exists(self._state_key(session_id), self._legacy_key(session_id)) > 0
+
+        async def close(self) -> None:
+            await self.redis.aclose()
+
+        def stats(self) -> dict:
+            return {
+                **super().stats(),
+                "codec": self.codec.name,
+                "fingerprints": len(self._fingerprints),
+            }
+
+        async def get_history_archive(self, session_id: str, start: int, end: int) -> list[DialogueEntry]:
+            if end <= start:
+                return []
+            items = await self.redis.lrange(self._archive_key(session_id), start, end - 1)
+            return [DialogueEntry.model_validate(self.codec.decode(item)) for item in items]
+
+        async def get_judgment_state(self, session_id: str) -> Optional[dict]:
+            data = await self.redis.get(f"{self.prefix}{session_id}:judgment")
+            if data:
+                return json.loads(data)
+            return None
+
+        async def set_judgment_state(self, session_id: str, state: dict) -> None:
+            await self.redis.setex(
+                f"{self.prefix}{session_id}:judgment",
+                self.ttl,
+                json.dumps(state, ensure_ascii=False),
+            )
 
 except ImportError:
     RedisSessionStore = None
+
+
+def create_session_store() -> SessionStore:
+    """按配置创建会话存储（redis 不可用时退回内存存储）"""
+    if settings.session_backend == "redis":
+        if RedisSessionStore is not None:
+            if settings.session_event_log:
+                from .event_log import RedisEventSessionStore
+                store = RedisEventSessionStore(settings.redis_url)
+            else:
+                store = RedisSessionStore(settings.redis_url)
+            if settings.session_local_cache:
+                from .session_cache import CachedSessionStore
+                return CachedSessionStore(
+                    store,
+                    store.redis,
+                    max_entries=settings.session_local_cache_size,
+                    ttl=settings.session_local_cache_ttl,
+                )
+            return store
+        print("[SessionStore] 未安装 redis，使用内存会话存储")
+    elif settings.session_backend == "sqlite":
+        from .sqlite_store import SqliteSessionStore
+        return SqliteSessionStore(
+            settings.session_sqlite_path,
+            batch_size=settings.session_sqlite_batch_size,
+        )
+    return InMemorySessionStore(
+        max_judgment_states=settings.session_judgment_max_entries,
+        judgment_ttl=settings.session_ttl,
+    )
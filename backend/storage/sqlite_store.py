@@ -0,0 +1,293 @@
+"""
+SQLite 会话存储
+单机部署使用：标准库 sqlite3 + WAL，重启不丢会话，无需部署 Redis
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from config import settings
+from models.game_state import DialogueEntry, GameState
+from .codec import StateCodec, get_codec
+from .session_store import SessionStore, load_stored_state
+
+
+_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS sessions (
+        session_id TEXT PRIMARY KEY,
+        data BLOB NOT NULL,
+        expires_at REAL NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires_at)",
+    """CREATE TABLE IF NOT EXISTS judgment_states (
+        session_id TEXT PRIMARY KEY,
+        data TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS history_archive (
+        session_id TEXT NOT NULL,
+        idx INTEGER NOT NULL,
+        data BLOB NOT NULL,
+        PRIMARY KEY (session_id, idx)
+    ) WITHOUT ROWID""",
+)
+
+# 固定的 SQL 文本，由连接的语句缓存复用已编译的语句
+_UPSERT_SESSION = (
+    "INSERT INTO sessions (session_id, data, expires_at) VALUES (?, ?, ?) "
+    "ON CONFLICT (session_id) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at"
+)
+_SELECT_SESSION = "SELECT data FROM sessions WHERE session_id = ? AND expires_at > ?"
+_EXISTS_SESSION = "SELECT 1 FROM sessions WHERE session_id = ? AND expires_at > ?"
+_LIST_SESSIONS = "SELECT session_id FROM sessions WHERE expires_at > ?"
+_DELETE_SESSION = "DELETE FROM sessions WHERE session_id = ?"
+_UPSERT_JUDGMENT = (
+    "INSERT INTO judgment_states (session_id, data, expires_at) VALUES (?, ?, ?) "
+    "ON CONFLICT (session_id) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at"
+)
+_SELECT_JUDGMENT = "SELECT data FROM judgment_states WHERE session_id = ? AND expires_at > ?"
+_DELETE_JUDGMENT = "DELETE FROM judgment_states WHERE session_id = ?"
+_TRIM_ARCHIVE = "DELETE FROM history_archive WHERE session_id = ? AND idx >= ?"
+_INSERT_ARCHIVE = "INSERT INTO history_archive (session_id, idx, data) VALUES (?, ?, ?)"
+_SELECT_ARCHIVE = "SELECT data FROM history_archive WHERE session_id = ? AND idx >= ? AND idx < ? ORDER BY idx"
+_DELETE_ARCHIVE = "DELETE FROM history_archive WHERE session_id = ?"
+_PURGE = (
+    "DELETE FROM history_archive WHERE session_id IN (SELECT session_id FROM sessions WHERE expires_at <= ?)",
+    "DELETE FROM sessions WHERE expires_at <= ?",
+    "DELETE FROM judgment_states WHERE expires_at <= ?",
+)
+
+
+class SqliteSessionStore(SessionStore):
+    """
+    SQLite 会话存储（单机生产用）
+
+    - WAL 模式：读不阻塞写，读连接与写连接分开
+    - 所有查询在线程池中执行，不阻塞事件循环；读线程各用一个连接，写操作只在一个写线程中执行
+    - 成组提交：写操作进入队列，由写任务把已排队的写操作合并为一个事务提交，
+      set() 在所在事务提交后才返回
+    - 过期：每行带 expires_at，读取时过滤，写任务定期删除过期行
+    """
+
+    PURGE_INTERVAL = 60.0  # 过期行清理间隔（秒）
+
+    def __init__(
+        self,
+        path: str,
+        codec: Optional[StateCodec] = None,
+        ttl: Optional[float] = None,
+        batch_size: int = 64,
+        read_threads: int = 4,
+    ):
+        self.path = path
+        self.codec = codec or get_codec(settings.session_codec)
+        self.ttl = ttl if ttl is not None else settings.session_ttl
+        self.batch_size = batch_size
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._local = threading.local()
+        self._read_conns: list[sqlite3.Connection] = []
+        self._read_executor = ThreadPoolExecutor(max_workers=read_threads, thread_name_prefix="sqlite-read")
+        self._write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-write")
+        self._write_conn = self._connect()
+        self._write_conn.execute("PRAGMA journal_mode=WAL")
+        self._write_conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            self._write_conn.execute(statement)
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._last_purge = time.time()
+        self.commits = 0
+        self.writes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path,
+            isolation_level=None,  # 事务由写线程显式控制
+            check_same_thread=False,
+            cached_statements=256,
+        )
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        """当前读线程的连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            self._read_conns.append(conn)
+        return conn
+
+    # ==================== 执行 ====================
+
+    async def _read(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._read_executor, fn, *args)
+
+    async def _write(self, statements: list[tuple[str, tuple]]) -> None:
+        """排队写入，等待所在事务提交"""
+        if self._writer is None:
+            await self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((statements, future))
+        await future
+
+    async def _write_loop(self) -> None:
+        """成组提交：取出当前已排队的写操作（至多 batch_size 个）合并为一个事务"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            stopping = None in batch  # close() 放入的结束标记
+            batch = [item for item in batch if item is not None]
+
+            purge = time.time() - self._last_purge >= self.PURGE_INTERVAL
+            if purge:
+                self._last_purge = time.time()
+            try:
+                await loop.run_in_executor(self._write_executor, self._commit, [s for s, _ in batch], purge)
+            except Exception as e:
+                print(f"[SqliteSessionStore] 批量提交失败，逐个重试: {type(e).__name__}: {e}")
+                for statements, future in batch:
+                    try:
+                        await loop.run_in_executor(self._write_executor, self._commit, [statements], False)
+                        if not future.done():
+                            future.set_result(None)
+                    except Exception as single_error:
+                        if not future.done():
+                            future.set_exception(single_error)
+            else:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_result(None)
+            if stopping:
+                return
+
+    def _commit(self, jobs: list[list[tuple[str, tuple]]], purge: bool) -> None:
+        """在写线程中执行一个事务"""
+        conn = self._write_conn
+        conn.execute("BEGIN")
+        try:
+            for statements in jobs:
+                for sql, params in statements:
+                    if isinstance(params, list):
+                        conn.executemany(sql, params)
+                    else:
+                        conn.execute(sql, params)
+            if purge:
+                now = time.time()
+                for sql in _PURGE:
+                    conn.execute(sql, (now,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self.commits += 1
+        self.writes += len(jobs)
+
+    # ==================== 生命周期 ====================
+
+    async def start(self) -> None:
+        if self._writer is None:
+            self._queue = asyncio.Queue()
+            self._writer = asyncio.create_task(self._write_loop())
+            print(f"[SqliteSessionStore] 使用数据库: {self.path}")
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            await self._queue.put(None)
+            await self._writer
+            self._writer = None
+        self._read_executor.shutdown(wait=True)
+        self._write_executor.shutdown(wait=True)
+        for conn in self._read_conns:
+            conn.close()
+        self._write_conn.close()
+
+    def stats(self) -> dict:
+        return {
+            **super().stats(),
+            "path": self.path,
+            "codec": self.codec.name,
+            "commits": self.commits,
+            "writes": self.writes,
+            "writes_per_commit": round(self.writes / self.commits, 2) if self.commits else 0.0,
+        }
+
+    # ==================== SessionStore 接口 ====================
+
+    def _load(self, session_id: str) -> Optional[GameState]:
+        row = self._reader().execute(_SELECT_SESSION, (session_id, time.time())).fetchone()
+        if row is None:
+            return None
+        return load_stored_state(self.codec.decode(row[0]))
+
+    async def get(self, session_id: str) -> Optional[GameState]:
+        return await self._read(self._load, session_id)
+
+    async def set(self, session_id: str, state: GameState) -> None:
+        expires_at = time.time() + self.ttl
+        statements = [(_UPSERT_SESSION, (session_id, self.codec.encode(state.model_dump()), expires_at))]
+        pending = state.archive_pending
+        if pending:
+            start = state.history_archived - len(pending)
+            # 按全局序号对齐，重复保存同一批条目时不会重复追加
+            statements.append((_TRIM_ARCHIVE, (session_id, start)))
+            statements.append((_INSERT_ARCHIVE, [
+                (session_id, start + i, self.codec.encode(entry.model_dump()))
+                for i, entry in enumerate(pending)
+            ]))
+        await self._write(statements)
+        state.clear_archive_pending()
+        state.clear_journal()
+
+    async def delete(self, session_id: str) -> None:
+        await self._write([
+            (_DELETE_SESSION, (session_id,)),
+            (_DELETE_JUDGMENT, (session_id,)),
+            (_DELETE_ARCHIVE, (session_id,)),
+        ])
+
+    async def exists(self, session_id: str) -> bool:
+        def query():
+            return self._reader().execute(_EXISTS_SESSION, (session_id, time.time())).fetchone() is not None
+        return await self._read(query)
+
+    async def get_judgment_state(self, session_id: str) -> Optional[dict]:
+        def query():
+            row = self._reader().execute(_SELECT_JUDGMENT, (session_id, time.time())).fetchone()
+            return json.loads(row[0]) if row else None
+        return await self._read(query)
+
+    async def set_judgment_state(self, session_id: str, state: dict) -> None:
+        await self._write([
+            (_UPSERT_JUDGMENT, (session_id, json.dumps(state, ensure_ascii=False), time.time() + self.ttl)),
+        ])
+
+    async def get_history_archive(self, session_id: str, start: int, end: int) -> list[DialogueEntry]:
+        def query():
+            rows = self._reader().execute(_SELECT_ARCHIVE, (session_id, start, end)).fetchall()
+            return [DialogueEntry.model_validate(self.codec.decode(row[0])) for row in rows]
+        return await self._read(query)
+
+    async def list_sessions(self) -> list[str]:
+        """列出所有未过期的会话ID"""
+        def query():
+            return [row[0] for row in self._reader().execute(_LIST_SESSIONS, (time.time(),))]
+        return await self._read(query)
+
+    async def clear_all(self) -> None:
+        """清除所有会话"""
+        await self._write([
+            ("DELETE FROM sessions", ()),
+            ("DELETE FROM judgment_states", ()),
+            ("DELETE FROM history_archive", ()),
+        ])
@@ -0,0 +1,124 @@
+"""
+可信数据加载
+从自己的会话存储读出的数据在写入时已经通过校验，读取时不必再逐层校验。
+按模型字段注解预先生成转换器，以 model_construct 的方式逐层构建模型；
+只做 JSON 无法表达的类型还原（嵌套模型、时间、枚举），不检查取值范围。
+
+客户端提交的数据仍然必须走 model_validate 完整校验。
+"""
+import json
+import types
+import typing
+from datetime import datetime
+from enum import Enum
+from typing import Any, Callable, TypeVar, Union
+
+from pydantic import BaseModel
+
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+Converter = Callable[[Any], Any]
+
+_converters: dict[type, Converter] = {}
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+def _datetime(value: Any) -> Any:
+    if type(value) is str:
+        return datetime.fromisoformat(value)
+    return value
+
+
+def _build_converter(annotation: Any) -> Converter:
+    """根据字段注解生成转换函数；不需要转换的类型返回 _identity"""
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+
+    if origin is Union or origin is types.UnionType:
+        inner = [a for a in args if a is not type(None)]
+        if len(inner) == 1:
+            convert = _build_converter(inner[0])
+            if convert is _identity:
+                return _identity
+            return lambda v: None if v is None else convert(v)
+        return _identity
+
+    if origin is list:
+        convert = _build_converter(args[0]) if args else _identity
+        if convert is _identity:
+            return _identity
+        return lambda v: [convert(item) for item in v]
+
+    if origin is dict:
+        convert = _build_converter(args[1]) if len(args) == 2 else _identity
+        if convert is _identity:
+            return _identity
+        return lambda v: {k: convert(item) for k, item in v.items()}
+
+    if isinstance(annotation, type):
+        if issubclass(annotation, BaseModel):
+            return _model_converter(annotation)
+        if issubclass(annotation, Enum):
+            return lambda v: v if isinstance(v, annotation) else annotation(v)
+        if issubclass(annotation, datetime):
+            return _datetime
+
+    return _identity
+
+
+def _model_converter(model_cls: type[ModelT]) -> Callable[[Any], ModelT]:
+    """生成（并缓存）某个模型的加载函数"""
+    cached = _converters.get(model_cls)
+    if cached is not None:
+        return cached
+
+    converters: dict[str, Converter] = {}
+    missing_defaults: list = []
+    new = model_cls.__new__
+    private_attrs = list(model_cls.__private_attributes__.items())
+    set_attr = object.__setattr__
+
+    def load(data: Any) -> ModelT:
+        if isinstance(data, model_cls):
+            return data
+        values = {}
+        for name, value in data.items():
+            convert = converters.get(name)
+            if convert is None:
+                continue  # 模型已删除的字段
+            values[name] = value if convert is _identity else convert(value)
+        fields_set = set(values)
+        if len(values) != len(converters):
+            # 存储中缺失的字段（模型新增字段）使用默认值
+            for name, field in missing_defaults:
+                if name not in values:
+                    values[name] = field.get_default(call_default_factory=True)
+        # 与 model_construct 等价，但省去其逐字段的通用处理
+        instance = new(model_cls)
+        set_attr(instance, "__dict__", values)
+        set_attr(instance, "__pydantic_fields_set__", fields_set)
+        set_attr(instance, "__pydantic_extra__", None)
+        set_attr(instance, "__pydantic_private__", {
+            name: attr.get_default(call_default_factory=True) for name, attr in private_attrs
+        } if private_attrs else None)
+        return instance
+
+    # 先登记再填充，支持自引用模型
+    _converters[model_cls] = load
+    for name, field in model_cls.model_fields.items():
+        converters[name] = _build_converter(field.annotation)
+        missing_defaults.append((name, field))
+    return load
+
+
+def trusted_load(model_cls: type[ModelT], data: dict) -> ModelT:
+    """由已解码的字典构建模型（不校验）"""
+    return _model_converter(model_cls)(data)
+
+
+def trusted_load_json(model_cls: type[ModelT], data: Union[str, bytes]) -> ModelT:
+    """由 JSON 文本构建模型（不校验）"""
+    return trusted_load(model_cls, json.loads(data))
@@ -0,0 +1,117 @@
+"""
+关卡开场变体存储
+预先生成的关卡开场白与议会辩论对话，按 (关卡, 权力/信用区间, 顾问信任区间, 状态标记) 分桶保存在本地 JSON 文件中
+"""
+import copy
+import json
+import os
+import random
+from typing import Optional
+
+from config import settings
+from models.game_state import GameState
+
+
+STORE_VERSION = 1
+
+
+def _band(value: float, width: float) -> int:
+    """数值所在区间编号"""
+    return int(max(0.0, min(value, 99.999)) // width)
+
+
+def variant_bucket_key(chapter_id: str, game_state: GameState) -> str:
+    """
+    计算游戏状态对应的变体分桶键
+
+    开场白与辩论提示词只依赖关卡静态文本、三维权力、信用分、顾问信任度与生效的状态标记，
+    把这些数值按区间粗粒度分桶后，同一桶内的变体可以互相替换。
+    """
+    width = settings.chapter_variant_band_width
+    power = game_state.power
+    trust = [
+        _band(game_state.relations[a].trust if a in game_state.relations else 50, width)
+        for a in ("lion", "fox", "balance")
+    ]
+    flags = sorted(flag.name for flag in game_state.get_active_flags())
+    return "|".join([
+        chapter_id,
+        f"p{_band(power.authority, width)}-{_band(power.fear, width)}-{_band(power.love, width)}",
+        f"c{_band(game_state.credit_score, width)}",
+        f"t{trust[0]}-{trust[1]}-{trust[2]}",
+        "f" + ",".join(flags),
+    ])
+
+
+class ChapterVariantStore:
+    """关卡开场变体存储（本地 JSON 文件）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._buckets: dict[str, dict[str, list]] = {}
+        self._loaded = False
+
+    def load(self) -> None:
+        """从文件加载；文件不存在或版本不符时视为空"""
+        self._loaded = True
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != STORE_VERSION:
+                print(f"[VariantStore] 变体文件版本不符，忽略: {self.path}")
+                return
+            self._buckets = data.get("buckets", {})
+            print(f"[VariantStore] 已加载 {len(self._buckets)} 个变体分桶")
+        except Exception as e:
+            print(f"[VariantStore] 加载变体文件失败: {type(e).__name__}: {e}")
+
+    def save(self) -> None:
+        """写回文件（先写临时文件再替换，避免写坏）"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": STORE_VERSION, "buckets": self._buckets}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def _bucket(self, key: str) -> dict[str, list]:
+        if not self._loaded:
+            self.load()
+        return self._buckets.get(key, {})
+
+    def pick(self, key: str, kind: str):
+        """随机取出一个变体（kind: opening / debate_dialogue），没有时返回 None"""
+        variants = self._bucket(key).get(kind)
+        if not variants:
+            return None
+        return copy.deepcopy(random.choice(variants))
+
+    def add(self, key: str, kind: str, value) -> None:
+        """追加一个变体"""
+        if not self._loaded:
+            self.load()
+        self._buckets.setdefault(key, {}).setdefault(kind, []).append(value)
+
+    def count(self, key: str, kind: str) -> int:
+        return len(self._bucket(key).get(kind, []))
+
+    def stats(self) -> dict:
+        if not self._loaded:
+            self.load()
+        return {
+            "buckets": len(self._buckets),
+            "variants": sum(len(v) for bucket in self._buckets.values() for v in bucket.values()),
+        }
+
+
+# 单例实例
+_variant_store: Optional[ChapterVariantStore] = None
+
+
+def get_variant_store() -> ChapterVariantStore:
+    """获取关卡开场变体存储单例"""
+    global _variant_store
+    if _variant_store is None:
+        _variant_store = ChapterVariantStore(settings.chapter_variant_store_path)
+    return _variant_store